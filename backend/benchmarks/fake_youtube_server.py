@@ -0,0 +1,426 @@
+"""
+ベンチマーク用: YouTube Data API v3 の代わりに使うローカルサーバー
+channels / playlistItems / videos を決定的な合成データで返す。
+
+チャンネルIDは fake_channel_id(動画数) で作る（例: UCfake000000000000010000 は動画1万本）。
+ハンドル @fake10000 でも同じチャンネルを解決できる。
+
+単体で起動する場合（backendディレクトリから）:
+    python -m benchmarks.fake_youtube_server --port 8080 --latency-ms 30
+    export YOUTUBE_API_BASE_URL=http://127.0.0.1:8080/youtube/v3
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+API_PREFIX = "/youtube/v3/"
+FAKE_CHANNEL_ID_PATTERN = re.compile(r"^UCfake(\d{18})$")
+FAKE_HANDLE_PATTERN = re.compile(r"^fake(\d+)$")
+# 最古の動画の公開日時。以降は6時間おきに1本ずつ公開された扱いにする
+FIRST_PUBLISHED_AT = datetime(2015, 1, 1, tzinfo=timezone.utc)
+PUBLISH_INTERVAL = timedelta(hours=6)
+
+
+def fake_channel_id(video_count: int) -> str:
+    """動画数をエンコードした合成チャンネルIDを返す"""
+    return f"UCfake{video_count:018d}"
+
+
+def _channel_tag(channel_id: str) -> str:
+    # 動画IDの先頭4文字。動画IDからチャンネルを逆引きするために使う
+    return hashlib.sha1(channel_id.encode()).hexdigest()[:4]
+
+
+class FakeYouTubeConfig:
+    """
+    latency_ms: 1リクエストあたりの応答遅延（±latency_jitter_msの一様乱数を加える）
+    error_rate: 一時的なエラー（error_statusesのいずれか）を返す確率
+    page_size: playlistItemsの1ページの最大件数（maxResultsより小さければこちらが優先）
+    quota_limit: APIキーごとの消費ユニットがこれを超えると403 quotaExceededを返す（Noneなら無制限）
+    invalid_keys: 400 keyInvalidを返すAPIキー
+    revision: 統計値の世代。変えると全動画の再生数などが変わりETagも変わる
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        latency_jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (500, 503, 429),
+        page_size: int = 50,
+        quota_limit: Optional[int] = None,
+        invalid_keys: Tuple[str, ...] = (),
+        revision: int = 0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.page_size = page_size
+        self.quota_limit = quota_limit
+        self.invalid_keys = invalid_keys
+        self.revision = revision
+        self.seed = seed
+
+
+class FakeYouTubeAPI:
+    """リクエストパラメータからレスポンスを組み立てる。HTTPサーバーとは独立している"""
+
+    def __init__(self, config: FakeYouTubeConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._random = random.Random(config.seed)
+        self._channels_by_tag: Dict[str, Tuple[str, int]] = {}
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests: Dict[str, int] = {}
+            self.statuses: Dict[int, int] = {}
+            self.injected_errors = 0
+            self.not_modified = 0
+            self.units_used = 0
+            self.units_by_key: Dict[str, int] = {}
+            self.items_returned = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "statuses": dict(self.statuses),
+                "injected_errors": self.injected_errors,
+                "not_modified": self.not_modified,
+                "units_used": self.units_used,
+                "units_by_key": dict(self.units_by_key),
+                "items_returned": self.items_returned,
+            }
+
+    def _channel_size(self, channel_id: str) -> Optional[int]:
+        match = FAKE_CHANNEL_ID_PATTERN.match(channel_id)
+        if not match:
+            return None
+        video_count = int(match.group(1))
+        with self._lock:
+            self._channels_by_tag[_channel_tag(channel_id)] = (channel_id, video_count)
+        return video_count
+
+    def _video_id(self, channel_id: str, index: int) -> str:
+        return f"{_channel_tag(channel_id)}{index:07d}"
+
+    def _lookup_video(self, video_id: str) -> Optional[Tuple[str, int]]:
+        if len(video_id) != 11 or not video_id[4:].isdigit():
+            return None
+        with self._lock:
+            channel = self._channels_by_tag.get(video_id[:4])
+        if channel is None:
+            return None
+        channel_id, video_count = channel
+        index = int(video_id[4:])
+        return (channel_id, index) if index < video_count else None
+
+    def _counter(self, video_id: str, name: str, modulo: int) -> int:
+        return zlib.crc32(f"{video_id}:{name}:{self.config.seed}:{self.config.revision}".encode()) % modulo
+
+    def _record(self, endpoint: str, status: int, units: int = 0, items: int = 0, api_key: Optional[str] = None) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.units_used += units
+            if api_key and units:
+                self.units_by_key[api_key] = self.units_by_key.get(api_key, 0) + units
+            self.items_returned += items
+            if status == 304:
+                self.not_modified += 1
+
+    def _inject_error(self) -> Optional[int]:
+        if self.config.error_rate <= 0:
+            return None
+        with self._lock:
+            if self._random.random() >= self.config.error_rate:
+                return None
+            self.injected_errors += 1
+            return self._random.choice(self.config.error_statuses)
+
+    def _latency(self) -> float:
+        jitter = self.config.latency_jitter_ms
+        with self._lock:
+            delay = self.config.latency_ms + (self._random.uniform(-jitter, jitter) if jitter else 0)
+        return max(delay, 0) / 1000
+
+    def handle(self, endpoint: str, params: Dict[str, str], if_none_match: Optional[str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(ステータスコード, JSON本文) を返す。304の場合本文はNone"""
+        delay = self._latency()
+        if delay:
+            time.sleep(delay)
+
+        api_key = params.get("key")
+        if not api_key or api_key in self.config.invalid_keys:
+            self._record(endpoint, 400)
+            return 400, _error_body(400, "keyInvalid", "API key not valid. Please pass a valid API key.")
+
+        error_status = self._inject_error()
+        if error_status:
+            self._record(endpoint, error_status)
+            reason = "rateLimitExceeded" if error_status == 429 else "backendError"
+            return error_status, _error_body(error_status, reason, "Injected error")
+
+        if self.config.quota_limit is not None and self.units_by_key.get(api_key, 0) >= self.config.quota_limit:
+            self._record(endpoint, 403)
+            return 403, _error_body(403, "quotaExceeded", "The request cannot be completed because you have exceeded your quota.")
+
+        if endpoint == "channels":
+            body = self._channels(params)
+        elif endpoint == "playlistItems":
+            body = self._playlist_items(params)
+        elif endpoint == "videos":
+            body = self._videos(params)
+        else:
+            self._record(endpoint, 404)
+            return 404, _error_body(404, "notFound", f"Unknown endpoint: {endpoint}")
+
+        if body is None:
+            self._record(endpoint, 404, units=1, api_key=api_key)
+            return 404, _error_body(404, "playlistNotFound", "The playlist identified with the request's playlistId parameter cannot be found.")
+
+        body["etag"] = _etag(body)
+        if if_none_match and if_none_match == body["etag"]:
+            self._record(endpoint, 304, units=1, api_key=api_key)
+            return 304, None
+        self._record(endpoint, 200, units=1, items=len(body.get("items", [])), api_key=api_key)
+        return 200, body
+
+    def _channels(self, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if "forHandle" in params:
+            match = FAKE_HANDLE_PATTERN.match(params["forHandle"].lstrip("@"))
+            items = [{"kind": "youtube#channel", "id": fake_channel_id(int(match.group(1)))}] if match else []
+            return {"kind": "youtube#channelListResponse", "items": items}
+
+        items = []
+        for channel_id in params.get("id", "").split(","):
+            video_count = self._channel_size(channel_id)
+            if video_count is None:
+                continue
+            total_views = video_count * 500_000
+            items.append({
+                "kind": "youtube#channel",
+                "id": channel_id,
+                "snippet": {
+                    "title": f"Fake channel ({video_count} videos)",
+                    "description": "Synthetic channel for benchmarks",
+                    "customUrl": f"@fake{video_count}",
+                    "publishedAt": _format_timestamp(FIRST_PUBLISHED_AT - timedelta(days=1)),
+                },
+                "statistics": {
+                    "viewCount": str(total_views),
+                    "subscriberCount": str(video_count * 10),
+                    "videoCount": str(video_count),
+                },
+                "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel_id[2:]}},
+            })
+        return {"kind": "youtube#channelListResponse", "pageInfo": {"totalResults": len(items)}, "items": items}
+
+    def _playlist_items(self, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        playlist_id = params.get("playlistId", "")
+        if not playlist_id.startswith("UU"):
+            return None
+        channel_id = "UC" + playlist_id[2:]
+        video_count = self._channel_size(channel_id)
+        if video_count is None:
+            return None
+
+        page_size = max(min(int(params.get("maxResults", 5)), self.config.page_size, 50), 1)
+        offset = _decode_page_token(params.get("pageToken"))
+        # 再生リストは新しい順（インデックスの大きい順）
+        indexes = range(video_count - 1 - offset, max(video_count - 1 - offset - page_size, -1), -1)
+        items = [
+            {
+                "kind": "youtube#playlistItem",
+                "id": f"PL{self._video_id(channel_id, index)}",
+                "contentDetails": {
+                    "videoId": self._video_id(channel_id, index),
+                    "videoPublishedAt": _format_timestamp(FIRST_PUBLISHED_AT + PUBLISH_INTERVAL * index),
+                },
+            }
+            for index in indexes
+        ]
+        body: Dict[str, Any] = {
+            "kind": "youtube#playlistItemListResponse",
+            "pageInfo": {"totalResults": video_count, "resultsPerPage": page_size},
+            "items": items,
+        }
+        if offset + page_size < video_count:
+            body["nextPageToken"] = _encode_page_token(offset + page_size)
+        return body
+
+    def _videos(self, params: Dict[str, str]) -> Dict[str, Any]:
+        parts = set(params.get("part", "").split(","))
+        items = []
+        for video_id in params.get("id", "").split(",")[:50]:
+            found = self._lookup_video(video_id)
+            if found is None:
+                continue
+            _, index = found
+            item: Dict[str, Any] = {"id": video_id}
+            if "statistics" in parts:
+                item["statistics"] = {
+                    "viewCount": str(self._counter(video_id, "view", 1_000_000)),
+                    "likeCount": str(self._counter(video_id, "like", 50_000)),
+                    "commentCount": str(self._counter(video_id, "comment", 5_000)),
+                }
+            if "snippet" in parts:
+                item["snippet"] = {
+                    "publishedAt": _format_timestamp(FIRST_PUBLISHED_AT + PUBLISH_INTERVAL * index),
+                    "title": f"Fake video #{index}",
+                    "description": f"Synthetic video {index} " * 4,
+                    "thumbnails": {"default": {"url": f"https://i.ytimg.com/vi/{video_id}/default.jpg"}},
+                    "tags": [f"tag{index % 7}", f"tag{index % 13}"],
+                }
+            if "contentDetails" in parts:
+                seconds = 60 + self._counter(video_id, "duration", 3600)
+                item["contentDetails"] = {"duration": f"PT{seconds // 60}M{seconds % 60}S"}
+            items.append(item)
+        return {"kind": "youtube#videoListResponse", "pageInfo": {"totalResults": len(items)}, "items": items}
+
+
+def _etag(body: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+def _error_body(code: int, reason: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": code, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+
+def _format_timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _encode_page_token(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset:{offset}".encode()).decode().rstrip("=")
+
+
+def _decode_page_token(token: Optional[str]) -> int:
+    if not token:
+        return 0
+    padded = token + "=" * (-len(token) % 4)
+    return int(base64.urlsafe_b64decode(padded).decode().split(":", 1)[1])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-aliveを有効にしてクライアント側の接続再利用を計測できるようにする
+    protocol_version = "HTTP/1.1"
+    api: FakeYouTubeAPI
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if not url.path.startswith(API_PREFIX):
+            self._send(404, _error_body(404, "notFound", "Not found"))
+            return
+        endpoint = url.path[len(API_PREFIX):]
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, body = self.api.handle(endpoint, params, self.headers.get("If-None-Match"))
+        self._send(status, body)
+
+    def _send(self, status: int, body: Optional[Dict[str, Any]]) -> None:
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            if "etag" in body:
+                self.send_header("ETag", body["etag"])
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeYouTubeServer:
+    """
+    バックグラウンドスレッドで動くフェイクAPIサーバー。
+    with文で使うと終了時に停止する。port=0なら空いているポートを使う。
+    """
+
+    def __init__(self, config: Optional[FakeYouTubeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.api = FakeYouTubeAPI(config or FakeYouTubeConfig())
+        handler = type("FakeYouTubeHandler", (_Handler,), {"api": self.api})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX.rstrip('/')}"
+
+    def start(self) -> "FakeYouTubeServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-youtube-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """フォアグラウンドで起動する（CLI用）"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeYouTubeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake YouTube Data API v3 server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--quota-limit", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = FakeYouTubeConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        page_size=args.page_size,
+        quota_limit=args.quota_limit,
+        seed=args.seed,
+    )
+    server = FakeYouTubeServer(config, host=args.host, port=args.port)
+    print(f"Fake YouTube API listening on {server.base_url}")
+    print(f"Example channel: {fake_channel_id(1000)} (handle: @fake1000)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.api.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+ベンチマーク: フェイクYouTube APIサーバーを相手にチャンネルのインポートを実行し、
+動画数ごとのスループット（videos/sec）・ピークRSS・APIリクエスト数を計測する。
+
+backendディレクトリから実行する:
+    python -m benchmarks.import_benchmark
+    python -m benchmarks.import_benchmark --sizes 1000,10000 --latency-ms 50 --error-rate 0.01
+    python -m benchmarks.import_benchmark --mode sequential --json /tmp/bench.json
+
+--with-db を付けると import_channel_data でRDSへの書き込みまで計測する（DB_* の環境変数が必要）。
+書き込み方式は --bulk-strategy insert|load_data で切り替え、DBへの書き込み行数/秒も出力する。
+ピークRSSを計測対象ごとに分けるため、各インポートは別プロセスで実行する。
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+from benchmarks.fake_youtube_server import FakeYouTubeConfig, FakeYouTubeServer, fake_channel_id
+
+DEFAULT_SIZES = "1000,10000,100000"
+# フェイクサーバー相手ではクォータとレート制御で待たされないようにする
+UNLIMITED_QUOTA = 10 ** 12
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB、macOSはバイト単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_import(options: Dict[str, Any], results: "multiprocessing.Queue") -> None:
+    """子プロセスで1回分のインポートを実行し、結果をキューに入れる"""
+    # 設定値はインポート時に読まれるため、サービスを読み込む前に環境変数で切り替える
+    if options["bulk_strategy"]:
+        os.environ["BULK_LOAD_STRATEGY"] = options["bulk_strategy"]
+
+    from common.logger import get_logger
+    from services.quota import QuotaScheduler
+    from services.youtube_client import YouTubeClient, get_upload_playlist_id
+
+    get_logger().setLevel(logging.DEBUG if options["verbose"] else logging.WARNING)
+
+    channel_id = options["channel_id"]
+    client = YouTubeClient(
+        api_key="benchmark",
+        max_workers=options["workers"],
+        base_url=options["base_url"],
+        quota=QuotaScheduler(daily_limit=UNLIMITED_QUOTA, rate_per_sec=UNLIMITED_QUOTA, burst=UNLIMITED_QUOTA),
+    )
+    baseline_rss = _peak_rss_mb()
+    started = time.perf_counter()
+    video_count = 0
+    failed = 0
+    bulk_load = None
+    try:
+        if options["with_db"]:
+            from services.channel_service import import_channel_data
+
+            result = import_channel_data(channel_id, client)
+            video_count = result["summary"]["total_videos"]
+            failed = len(result["failed_video_ids"])
+            bulk_load = result["bulk_load"]
+        else:
+            client.get_channel_info(channel_id)
+            upload_playlist_id = get_upload_playlist_id(channel_id)
+            if options["mode"] == "pipelined":
+                chunks = client.iter_playlist_video_chunks(upload_playlist_id)
+            else:
+                chunks = client.iter_video_chunks(client.get_all_video_ids(upload_playlist_id))
+            for chunk_result in chunks:
+                if chunk_result.get("failed"):
+                    failed += len(chunk_result["video_ids"])
+                video_count += len(chunk_result["videos"])
+        elapsed = time.perf_counter() - started
+        results.put({
+            "ok": True,
+            "videos": video_count,
+            "failed_videos": failed,
+            "elapsed_sec": round(elapsed, 3),
+            "videos_per_sec": round(video_count / elapsed, 1) if elapsed else 0.0,
+            "baseline_rss_mb": round(baseline_rss, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "connections": client.get_connection_stats(),
+            "quota": client.quota.get_usage()["calls"],
+            "bulk_load": bulk_load,
+        })
+    except Exception as e:
+        results.put({"ok": False, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        client.close()
+
+
+def run_benchmark(
+    sizes: List[int],
+    mode: str = "pipelined",
+    workers: int = 10,
+    with_db: bool = False,
+    bulk_strategy: Optional[str] = None,
+    config: Optional[FakeYouTubeConfig] = None,
+    verbose: bool = False,
+) -> List[Dict[str, Any]]:
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    with FakeYouTubeServer(config) as server:
+        for size in sizes:
+            server.api.reset_stats()
+            results = context.Queue()
+            process = context.Process(
+                target=_run_import,
+                args=({
+                    "base_url": server.base_url,
+                    "channel_id": fake_channel_id(size),
+                    "mode": mode,
+                    "workers": workers,
+                    "with_db": with_db,
+                    "bulk_strategy": bulk_strategy,
+                    "verbose": verbose,
+                }, results),
+            )
+            process.start()
+            result = results.get()
+            process.join()
+
+            row = {"size": size, "mode": mode, "workers": workers, **result, "server": server.api.get_stats()}
+            rows.append(row)
+            if not result["ok"]:
+                print(f"{size:>8} videos: FAILED ({result['error']})")
+                continue
+            print(
+                f"{size:>8} videos: {result['elapsed_sec']:>8.2f}s {result['videos_per_sec']:>10.1f} videos/s "
+                f"peak RSS {result['peak_rss_mb']:>7.1f}MB (baseline {result['baseline_rss_mb']:.1f}MB) "
+                f"requests {row['server']['total_requests']:>6} {row['server']['requests']} "
+                f"connections opened {result['connections']['opened']}"
+            )
+            if result["bulk_load"]:
+                bulk_load = result["bulk_load"]
+                print(
+                    f"{'':>8}   DB writes ({bulk_load['strategy']}): {bulk_load['rows']} rows "
+                    f"in {bulk_load['seconds']:.2f}s, {bulk_load['rows_per_sec']:.1f} rows/s, "
+                    f"{bulk_load['skipped']} unchanged rows skipped"
+                )
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Channel import throughput benchmark against the fake YouTube API")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated video counts")
+    parser.add_argument("--mode", choices=["pipelined", "sequential"], default="pipelined",
+                        help="pipelined: overlap playlist paging with videos.list / sequential: collect IDs first")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--latency-jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-db", action="store_true", help="run import_channel_data including RDS writes")
+    parser.add_argument("--bulk-strategy", choices=["insert", "load_data"], help="BULK_LOAD_STRATEGY for --with-db runs")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = FakeYouTubeConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        page_size=args.page_size,
+        seed=args.seed,
+    )
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    rows = run_benchmark(sizes, mode=args.mode, workers=args.workers, with_db=args.with_db, bulk_strategy=args.bulk_strategy, config=config, verbose=args.verbose)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
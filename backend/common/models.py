@@ -18,6 +18,7 @@ class SummaryResponse(BaseModel):
     totalViews: int
     totalVideos: int
     lastFetchedAt: datetime
+    failedVideoCount: int = 0
 
 
 class ChannelImportResponse(BaseModel):
@@ -36,7 +37,10 @@ class ChannelListItem(BaseModel):
 
 class ChannelListResponse(BaseModel):
     items: list[ChannelListItem]
-    totalCount: int
+    # includeTotal=falseのときはNone
+    totalCount: Optional[int] = None
+    # 次のページのカーソル（最後のページならNone）
+    nextCursor: Optional[str] = None
 
 
 class VideoStats(BaseModel):
@@ -57,6 +61,25 @@ class VideoListItem(BaseModel):
 
 class VideoListResponse(BaseModel):
     items: list[VideoListItem]
-    totalCount: int
-
-
+    # includeTotal=falseのときはNone
+    totalCount: Optional[int] = None
+    # 次のページのカーソル（最後のページならNone）
+    nextCursor: Optional[str] = None
+
+
+class ChannelRefreshResponse(BaseModel):
+    refreshedChannels: int
+    failedChannels: dict[str, str]
+    refreshedVideos: int
+    failedVideoCount: int
+    requestCount: int
+
+
+class StatsCompactionResponse(BaseModel):
+    rawCutoff: Optional[datetime]
+    hourlyCutoff: datetime
+    rolledUp: dict[str, int]
+    rawDeleted: int
+    hourlyDeleted: int
+    createdPartitions: list[str] = []
+    droppedPartitions: list[str] = []
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+# APIレスポンスから取り込むデータはタプルベースの軽量なレコードで扱う
+# （dictよりもメモリ使用量が小さく、日時の変換やタグのJSON化は取得時に1度だけ行う）
+class ChannelRecord(NamedTuple):
+    channel_id: str
+    title: str
+    description: str
+    published_at: Optional[datetime]
+    subscriber_count: int
+    video_count: int
+    view_count: int
+    upload_playlist_id: Optional[str]
+    etag: Optional[str]
+    handle: Optional[str] = None
+
+
+class VideoRecord(NamedTuple):
+    video_id: str
+    title: str
+    description: str
+    published_at: datetime
+    duration_sec: Optional[int]
+    tags_json: Optional[str]
+    thumbnail_url: Optional[str]
+    view_count: int
+    like_count: int
+    comment_count: int
+
+
+class VideoStatsRecord(NamedTuple):
+    video_id: str
+    view_count: int
+    like_count: int
+    comment_count: int
@@ -1,12 +1,62 @@
 import os
-from typing import Optional
+from typing import List, Optional
 
 YOUTUBE_API_KEY: Optional[str] = os.getenv("YOUTUBE_API_KEY")
+# カンマ区切りで複数のキーを指定すると、キーごとのクォータを合わせて使う（未指定ならYOUTUBE_API_KEYのみ）
+YOUTUBE_API_KEYS: List[str] = [
+    key.strip() for key in os.getenv("YOUTUBE_API_KEYS", YOUTUBE_API_KEY or "").split(",") if key.strip()
+]
+YOUTUBE_KEY_DISABLE_SECONDS: int = int(os.getenv("YOUTUBE_KEY_DISABLE_SECONDS", "3600"))
+YOUTUBE_API_BASE_URL: str = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
 DB_HOST: Optional[str] = os.getenv("DB_HOST")
 DB_USER: Optional[str] = os.getenv("DB_USER")
 DB_PASSWORD: Optional[str] = os.getenv("DB_PASSWORD")
 DB_NAME: Optional[str] = os.getenv("DB_NAME")
+DB_CONNECTION_REUSE: bool = os.getenv("DB_CONNECTION_REUSE", "true").lower() == "true"
+DB_CONNECTION_MAX_AGE: int = int(os.getenv("DB_CONNECTION_MAX_AGE", "3600"))
+DB_CONNECTION_MAX_USES: int = int(os.getenv("DB_CONNECTION_MAX_USES", "1000"))
+DB_CONNECTION_PING_INTERVAL: int = int(os.getenv("DB_CONNECTION_PING_INTERVAL", "30"))
+DB_CONNECTION_POOL_SIZE: int = int(os.getenv("DB_CONNECTION_POOL_SIZE", "4"))
+DB_READER_HOST: Optional[str] = os.getenv("DB_READER_HOST")
+DB_READER_MAX_LAG_SECONDS: float = float(os.getenv("DB_READER_MAX_LAG_SECONDS", "5"))
+DB_READER_LAG_CHECK_INTERVAL: int = int(os.getenv("DB_READER_LAG_CHECK_INTERVAL", "10"))
+DB_READER_ALLOW_UNKNOWN_LAG: bool = os.getenv("DB_READER_ALLOW_UNKNOWN_LAG", "false").lower() == "true"
+DB_QUERY_STATS: bool = os.getenv("DB_QUERY_STATS", "true").lower() == "true"
+DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+DB_SLOW_QUERY_EXPLAIN: bool = os.getenv("DB_SLOW_QUERY_EXPLAIN", "true").lower() == "true"
 MIN_FETCH_INTERVAL: int = int(os.getenv("MIN_FETCH_INTERVAL", "600"))
 DYNAMODB_TABLE_NAME: str = os.getenv("DYNAMODB_TABLE_NAME", "channel_update_cache")
-
-
+QUOTA_LEDGER_RETENTION_DAYS: int = int(os.getenv("QUOTA_LEDGER_RETENTION_DAYS", "3"))
+QUOTA_RESERVATION_TTL: int = int(os.getenv("QUOTA_RESERVATION_TTL", "900"))
+QUOTA_RESERVATION_FLUSH_UNITS: int = int(os.getenv("QUOTA_RESERVATION_FLUSH_UNITS", "100"))
+YOUTUBE_MAX_WORKERS: int = int(os.getenv("YOUTUBE_MAX_WORKERS", "10"))
+YOUTUBE_HTTP_POOL_SIZE: int = int(os.getenv("YOUTUBE_HTTP_POOL_SIZE", str(YOUTUBE_MAX_WORKERS)))
+YOUTUBE_CONNECT_TIMEOUT: float = float(os.getenv("YOUTUBE_CONNECT_TIMEOUT", "3.05"))
+YOUTUBE_READ_TIMEOUT: float = float(os.getenv("YOUTUBE_READ_TIMEOUT", "10"))
+FULL_RESYNC_INTERVAL: int = int(os.getenv("FULL_RESYNC_INTERVAL", "604800"))
+METADATA_SYNC_INTERVAL: int = int(os.getenv("METADATA_SYNC_INTERVAL", "86400"))
+YOUTUBE_DAILY_QUOTA: int = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_QUOTA_INTERACTIVE_RESERVE: int = int(os.getenv("YOUTUBE_QUOTA_INTERACTIVE_RESERVE", "2000"))
+YOUTUBE_RATE_LIMIT_PER_SEC: float = float(os.getenv("YOUTUBE_RATE_LIMIT_PER_SEC", "50"))
+YOUTUBE_RATE_LIMIT_BURST: int = int(os.getenv("YOUTUBE_RATE_LIMIT_BURST", "100"))
+YOUTUBE_MAX_IN_FLIGHT_CHUNKS: int = int(os.getenv("YOUTUBE_MAX_IN_FLIGHT_CHUNKS", str(YOUTUBE_MAX_WORKERS * 2)))
+IMPORT_WRITE_BATCH_SIZE: int = int(os.getenv("IMPORT_WRITE_BATCH_SIZE", "500"))
+PIPELINED_PLAYLIST_FETCH: bool = os.getenv("PIPELINED_PLAYLIST_FETCH", "true").lower() == "true"
+YOUTUBE_MAX_RETRIES: int = int(os.getenv("YOUTUBE_MAX_RETRIES", "3"))
+YOUTUBE_RETRY_BASE_DELAY: float = float(os.getenv("YOUTUBE_RETRY_BASE_DELAY", "0.5"))
+YOUTUBE_RETRY_MAX_DELAY: float = float(os.getenv("YOUTUBE_RETRY_MAX_DELAY", "8"))
+YOUTUBE_HEDGE_AFTER: float = float(os.getenv("YOUTUBE_HEDGE_AFTER", "0"))
+YOUTUBE_MAX_HEDGES: int = int(os.getenv("YOUTUBE_MAX_HEDGES", "10"))
+YOUTUBE_HEDGE_SLOTS: int = int(os.getenv("YOUTUBE_HEDGE_SLOTS", "2"))
+HANDLE_CACHE_TTL: int = int(os.getenv("HANDLE_CACHE_TTL", "604800"))
+HANDLE_CACHE_MAX_SIZE: int = int(os.getenv("HANDLE_CACHE_MAX_SIZE", "1024"))
+REFRESH_SMALL_CHANNEL_MAX_VIDEOS: int = int(os.getenv("REFRESH_SMALL_CHANNEL_MAX_VIDEOS", "50"))
+BULK_LOAD_STRATEGY: str = os.getenv("BULK_LOAD_STRATEGY", "insert")
+BULK_INSERT_MAX_ROWS: int = int(os.getenv("BULK_INSERT_MAX_ROWS", "1000"))
+BULK_INSERT_MAX_BYTES: int = int(os.getenv("BULK_INSERT_MAX_BYTES", "1048576"))
+STATS_HEARTBEAT_INTERVAL: int = int(os.getenv("STATS_HEARTBEAT_INTERVAL", "86400"))
+STATS_RAW_RETENTION_DAYS: int = int(os.getenv("STATS_RAW_RETENTION_DAYS", "30"))
+STATS_HOURLY_RETENTION_DAYS: int = int(os.getenv("STATS_HOURLY_RETENTION_DAYS", "90"))
+STATS_ROLLUP_MIN_POINTS: int = int(os.getenv("STATS_ROLLUP_MIN_POINTS", "30"))
+STATS_COMPACTION_BATCH_SIZE: int = int(os.getenv("STATS_COMPACTION_BATCH_SIZE", "10000"))
+STATS_PARTITION_MONTHS_AHEAD: int = int(os.getenv("STATS_PARTITION_MONTHS_AHEAD", "3"))
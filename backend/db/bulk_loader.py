@@ -0,0 +1,416 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pymysql
+
+from common.logger import get_logger
+from common.records import VideoRecord
+from constants.config import BULK_LOAD_STRATEGY, BULK_INSERT_MAX_ROWS, BULK_INSERT_MAX_BYTES, STATS_HEARTBEAT_INTERVAL
+
+logger = get_logger(__name__)
+
+STRATEGY_INSERT = "insert"
+STRATEGY_LOAD_DATA = "load_data"
+
+# LOAD DATA LOCAL INFILE がクライアント・サーバーのどちらかで無効になっている場合のエラー
+_LOCAL_INFILE_DISABLED_ERRORS = {1148, 2068, 3948}
+
+# 1接続の中で使い回すステージング用の一時テーブル（他の接続からは見えない）
+_STAGING_VIDEOS_TABLE = "_bulk_videos"
+_STAGING_VIDEOS_COLUMNS = (
+    "youtube_video_id", "title", "description", "published_at", "duration_sec", "tags_json",
+    "metadata_hash", "view_count", "like_count", "comment_count",
+)
+_STAGING_VIDEOS_DDL = f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {_STAGING_VIDEOS_TABLE} (
+      youtube_video_id VARCHAR(64) NOT NULL PRIMARY KEY,
+      title VARCHAR(255) NOT NULL,
+      description TEXT,
+      published_at TIMESTAMP NULL,
+      duration_sec INT,
+      tags_json JSON,
+      metadata_hash CHAR(40) NOT NULL,
+      view_count BIGINT NOT NULL,
+      like_count BIGINT,
+      comment_count BIGINT
+    )
+"""
+_STAGING_STATS_TABLE = "_bulk_stats"
+_STATS_COLUMNS = ("video_id", "view_count", "like_count", "comment_count")
+_STAGING_STATS_DDL = f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {_STAGING_STATS_TABLE} (
+      video_id BIGINT NOT NULL PRIMARY KEY,
+      view_count BIGINT NOT NULL,
+      like_count BIGINT,
+      comment_count BIGINT
+    )
+"""
+_STAGING_DDL = {
+    _STAGING_VIDEOS_TABLE: _STAGING_VIDEOS_DDL,
+    _STAGING_STATS_TABLE: _STAGING_STATS_DDL,
+}
+
+
+class BulkLoader:
+    """
+    videos / video_stats_history への大量書き込み。
+    strategy="insert" は行数（max_rows）とバイト数（max_bytes）で区切った複数行INSERT、
+    strategy="load_data" はメモリ上で組み立てたTSVを LOAD DATA LOCAL INFILE で流し込む
+    （接続時にlocal_infileが必要。サーバー側で無効な場合は自動的にinsertに切り替える）。
+    動画はいったん一時テーブルに入れてから INSERT ... SELECT でupsertし、統計のvideos.idは
+    youtube_video_idのユニークインデックスとのJOINで解決するため、巨大なIN句を組み立てない。
+    videosに書き込むのはmetadata_hash（タイトル・説明・公開日時・長さ・タグのハッシュ）が
+    保存済みのものと異なる動画だけで、変化の無い動画の行は更新しない。
+    一覧・集計で履歴を引かずに済むよう、最新の統計はvideosのview_count/like_count/comment_countと
+    stats_updated_atにも書き込む（スナップショットを追記する動画についてだけ更新する）。
+    統計のスナップショットは動画ごとの最新のスナップショットと比べ、値が変わった動画と
+    最新のスナップショットからstats_heartbeat秒以上経った動画の分だけを追記する（0なら毎回追記）。
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        strategy: str = BULK_LOAD_STRATEGY,
+        max_rows: int = BULK_INSERT_MAX_ROWS,
+        max_bytes: int = BULK_INSERT_MAX_BYTES,
+        stats_heartbeat: int = STATS_HEARTBEAT_INTERVAL,
+        stats: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        if strategy not in (STRATEGY_INSERT, STRATEGY_LOAD_DATA):
+            raise ValueError(f"Unknown bulk load strategy: {strategy}")
+        self.connection = connection
+        self.strategy = strategy
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.stats_heartbeat = stats_heartbeat
+        self._staging_ready: Dict[str, bool] = {}
+        # 複数のトランザクションに分けて書き込む場合は同じdictを渡して合計する
+        self._stats: Dict[str, Dict[str, Any]] = stats if stats is not None else {}
+
+    def _record(self, table: str, rows: int, statements: int, started: float, skipped: int = 0) -> None:
+        stats = self._stats.setdefault(table, {"rows": 0, "skipped": 0, "statements": 0, "seconds": 0.0})
+        stats["rows"] += rows
+        stats["skipped"] += skipped
+        stats["statements"] += statements
+        stats["seconds"] += time.perf_counter() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        return summarize_bulk_stats(self._stats, self.strategy)
+
+    def _ensure_staging(self, cursor: Any, table: str) -> None:
+        if not self._staging_ready.get(table):
+            # CREATE TEMPORARY TABLE は暗黙のコミットを起こさないため、トランザクション内で作ってよい
+            cursor.execute(_STAGING_DDL[table])
+            self._staging_ready[table] = True
+        # TRUNCATEは暗黙のコミットを起こす可能性があるためDELETEで空にする
+        cursor.execute(f"DELETE FROM {table}")
+
+    def _append_changed_stats(self, cursor: Any, source: str, candidates: int) -> int:
+        """
+        source（video_id, view_count, like_count, comment_count を返すSELECT）の統計のうち、
+        最新のスナップショットから値が変わったもの・heartbeatを過ぎたものだけをvideo_stats_historyに追記する。
+        最新のスナップショットは (video_id, snapshot_at) のインデックスで動画ごとに1件引く。
+        heartbeatより古いスナップショットは比べるまでもなく追記するため、直近heartbeat秒だけを探す
+        （snapshot_atの範囲で月ごとのパーティションが刈り込まれる）。
+        """
+        started = time.perf_counter()
+        inserted = cursor.execute(
+            f"""
+            INSERT INTO video_stats_history (
+                video_id, snapshot_at, view_count, like_count, comment_count
+            )
+            SELECT c.video_id, CURRENT_TIMESTAMP, c.view_count, c.like_count, c.comment_count
+            FROM ({source}) c
+            LEFT JOIN video_stats_history h ON h.id = (
+                SELECT latest.id
+                FROM video_stats_history latest
+                WHERE latest.video_id = c.video_id
+                  AND latest.snapshot_at > CURRENT_TIMESTAMP - INTERVAL %s SECOND
+                ORDER BY latest.snapshot_at DESC, latest.id DESC
+                LIMIT 1
+            ) AND h.snapshot_at > CURRENT_TIMESTAMP - INTERVAL %s SECOND
+            WHERE h.id IS NULL
+               OR h.view_count <> c.view_count
+               OR NOT (h.like_count <=> c.like_count)
+               OR NOT (h.comment_count <=> c.comment_count)
+            """,
+            (self.stats_heartbeat, self.stats_heartbeat),
+        )
+        self._record("video_stats_history", inserted, 1, started, skipped=max(candidates - inserted, 0))
+        return inserted
+
+    def _update_latest_stats(self, cursor: Any, staging_table: str, join_condition: str) -> int:
+        """
+        ステージングした統計をvideosの最新統計列に反映する。スナップショットと同じく、
+        値が変わった動画・stats_updated_atからheartbeatを過ぎた動画だけを更新する。
+        統計列の更新ではupdated_at（メタデータの更新日時）を動かさない。
+        """
+        started = time.perf_counter()
+        updated = cursor.execute(
+            f"""
+            UPDATE videos v
+            JOIN {staging_table} s ON {join_condition}
+            SET v.view_count = s.view_count,
+                v.like_count = COALESCE(s.like_count, 0),
+                v.comment_count = COALESCE(s.comment_count, 0),
+                v.stats_updated_at = CURRENT_TIMESTAMP,
+                v.updated_at = v.updated_at
+            WHERE v.stats_updated_at IS NULL
+               OR v.view_count <> s.view_count
+               OR v.like_count <> COALESCE(s.like_count, 0)
+               OR v.comment_count <> COALESCE(s.comment_count, 0)
+               OR v.stats_updated_at <= CURRENT_TIMESTAMP - INTERVAL %s SECOND
+            """,
+            (self.stats_heartbeat,),
+        )
+        self._record("videos.latest_stats", updated, 1, started)
+        return updated
+
+    def _insert_rows(self, cursor: Any, statement: str, row_template: str, rows: Iterable[Sequence[Any]]) -> Tuple[int, int]:
+        """statementの{values}に、max_rows行・max_bytesバイトを超えないようにVALUESを詰めて実行する"""
+        base_size = len(statement.encode("utf-8"))
+        batch: List[str] = []
+        size = base_size
+        row_count = 0
+        statements = 0
+        for row in rows:
+            value = cursor.mogrify(row_template, row)
+            value_size = len(value.encode("utf-8")) + 1
+            if batch and (len(batch) >= self.max_rows or size + value_size > self.max_bytes):
+                cursor.execute(statement.format(values=",".join(batch)))
+                statements += 1
+                batch = []
+                size = base_size
+            batch.append(value)
+            size += value_size
+            row_count += 1
+        if batch:
+            cursor.execute(statement.format(values=",".join(batch)))
+            statements += 1
+        return row_count, statements
+
+    def _load_rows(self, cursor: Any, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], set_clause: str = "") -> int:
+        """
+        TSVをメモリ上で組み立てて LOAD DATA LOCAL INFILE で読み込ませる。
+        pymysqlはファイルパスからしか読めないため、組み立てたバッファを/tmpの一時ファイルに書き出して渡す。
+        """
+        buffer = io.StringIO()
+        row_count = 0
+        for row in rows:
+            buffer.write("\t".join(_tsv_field(value) for value in row))
+            buffer.write("\n")
+            row_count += 1
+        if not row_count:
+            return 0
+
+        fd, path = tempfile.mkstemp(prefix="bulk_", suffix=".tsv")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(buffer.getvalue())
+            cursor.execute(
+                f"""
+                LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({", ".join(columns)})
+                {set_clause}
+                """,
+                (path,),
+            )
+        finally:
+            os.unlink(path)
+        return row_count
+
+    def _write(
+        self,
+        cursor: Any,
+        table: str,
+        columns: Sequence[str],
+        rows: List[Sequence[Any]],
+        insert_statement: str,
+        row_template: str,
+        set_clause: str = "",
+    ) -> Tuple[int, int]:
+        if self.strategy == STRATEGY_LOAD_DATA:
+            try:
+                return self._load_rows(cursor, table, columns, rows, set_clause), 1
+            except (pymysql.err.OperationalError, pymysql.err.InternalError, pymysql.err.ProgrammingError) as e:
+                if e.args and e.args[0] in _LOCAL_INFILE_DISABLED_ERRORS:
+                    logger.warning(
+                        "LOAD DATA LOCAL INFILE is disabled, falling back to multi-row INSERT",
+                        extra={"error": str(e)},
+                    )
+                    self.strategy = STRATEGY_INSERT
+                else:
+                    raise
+        return self._insert_rows(cursor, insert_statement, row_template, rows)
+
+    def upsert_videos(self, channel_id: int, videos: List[VideoRecord]) -> int:
+        """動画をupsertし、同じ一時テーブルから統計のスナップショットも追加する。書き込んだ動画数を返す"""
+        if not videos:
+            return 0
+        with self.connection.cursor() as cursor:
+            started = time.perf_counter()
+            self._ensure_staging(cursor, _STAGING_VIDEOS_TABLE)
+            staged, statements = self._write(
+                cursor,
+                _STAGING_VIDEOS_TABLE,
+                _STAGING_VIDEOS_COLUMNS,
+                [
+                    (
+                        video.video_id,
+                        video.title,
+                        video.description,
+                        video.published_at,
+                        video.duration_sec,
+                        video.tags_json,
+                        video_metadata_hash(video),
+                        video.view_count,
+                        video.like_count,
+                        video.comment_count,
+                    )
+                    for video in videos
+                ],
+                f"INSERT IGNORE INTO {_STAGING_VIDEOS_TABLE} ({', '.join(_STAGING_VIDEOS_COLUMNS)}) VALUES {{values}}",
+                "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            )
+            self._record(_STAGING_VIDEOS_TABLE, staged, statements, started)
+
+            # 未登録の動画とメタデータが変わった動画だけをupsertする
+            # （ON DUPLICATE KEY UPDATEの影響行数は新規1・更新2と数えられるため、件数は先に数える）
+            changed = f"""
+                FROM {_STAGING_VIDEOS_TABLE} s
+                LEFT JOIN videos v ON v.youtube_video_id = s.youtube_video_id
+                WHERE v.id IS NULL OR NOT (v.metadata_hash <=> s.metadata_hash)
+            """
+            started = time.perf_counter()
+            cursor.execute(f"SELECT COUNT(*) AS count {changed}")
+            written = cursor.fetchone()["count"]
+            if written:
+                cursor.execute(
+                    f"""
+                    INSERT INTO videos (
+                        channel_id, youtube_video_id, title, description,
+                        published_at, duration_sec, tags_json, metadata_hash
+                    )
+                    SELECT %s, s.youtube_video_id, s.title, s.description,
+                           s.published_at, s.duration_sec, s.tags_json, s.metadata_hash
+                    {changed}
+                    ON DUPLICATE KEY UPDATE
+                        title = s.title,
+                        description = s.description,
+                        published_at = s.published_at,
+                        duration_sec = s.duration_sec,
+                        tags_json = s.tags_json,
+                        metadata_hash = s.metadata_hash,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    (channel_id,),
+                )
+            self._record("videos", written, 2 if written else 1, started, skipped=staged - written)
+
+            self._append_changed_stats(
+                cursor,
+                f"""
+                SELECT v.id AS video_id, s.view_count, s.like_count, s.comment_count
+                FROM {_STAGING_VIDEOS_TABLE} s
+                JOIN videos v ON v.youtube_video_id = s.youtube_video_id
+                """,
+                staged,
+            )
+            self._update_latest_stats(cursor, _STAGING_VIDEOS_TABLE, "v.youtube_video_id = s.youtube_video_id")
+        logger.debug(
+            "Videos bulk upserted",
+            extra={"channel_id": channel_id, "count": staged, "written": written, "unchanged": staged - written, "strategy": self.strategy},
+        )
+        return written
+
+    def insert_stats(self, rows: List[Tuple[int, int, Optional[int], Optional[int]]]) -> int:
+        """
+        videos.idが解決済みの統計 (video_id, view_count, like_count, comment_count) を追記する。
+        変化の無い統計は書き込まない。追記した行数を返す。
+        """
+        if not rows:
+            return 0
+        with self.connection.cursor() as cursor:
+            started = time.perf_counter()
+            self._ensure_staging(cursor, _STAGING_STATS_TABLE)
+            staged, statements = self._write(
+                cursor,
+                _STAGING_STATS_TABLE,
+                _STATS_COLUMNS,
+                rows,
+                f"INSERT IGNORE INTO {_STAGING_STATS_TABLE} ({', '.join(_STATS_COLUMNS)}) VALUES {{values}}",
+                "(%s, %s, %s, %s)",
+            )
+            self._record(_STAGING_STATS_TABLE, staged, statements, started)
+            inserted = self._append_changed_stats(
+                cursor,
+                f"SELECT video_id, view_count, like_count, comment_count FROM {_STAGING_STATS_TABLE}",
+                staged,
+            )
+            self._update_latest_stats(cursor, _STAGING_STATS_TABLE, "v.id = s.video_id")
+        logger.debug("Video stats bulk inserted", extra={"count": inserted, "skipped": staged - inserted, "strategy": self.strategy})
+        return inserted
+
+
+def summarize_bulk_stats(stats_by_table: Dict[str, Dict[str, Any]], strategy: str = BULK_LOAD_STRATEGY) -> Dict[str, Any]:
+    """テーブルごとの書き込み行数・スキップした行数・文の数・所要時間とrows/sec"""
+    tables = {
+        table: {
+            **stats,
+            "seconds": round(stats["seconds"], 3),
+            "rows_per_sec": round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0,
+        }
+        for table, stats in stats_by_table.items()
+    }
+    # 一時テーブルへの投入時間は合計に含めるが、行数は実テーブルへの書き込みだけを数える
+    rows = sum(stats["rows"] for table, stats in stats_by_table.items() if not table.startswith("_"))
+    # 変化が無く書き込まなかった行数（videosのメタデータと統計のスナップショット）
+    skipped = sum(stats["skipped"] for stats in stats_by_table.values())
+    seconds = sum(stats["seconds"] for stats in stats_by_table.values())
+    return {
+        "strategy": strategy,
+        "rows": rows,
+        "skipped": skipped,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+        "tables": tables,
+    }
+
+
+def video_metadata_hash(video: VideoRecord) -> str:
+    """videosに保存するメタデータ（統計以外）のSHA-1。値が同じなら同じハッシュになる"""
+    payload = json.dumps(
+        [
+            video.title,
+            video.description,
+            video.published_at.isoformat() if video.published_at else None,
+            video.duration_sec,
+            video.tags_json,
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _tsv_field(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
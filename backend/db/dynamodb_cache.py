@@ -1,14 +1,24 @@
 import boto3
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Tuple
 
 from common.logger import get_logger
-from constants.config import DYNAMODB_TABLE_NAME, MIN_FETCH_INTERVAL
+from constants.config import DYNAMODB_TABLE_NAME, MIN_FETCH_INTERVAL, QUOTA_LEDGER_RETENTION_DAYS
 
 logger = get_logger(__name__)
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
+# video_chunk_etagsは1チャンク100バイト前後になるため、項目サイズの上限（400KB）に届かないよう
+# この件数ずつ別の項目（"{チャンネルID}#chunk_etags#{番号}"）に分けて保存する
+CHUNK_ETAGS_PER_ITEM = 500
+# failed_video_ids（動画ID 1件20バイト前後）も同じく"{チャンネルID}#failed_video_ids#{番号}"に分けて保存する
+FAILED_VIDEO_IDS_PER_ITEM = 10000
+# batch_get_itemで1回に読める項目数
+_BATCH_GET_MAX_KEYS = 100
+# クォータ台帳の項目で予約を表す属性名の接頭辞
+QUOTA_RESERVATION_PREFIX = "reservation_"
 
 def get_last_fetched_at(youtube_channel_id: str) -> Optional[int]:
     try:
@@ -68,16 +78,206 @@ def should_fetch(youtube_channel_id: str) -> bool:
         return True
 
 
-def update_cache(youtube_channel_id: str, etag: Optional[str] = None) -> None:
+def _from_dynamodb(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _from_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_dynamodb(v) for v in value]
+    return value
+
+
+def _shard_key(youtube_channel_id: str, attribute: str, index: int) -> str:
+    return f"{youtube_channel_id}#{attribute}#{index}"
+
+
+def _get_shards(youtube_channel_id: str, attribute: str, shard_count: int) -> List[Any]:
+    """分割して保存したattributeの値を番号順に返す"""
+    keys = [{"youtube_channel_id": _shard_key(youtube_channel_id, attribute, index)} for index in range(shard_count)]
+    shards: Dict[str, Any] = {}
+    for start in range(0, len(keys), _BATCH_GET_MAX_KEYS):
+        request = {DYNAMODB_TABLE_NAME: {"Keys": keys[start : start + _BATCH_GET_MAX_KEYS]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(DYNAMODB_TABLE_NAME, []):
+                shards[item["youtube_channel_id"]] = _from_dynamodb(item.get(attribute))
+            request = response.get("UnprocessedKeys")
+    return [shards[key["youtube_channel_id"]] for key in keys if shards.get(key["youtube_channel_id"]) is not None]
+
+
+def _put_shards(youtube_channel_id: str, attribute: str, shards: List[Any]) -> int:
+    """shardsを1件ずつ別の項目に書き込み、項目数を返す"""
+    with table.batch_writer() as batch:
+        for index, shard in enumerate(shards):
+            batch.put_item(Item={"youtube_channel_id": _shard_key(youtube_channel_id, attribute, index), attribute: shard})
+    return len(shards)
+
+
+def _delete_shards(youtube_channel_id: str, attribute: str, start: int, stop: int) -> None:
+    with table.batch_writer() as batch:
+        for index in range(start, stop):
+            batch.delete_item(Key={"youtube_channel_id": _shard_key(youtube_channel_id, attribute, index)})
+
+
+def _split(values: List[Any], size: int) -> List[List[Any]]:
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+# 分割して保存する属性と、チャンネルの項目に保存する項目数の属性名
+_SHARDED_ATTRIBUTES = {
+    "video_chunk_etags": "video_chunk_etag_shards",
+    "failed_video_ids": "failed_video_id_shards",
+}
+
+
+def get_cache_entry(youtube_channel_id: str) -> Dict[str, Any]:
+    """チャンネルのキャッシュ項目（etag, video_chunk_etagsなど）を取得。失敗時は空dict"""
+    try:
+        response = table.get_item(Key={"youtube_channel_id": youtube_channel_id})
+        entry = _from_dynamodb(response.get("Item", {}))
+        shard_count = entry.pop("video_chunk_etag_shards", None)
+        if shard_count is not None:
+            entry["video_chunk_etags"] = {}
+            for shard in _get_shards(youtube_channel_id, "video_chunk_etags", shard_count):
+                entry["video_chunk_etags"].update(shard)
+        shard_count = entry.pop("failed_video_id_shards", None)
+        if shard_count is not None:
+            entry["failed_video_ids"] = [
+                video_id for shard in _get_shards(youtube_channel_id, "failed_video_ids", shard_count) for video_id in shard
+            ]
+        return entry
+    except Exception as e:
+        # ETagは最適化のためのものなので、取得できなければ通常の取得にフォールバックする
+        logger.error(f"Error getting cache entry from DynamoDB: {str(e)}", exc_info=True)
+        return {}
+
+
+def update_cache(
+    youtube_channel_id: str,
+    etag: Optional[str] = None,
+    video_chunk_etags: Optional[Dict[str, Dict[str, Any]]] = None,
+    full_sync: bool = False,
+    metadata_sync: bool = False,
+    failed_video_ids: Optional[List[str]] = None,
+) -> None:
     current_time = int(datetime.now(timezone.utc).timestamp() * 1000)
-    item: Dict[str, Any] = {
-        "youtube_channel_id": youtube_channel_id,
-        "last_fetched_at": current_time,
-    }
+    attributes: Dict[str, Any] = {"last_fetched_at": current_time}
+    if full_sync:
+        attributes["last_full_sync_at"] = current_time
+    if metadata_sync:
+        attributes["last_metadata_sync_at"] = current_time
     if etag:
-        item["etag"] = etag
+        attributes["etag"] = etag
+    # 大きくなりうる属性は先に分割した項目を書き込んでから、チャンネルの項目の項目数を差し替える
+    removed = []
+    if video_chunk_etags is not None:
+        attributes["video_chunk_etag_shards"] = _put_shards(
+            youtube_channel_id, "video_chunk_etags", [dict(shard) for shard in _split(list(video_chunk_etags.items()), CHUNK_ETAGS_PER_ITEM)]
+        )
+        removed.append("video_chunk_etags")
+    if failed_video_ids is not None:
+        attributes["failed_video_id_shards"] = _put_shards(
+            youtube_channel_id, "failed_video_ids", _split(failed_video_ids, FAILED_VIDEO_IDS_PER_ITEM)
+        )
+        removed.append("failed_video_ids")
+    # 以前の形式（チャンネルの項目に直接保存していたもの）は消す
+    update_expression = f" REMOVE {', '.join(removed)}" if removed else ""
 
     logger.debug("Updating cache in DynamoDB", extra={"youtube_channel_id": youtube_channel_id, "last_fetched_at": current_time})
-    table.put_item(Item=item)
+    # put_itemだと渡していない属性が消えるため、指定した属性だけを更新する
+    response = table.update_item(
+        Key={"youtube_channel_id": youtube_channel_id},
+        UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in attributes) + update_expression,
+        ExpressionAttributeNames={f"#{name}": name for name in attributes},
+        ExpressionAttributeValues={f":{name}": value for name, value in attributes.items()},
+        ReturnValues="UPDATED_OLD",
+    )
+    # 項目数が減った場合は使われなくなった項目を消す
+    previous = response.get("Attributes", {})
+    for attribute, count_attribute in _SHARDED_ATTRIBUTES.items():
+        if count_attribute in attributes:
+            _delete_shards(youtube_channel_id, attribute, attributes[count_attribute], int(previous.get(count_attribute, 0)))
     logger.debug("Cache updated successfully", extra={"youtube_channel_id": youtube_channel_id})
 
+
+def _quota_ledger_key(day: str, ledger: Optional[str]) -> str:
+    return f"quota#{ledger}#{day}" if ledger else f"quota#{day}"
+
+
+def update_quota_ledger(
+    day: str,
+    spent: int = 0,
+    reservations: Optional[Dict[str, Dict[str, int]]] = None,
+    released: Optional[List[str]] = None,
+    ledger: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    YouTube APIの日次クォータの台帳を更新し、(実際に使ったユニットの合計, 有効な予約ユニットの合計)を返す。
+    複数のLambdaコンテナで台帳を共有するため、チャンネル用テーブルに日付キーの項目として保存する。
+    ledgerにはAPIキーの識別子を渡し、キーごとに別の台帳にする。
+    spentはused_unitsにアトミックに加算する。reservationsは予約ID -> {"units", "expires_at"}で、
+    台帳の項目に"reservation_<予約ID>"の属性として書き（同じIDなら上書き）、releasedの予約は消す。
+    expires_atを過ぎた予約は合計に含めず、項目からも消す（Lambdaのタイムアウトなどで返却されなかった予約が残らない）。
+    台帳の項目にはexpires_at（QUOTA_LEDGER_RETENTION_DAYS日後のUNIX秒）を付け、TTLで消えるようにする。
+    """
+    reservations = reservations or {}
+    released = released or []
+    now = int(datetime.now(timezone.utc).timestamp())
+    names: Dict[str, str] = {}
+    values: Dict[str, Any] = {
+        ":spent": spent,
+        ":expires_at": now + QUOTA_LEDGER_RETENTION_DAYS * 86400,
+    }
+    set_clauses = ["expires_at = if_not_exists(expires_at, :expires_at)"]
+    for i, (reservation_id, reservation) in enumerate(reservations.items()):
+        names[f"#r{i}"] = QUOTA_RESERVATION_PREFIX + reservation_id
+        values[f":r{i}"] = reservation
+        set_clauses.append(f"#r{i} = :r{i}")
+    update_expression = "ADD used_units :spent SET " + ", ".join(set_clauses)
+    if released:
+        for i, reservation_id in enumerate(released):
+            names[f"#d{i}"] = QUOTA_RESERVATION_PREFIX + reservation_id
+        update_expression += " REMOVE " + ", ".join(f"#d{i}" for i in range(len(released)))
+
+    item_key = _quota_ledger_key(day, ledger)
+    kwargs: Dict[str, Any] = {}
+    if names:
+        kwargs["ExpressionAttributeNames"] = names
+    response = table.update_item(
+        Key={"youtube_channel_id": item_key},
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=values,
+        ReturnValues="ALL_NEW",
+        **kwargs,
+    )
+    item = response["Attributes"]
+
+    reserved = 0
+    expired: List[str] = []
+    for name, reservation in item.items():
+        if not name.startswith(QUOTA_RESERVATION_PREFIX):
+            continue
+        if int(reservation["expires_at"]) <= now:
+            expired.append(name)
+        else:
+            reserved += int(reservation["units"])
+    if expired:
+        _remove_expired_reservations(item_key, expired, now)
+    return int(item.get("used_units", 0)), reserved
+
+
+def _remove_expired_reservations(item_key: str, names: List[str], now: int) -> None:
+    """期限切れの予約を消す。読んでから消すまでの間に延長された予約は消さない"""
+    attribute_names = {f"#x{i}": name for i, name in enumerate(names)}
+    try:
+        table.update_item(
+            Key={"youtube_channel_id": item_key},
+            UpdateExpression="REMOVE " + ", ".join(attribute_names),
+            ConditionExpression=" AND ".join(f"{placeholder}.expires_at <= :now" for placeholder in attribute_names),
+            ExpressionAttributeNames=attribute_names,
+            ExpressionAttributeValues={":now": now},
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return
+    logger.info("Removed expired quota reservations", extra={"ledger_item": item_key, "reservations": len(names)})
@@ -0,0 +1,195 @@
+"""
+SQLの実行時間の計測。get_db_connection / get_read_connection の接続はInstrumentedCursorを使い、
+文ごとの実行時間と返した・変更した行数を、リテラルを?に置き換えた文の指紋ごとのヒストグラムに集計する。
+DB_SLOW_QUERY_MSを超えた文は指紋とパラメータ数（SELECTならEXPLAINの結果も）をログに出す。
+パラメータにはユーザーのデータが入るため、値そのものはログに出さない。
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+import pymysql
+
+from common.logger import get_logger
+from constants.config import DB_SLOW_QUERY_MS, DB_SLOW_QUERY_EXPLAIN
+
+logger = get_logger(__name__)
+
+# ヒストグラムのバケットの上限（ミリ秒）。最後のバケットはそれより遅いもの全部
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+FINGERPRINT_MAX_LENGTH = 300
+# 正規化する前に文をこの長さで切る（BulkLoaderの1MB近いINSERTでも正規化の手間が一定になる）
+FINGERPRINT_SCAN_LENGTH = 4096
+# これより長い文（大きなIN (...) など）はEXPLAINしない
+EXPLAIN_MAX_STATEMENT_LENGTH = 100000
+
+_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w])")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUE_LISTS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+# 切った位置より後ろに閉じる側がある文字列・コメントと、閉じていない括弧の中身
+_UNTERMINATED = re.compile(r"(?:['\"]|/\*).*\Z", re.S)
+_PARTIAL_GROUP = re.compile(r"\s*\([^()]*\Z")
+# EXPLAINする文（読み取りのみ）
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+
+
+def fingerprint(statement: str) -> str:
+    """
+    リテラル・プレースホルダを?に、IN (...) やVALUESの並びを1つにまとめた文（同じ形の文は同じ指紋になる）。
+    長い文は先頭FINGERPRINT_SCAN_LENGTH文字だけを正規化する。途中で切れた文字列は値が残らないよう?にし、
+    途中で切れた括弧は(...)にする（長いIN (...) やVALUESの並びも短い文と同じ指紋になる）。
+    """
+    truncated = len(statement) > FINGERPRINT_SCAN_LENGTH
+    text = _COMMENT.sub(" ", statement[:FINGERPRINT_SCAN_LENGTH])
+    text = _STRING.sub("?", text)
+    if truncated:
+        text = _UNTERMINATED.sub(lambda m: "" if m.group(0).startswith("/*") else "?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    if truncated:
+        text = _PARTIAL_GROUP.sub(" (...)", text)
+    text = _VALUE_LIST.sub("(...)", text)
+    text = _VALUE_LISTS.sub("(...)", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text[:FINGERPRINT_MAX_LENGTH]
+
+
+class _FingerprintStats:
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms: float, rows: int) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """ヒストグラムから求めた分位点（そのバケットの上限、ミリ秒）"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "rows": self.rows,
+            "histogram": {
+                (f"<={bound}ms" if index < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}ms"): count
+                for index, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.buckets))
+                if count
+            },
+        }
+
+
+class QueryStats:
+    """指紋ごとの実行回数・実行時間のヒストグラム・行数（プロセス内、スレッドセーフ）"""
+
+    def __init__(self):
+        self._stats: Dict[str, _FingerprintStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement_fingerprint: str, elapsed_ms: float, rows: int) -> None:
+        with self._lock:
+            stats = self._stats.get(statement_fingerprint)
+            if stats is None:
+                stats = self._stats[statement_fingerprint] = _FingerprintStats()
+            stats.add(elapsed_ms, rows)
+
+    def snapshot(self, top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """合計時間の長い順の指紋ごとの統計"""
+        with self._lock:
+            items = [{"fingerprint": key, **stats.to_dict()} for key, stats in self._stats.items()]
+        items.sort(key=lambda item: item["total_ms"], reverse=True)
+        return items[:top_n] if top_n else items
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+query_stats = QueryStats()
+
+
+def get_query_stats(top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+    return query_stats.snapshot(top_n)
+
+
+class InstrumentedCursor(pymysql.cursors.DictCursor):
+    """
+    文ごとの実行時間・行数を記録するDictCursor。
+    executemanyも内部でexecuteを呼ぶため、まとめたINSERTの1文ごとに記録される。
+    """
+
+    slow_query_ms: float = DB_SLOW_QUERY_MS
+    explain_slow_queries: bool = DB_SLOW_QUERY_EXPLAIN
+
+    def execute(self, query: str, args: Any = None) -> int:
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        statement_fingerprint = fingerprint(query)
+        # SELECTは返した行数、INSERT/UPDATE/DELETEは変更した行数
+        query_stats.record(statement_fingerprint, elapsed_ms, self.rowcount)
+        if self.slow_query_ms and elapsed_ms >= self.slow_query_ms:
+            self._log_slow_query(query, args, statement_fingerprint, elapsed_ms)
+        return result
+
+    def _log_slow_query(self, query: str, args: Any, statement_fingerprint: str, elapsed_ms: float) -> None:
+        plan = None
+        if self.explain_slow_queries and _EXPLAINABLE.match(query):
+            try:
+                plan = self._explain(self.mogrify(query, args))
+            except Exception as e:
+                logger.debug("EXPLAIN failed", extra={"error": str(e)})
+        logger.warning(
+            "Slow query",
+            extra={
+                "elapsed_ms": round(elapsed_ms, 1),
+                "rows": self.rowcount,
+                "fingerprint": statement_fingerprint,
+                "param_count": _param_count(args),
+                "plan": plan,
+            },
+        )
+
+    def _explain(self, statement: str) -> Optional[List[Dict[str, Any]]]:
+        """同じ接続でEXPLAINを実行する（計測用のカーソルは使わず、結果も記録しない）"""
+        if len(statement) > EXPLAIN_MAX_STATEMENT_LENGTH:
+            return None
+        with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(f"EXPLAIN {statement}")
+            return list(cursor.fetchall())
+
+
+def _param_count(args: Any) -> int:
+    if args is None:
+        return 0
+    if isinstance(args, (list, tuple, dict)):
+        return len(args)
+    return 1
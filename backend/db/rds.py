@@ -1,38 +1,343 @@
+import atexit
+import threading
+import time
 import pymysql
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from contextlib import contextmanager
 
 from common.logger import get_logger
-from constants.config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from constants.config import (
+    DB_HOST,
+    DB_USER,
+    DB_PASSWORD,
+    DB_NAME,
+    BULK_LOAD_STRATEGY,
+    DB_CONNECTION_REUSE,
+    DB_CONNECTION_MAX_AGE,
+    DB_CONNECTION_MAX_USES,
+    DB_CONNECTION_PING_INTERVAL,
+    DB_CONNECTION_POOL_SIZE,
+    DB_READER_HOST,
+    DB_READER_MAX_LAG_SECONDS,
+    DB_READER_LAG_CHECK_INTERVAL,
+    DB_READER_ALLOW_UNKNOWN_LAG,
+    DB_QUERY_STATS,
+)
+from db.query_stats import InstrumentedCursor
 
 logger = get_logger(__name__)
 
+# 接続そのものが使えなくなったことを示すエラー（この接続は使い回さずに捨てる）
+_BROKEN_CONNECTION_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+
+
+def _connect(host: Optional[str] = DB_HOST) -> Any:
+    logger.debug("Connecting to database", extra={"host": host, "database": DB_NAME})
+    connection = pymysql.connect(
+        host=host,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        # 文ごとの実行時間を記録し、遅い文はEXPLAIN付きでログに出す（db/query_stats.py）
+        cursorclass=InstrumentedCursor if DB_QUERY_STATS else pymysql.cursors.DictCursor,
+        autocommit=False,
+        # バルクロードでLOAD DATA LOCAL INFILEを使う場合のみ許可する
+        local_infile=BULK_LOAD_STRATEGY == "load_data",
+    )
+    logger.debug("Database connection established")
+    return connection
+
+
+def _close(connection: Any) -> None:
+    try:
+        connection.close()
+    except Exception as e:
+        logger.debug("Failed to close database connection", extra={"error": str(e)})
+    logger.debug("Database connection closed")
+
+
+class _PooledConnection:
+    def __init__(self, connection: Any):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.uses = 0
+
+
+class ConnectionManager:
+    """
+    Lambdaのウォームスタート間・Streamlitの再実行間で接続を使い回すプロセス内のプール。
+    Streamlitは再実行ごとに別のスレッドでスクリプトを動かすため、接続はスレッドごとではなくプロセス全体で共有し、
+    使っていない接続を最大pool_size本まで残す（それを超えて返された接続は閉じる）。
+    使い回す前に、max_ageを過ぎた・max_uses回使った接続は閉じて張り直し、
+    ping_interval秒以上使われていなかった接続はpingで確認して切れていれば張り直す。
+    同じスレッドでget_db_connectionを入れ子に使った場合は、プールから別の接続が渡る。
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = DB_HOST,
+        reuse: bool = DB_CONNECTION_REUSE,
+        max_age: int = DB_CONNECTION_MAX_AGE,
+        max_uses: int = DB_CONNECTION_MAX_USES,
+        ping_interval: int = DB_CONNECTION_PING_INTERVAL,
+        pool_size: int = DB_CONNECTION_POOL_SIZE,
+    ):
+        self.host = host
+        self.reuse = reuse
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.ping_interval = ping_interval
+        self.pool_size = pool_size
+        # 使っていない接続（最後に返したものから使う）と、貸し出し中の接続
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._stats = {"connects": 0, "reuses": 0, "pings": 0, "reconnects": 0, "retired": 0, "discarded": 0, "overflow": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _new_connection(self) -> Any:
+        connection = _connect(self.host)
+        self._count("connects")
+        return connection
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at >= self.max_age or pooled.uses >= self.max_uses:
+            logger.debug("Retiring database connection", extra={"uses": pooled.uses, "age_sec": round(now - pooled.created_at, 1)})
+            self._count("retired")
+            return False
+        if now - pooled.last_used_at >= self.ping_interval:
+            self._count("pings")
+            try:
+                pooled.connection.ping(reconnect=False)
+            except Exception as e:
+                logger.info("Database connection lost, reconnecting", extra={"error": str(e)})
+                self._count("reconnects")
+                return False
+        return True
+
+    def acquire(self) -> Any:
+        """接続を取り出す。使い終わったらrelease()に渡す"""
+        if not self.reuse:
+            return self._new_connection()
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                pooled = _PooledConnection(self._new_connection())
+                break
+            # pingはロックの外で行い、他のスレッドの取り出しを待たせない
+            if self._is_usable(pooled):
+                self._count("reuses")
+                break
+            _close(pooled.connection)
+        pooled.uses += 1
+        with self._lock:
+            self._in_use[id(pooled.connection)] = pooled
+        return pooled.connection
+
+    def release(self, connection: Any, broken: bool = False) -> None:
+        """acquire()した接続を返す。brokenなら閉じて捨てる"""
+        with self._lock:
+            pooled = self._in_use.pop(id(connection), None)
+        if pooled is None:
+            # 再利用しない設定の接続
+            _close(connection)
+            return
+        if broken:
+            self._count("discarded")
+            _close(connection)
+            return
+        pooled.last_used_at = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(pooled)
+                return
+        self._count("overflow")
+        _close(connection)
+
+    def close(self) -> None:
+        """使っていない接続をすべて閉じる（貸し出し中の接続は返されたときにプールに戻る）"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            _close(pooled.connection)
+
+    def get_stats(self) -> Dict[str, int]:
+        """新規接続数と再利用回数などの統計"""
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle), "in_use": len(self._in_use)}
+
+
+class ReplicaLagMonitor:
+    """
+    リードレプリカの遅延を調べ、max_lag秒以内ならレプリカから読んでよいと判断する。
+    問い合わせはcheck_interval秒に1回だけ行い、その間は前回の結果を使う。
+    権限が無いなどで遅延が取れない場合は、遅延不明としてプライマリから読む（allow_unknown_lag=Trueならレプリカから読む）。
+    """
+
+    def __init__(
+        self,
+        max_lag: float = DB_READER_MAX_LAG_SECONDS,
+        check_interval: int = DB_READER_LAG_CHECK_INTERVAL,
+        allow_unknown_lag: bool = DB_READER_ALLOW_UNKNOWN_LAG,
+    ):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.allow_unknown_lag = allow_unknown_lag
+        self._unknown_lag_logged = False
+        self._lag: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _query_lag(connection: Any) -> float:
+        """
+        SHOW REPLICA STATUS（MySQL 8.0.22未満はSHOW SLAVE STATUS）のレプリケーション遅延（秒）。
+        レプリカの状態が返らない（Auroraのリーダーなど、サーバー側で遅延を管理する）場合は0とし、
+        レプリケーションが止まっている（遅延がNULL）場合は無限大とする。
+        """
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except pymysql.err.ProgrammingError:
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+        if not row:
+            return 0.0
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return float("inf") if lag is None else float(lag)
+
+    def is_acceptable(self, connection: Any) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                try:
+                    self._lag = self._query_lag(connection)
+                except Exception as e:
+                    self._lag = self._unknown_lag(e)
+                self._checked_at = now
+                if self._lag > self.max_lag:
+                    logger.warning("Replica lag exceeds limit, reading from primary", extra={"lag": self._lag, "max_lag": self.max_lag})
+            return self._lag <= self.max_lag
+
+    def _unknown_lag(self, error: Exception) -> float:
+        if not self.allow_unknown_lag:
+            logger.warning("Failed to check replica lag, reading from primary", extra={"error": str(error)})
+            return float("inf")
+        # 遅延が分からないままレプリカから読み続ける設定であることを一度だけ目立つように残す
+        if not self._unknown_lag_logged:
+            logger.error(
+                "Failed to check replica lag, reading from replica (DB_READER_ALLOW_UNKNOWN_LAG)",
+                extra={"error": str(error)},
+            )
+            self._unknown_lag_logged = True
+        return 0.0
+
+    @property
+    def lag(self) -> Optional[float]:
+        return self._lag
+
+
+_connection_manager = ConnectionManager()
+# DB_READER_HOSTが未設定なら読み取りもプライマリに送る
+_reader_manager: Optional[ConnectionManager] = ConnectionManager(host=DB_READER_HOST) if DB_READER_HOST else None
+_replica_lag_monitor = ReplicaLagMonitor()
+_read_stats = {"replica": 0, "primary": 0, "lag_fallbacks": 0}
+_read_stats_lock = threading.Lock()
+
+
+def _count_read(name: str) -> None:
+    with _read_stats_lock:
+        _read_stats[name] += 1
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """プライマリ・レプリカそれぞれの新規接続数と再利用回数などの統計と、読み取りの振り分け件数"""
+    with _read_stats_lock:
+        reads = dict(_read_stats)
+    return {
+        "primary": _connection_manager.get_stats(),
+        "reader": _reader_manager.get_stats() if _reader_manager else None,
+        "reads": reads,
+        "replica_lag": _replica_lag_monitor.lag,
+    }
+
+
+def close_db_connection() -> None:
+    _connection_manager.close()
+    if _reader_manager:
+        _reader_manager.close()
+
+
+# プロセスの終了時に使っていない接続を閉じる（サーバー側で中断されたクライアントとして残さない）
+atexit.register(close_db_connection)
+
 
 @contextmanager
-def get_db_connection():
-    connection = None
+def _transaction(manager: ConnectionManager, connection: Optional[Any] = None, read_only: bool = False):
+    broken = False
     try:
-        logger.debug("Connecting to database", extra={"host": DB_HOST, "database": DB_NAME})
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=False,
-        )
-        logger.debug("Database connection established")
+        if connection is None:
+            connection = manager.acquire()
+        if read_only:
+            with connection.cursor() as cursor:
+                cursor.execute("START TRANSACTION READ ONLY")
         yield connection
         connection.commit()
         logger.debug("Database transaction committed")
     except Exception as e:
         logger.error("Database error occurred", extra={"error": str(e), "error_type": type(e).__name__}, exc_info=True)
+        broken = isinstance(e, _BROKEN_CONNECTION_ERRORS)
         if connection:
-            connection.rollback()
-            logger.debug("Database transaction rolled back")
+            try:
+                connection.rollback()
+                logger.debug("Database transaction rolled back")
+            except Exception as rollback_error:
+                logger.warning("Database rollback failed", extra={"error": str(rollback_error)})
+                broken = True
         raise
     finally:
         if connection:
-            connection.close()
-            logger.debug("Database connection closed")
+            manager.release(connection, broken=broken)
+
 
+@contextmanager
+def get_db_connection():
+    """
+    プライマリへの接続。with文を正常に抜けるとコミットし、例外が出た場合はロールバックする。
+    接続は閉じずにプロセス内で使い回す（ConnectionManager）。
+    書き込みと、書き込んだ直後の読み出し（read-after-write）はこちらを使う。
+    """
+    with _transaction(_connection_manager) as connection:
+        yield connection
+
+
+@contextmanager
+def get_read_connection():
+    """
+    読み取り専用の接続（READ ONLYトランザクション）。DB_READER_HOSTのリードレプリカに送り、
+    レプリカが未設定・遅延がDB_READER_MAX_LAG_SECONDSを超えている・接続できない場合はプライマリに送る。
+    レプリカは遅れて追いつくため、書き込んだばかりのデータを読む処理にはget_db_connectionを使う。
+    """
+    manager = _connection_manager
+    connection = None
+    if _reader_manager is not None:
+        try:
+            connection = _reader_manager.acquire()
+        except Exception as e:
+            logger.warning("Failed to connect to reader, reading from primary", extra={"error": str(e)})
+        if connection is not None:
+            if _replica_lag_monitor.is_acceptable(connection):
+                manager = _reader_manager
+            else:
+                _reader_manager.release(connection)
+                connection = None
+                _count_read("lag_fallbacks")
+    _count_read("replica" if manager is _reader_manager else "primary")
+    with _transaction(manager, connection, read_only=True) as connection:
+        yield connection
@@ -1,6 +1,8 @@
 CREATE TABLE channels (
   id BIGINT PRIMARY KEY AUTO_INCREMENT,
   youtube_channel_id VARCHAR(64) UNIQUE NOT NULL,
+  youtube_handle VARCHAR(100),
+  handle_resolved_at TIMESTAMP NULL,
   title VARCHAR(255) NOT NULL,
   description TEXT,
   published_at TIMESTAMP,
@@ -9,7 +11,8 @@ CREATE TABLE channels (
   view_count BIGINT,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  INDEX idx_youtube_channel_id (youtube_channel_id)
+  INDEX idx_youtube_channel_id (youtube_channel_id),
+  INDEX idx_youtube_handle (youtube_handle)
 );
 
 CREATE TABLE videos (
@@ -21,24 +24,86 @@ CREATE TABLE videos (
   published_at TIMESTAMP NOT NULL,
   duration_sec INT,
   tags_json JSON,
+  metadata_hash CHAR(40),
+  view_count BIGINT NOT NULL DEFAULT 0,
+  like_count BIGINT NOT NULL DEFAULT 0,
+  comment_count BIGINT NOT NULL DEFAULT 0,
+  stats_updated_at TIMESTAMP NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
   INDEX idx_channel_id (channel_id),
   INDEX idx_published_at (published_at),
-  INDEX idx_channel_published (channel_id, published_at)
+  INDEX idx_channel_published (channel_id, published_at),
+  INDEX idx_channel_views (channel_id, view_count),
+  INDEX idx_channel_likes (channel_id, like_count),
+  INDEX idx_channel_comments (channel_id, comment_count)
 );
 
+-- snapshot_atの月ごとのRANGEパーティション（パーティションの追加・削除は db/stats_partitions.py）。
+-- パーティション化したテーブルは外部キーを持てないため、video_idの外部キーは付けない
+-- （削除済みの動画の履歴は services/stats_rollup.py の compact_stats_history が消す）
 CREATE TABLE video_stats_history (
-  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  id BIGINT NOT NULL AUTO_INCREMENT,
   video_id BIGINT NOT NULL,
   snapshot_at TIMESTAMP NOT NULL,
   view_count BIGINT NOT NULL,
   like_count BIGINT,
   comment_count BIGINT,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-  FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+  PRIMARY KEY (id, snapshot_at),
   INDEX idx_video_snapshot (video_id, snapshot_at)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(snapshot_at)) (
+  PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE video_stats_hourly (
+  video_id BIGINT NOT NULL,
+  bucket_start DATETIME NOT NULL,
+  view_count BIGINT NOT NULL,
+  like_count BIGINT,
+  comment_count BIGINT,
+  last_snapshot_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (video_id, bucket_start),
+  FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+  INDEX idx_bucket_start (bucket_start)
+);
+
+CREATE TABLE video_stats_daily (
+  video_id BIGINT NOT NULL,
+  bucket_start DATETIME NOT NULL,
+  view_count BIGINT NOT NULL,
+  like_count BIGINT,
+  comment_count BIGINT,
+  last_snapshot_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (video_id, bucket_start),
+  FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+  INDEX idx_bucket_start (bucket_start)
+);
+
+CREATE TABLE video_stats_weekly (
+  video_id BIGINT NOT NULL,
+  bucket_start DATETIME NOT NULL,
+  view_count BIGINT NOT NULL,
+  like_count BIGINT,
+  comment_count BIGINT,
+  last_snapshot_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (video_id, bucket_start),
+  FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+  INDEX idx_bucket_start (bucket_start)
+);
+
+CREATE TABLE channel_summaries (
+  channel_id BIGINT PRIMARY KEY,
+  total_videos INT NOT NULL DEFAULT 0,
+  total_views BIGINT NOT NULL DEFAULT 0,
+  total_likes BIGINT NOT NULL DEFAULT 0,
+  total_comments BIGINT NOT NULL DEFAULT 0,
+  last_upload_at TIMESTAMP NULL,
+  last_fetched_at TIMESTAMP NULL,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE
 );
 
 
@@ -0,0 +1,177 @@
+"""
+video_stats_historyのsnapshot_atによる月単位のRANGEパーティション管理。
+パーティション名は p{YYYYMM}（その月の行を持つ）と、未来の行を受けるp_future（MAXVALUE）。
+snapshot_atはTIMESTAMP型のため、パーティション式にはUNIX_TIMESTAMP(snapshot_at)を使う。
+境界のUNIX_TIMESTAMP('YYYY-MM-01 00:00:00')はセッションのタイムゾーンで解釈されるため、
+パーティションを作る文はtime_zoneを'+00:00'に固定して実行する（月の区切りはUTC）。
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, List, Optional
+
+from common.logger import get_logger
+from constants.config import DB_NAME, STATS_PARTITION_MONTHS_AHEAD
+
+logger = get_logger(__name__)
+
+TABLE = "video_stats_history"
+FUTURE_PARTITION = "p_future"
+UTC_TIME_ZONE = "+00:00"
+
+
+@contextmanager
+def utc_session(cursor: Any) -> Iterator[None]:
+    """このブロックの間だけセッションのtime_zoneをUTCにする"""
+    cursor.execute("SELECT @@session.time_zone AS time_zone")
+    previous = cursor.fetchone()["time_zone"]
+    cursor.execute("SET time_zone = %s", (UTC_TIME_ZONE,))
+    try:
+        yield
+    finally:
+        cursor.execute("SET time_zone = %s", (previous,))
+
+
+def current_utc_timestamp(cursor: Any) -> datetime:
+    """パーティションの境界と比べるための現在時刻（セッションのtime_zoneによらずUTC）"""
+    cursor.execute("SELECT UTC_TIMESTAMP() AS now")
+    return cursor.fetchone()["now"]
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _partition_month(name: str) -> datetime:
+    return datetime.strptime(name[1:], "%Y%m")
+
+
+def _partition_definition(month: datetime) -> str:
+    upper = add_months(month, 1)
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d %H:%M:%S}'))"
+
+
+def partition_definitions(first_month: datetime, last_month: datetime) -> str:
+    """first_monthからlast_monthまでの月ごとのパーティションとp_futureの定義（PARTITION BY句の中身）"""
+    definitions = []
+    month = month_start(first_month)
+    while month <= last_month:
+        definitions.append(_partition_definition(month))
+        month = add_months(month, 1)
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return ",\n".join(definitions)
+
+
+def _all_partitions(cursor: Any) -> List[str]:
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (DB_NAME, TABLE),
+    )
+    return [row["PARTITION_NAME"] for row in cursor.fetchall()]
+
+
+def list_partitions(cursor: Any) -> List[str]:
+    """月ごとのパーティション名を古い順に返す（p_futureは含めない）"""
+    return [name for name in _all_partitions(cursor) if name != FUTURE_PARTITION]
+
+
+def is_partitioned(cursor: Any) -> bool:
+    return bool(_all_partitions(cursor))
+
+
+def ensure_future_partitions(cursor: Any, now: datetime, months_ahead: int = STATS_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    現在の月（nowはUTC）からmonths_ahead月先までのパーティションが無ければ、p_futureを分割して作る。
+    p_futureに行が入る前に実行していれば、REORGANIZEはデータを移動しないため軽い。作ったパーティション名を返す。
+    """
+    partitions = _all_partitions(cursor)
+    if not partitions:
+        return []
+    monthly = [name for name in partitions if name != FUTURE_PARTITION]
+    # p_futureしか無い（schema.sqlから作った）場合は今月のパーティションから作る
+    last_month = _partition_month(monthly[-1]) if monthly else add_months(month_start(now), -1)
+    target_month = add_months(month_start(now), months_ahead)
+    if last_month >= target_month:
+        return []
+
+    new_months = []
+    month = add_months(last_month, 1)
+    while month <= target_month:
+        new_months.append(month)
+        month = add_months(month, 1)
+    definitions = [_partition_definition(month) for month in new_months]
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    with utc_session(cursor):
+        cursor.execute(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+        )
+    created = [partition_name(month) for month in new_months]
+    logger.info("Stats history partitions created", extra={"partitions": created})
+    return created
+
+
+def droppable_partitions(cursor: Any, cutoff: datetime) -> List[str]:
+    """行がすべてcutoff（UTC）より古い（翌月の月初がcutoff以前の）パーティション名"""
+    return [
+        name
+        for name in list_partitions(cursor)
+        if add_months(_partition_month(name), 1) <= cutoff
+    ]
+
+
+def partition_upper_bound(name: str) -> datetime:
+    """パーティションに入る行のsnapshot_atの上限（この日時より前、UTC）"""
+    return add_months(_partition_month(name), 1)
+
+
+def drop_partitions(cursor: Any, names: List[str]) -> None:
+    """DROP PARTITIONは行ごとのDELETEと違い、パーティションのファイルを消すだけで終わる"""
+    if not names:
+        return
+    cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(names)}")
+    logger.info("Stats history partitions dropped", extra={"partitions": names})
+
+
+def partition_existing_table(cursor: Any, now: datetime, months_ahead: int = STATS_PARTITION_MONTHS_AHEAD) -> Optional[str]:
+    """
+    パーティション化されていない既存のvideo_stats_historyを月単位のパーティションに組み替える（初回の1度だけ）。
+    パーティション化したテーブルは外部キーを持てず、パーティションキーを主キーに含める必要があるため、
+    外部キーを外して主キーを (id, snapshot_at) にしてから組み替える。
+    どちらのALTERもテーブル全体をコピーし、その間の書き込みを止めるため、メンテナンス時間に実行する
+    （止められない場合はpt-online-schema-change / gh-ostで同じ定義に組み替える）。
+    外部キーが無くなるため、削除済みの動画の履歴はcompact_stats_history（compact_stats）が消す。
+    """
+    if is_partitioned(cursor):
+        return None
+    cursor.execute(
+        """
+        SELECT CONSTRAINT_NAME
+        FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+        """,
+        (DB_NAME, TABLE),
+    )
+    for row in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {TABLE} DROP FOREIGN KEY {row['CONSTRAINT_NAME']}")
+    cursor.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, snapshot_at)")
+
+    cursor.execute(f"SELECT MIN(snapshot_at) AS oldest FROM {TABLE}")
+    oldest = cursor.fetchone()["oldest"] or now
+    definitions = partition_definitions(oldest, add_months(month_start(now), months_ahead))
+    with utc_session(cursor):
+        cursor.execute(f"ALTER TABLE {TABLE} PARTITION BY RANGE (UNIX_TIMESTAMP(snapshot_at)) ({definitions})")
+    logger.info("Stats history partitioned", extra={"oldest": oldest})
+    return partition_name(month_start(oldest))
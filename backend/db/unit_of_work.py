@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from common.logger import get_logger
+from db.bulk_loader import BulkLoader
+from db.rds import get_db_connection, get_read_connection
+
+logger = get_logger(__name__)
+
+
+class UnitOfWork:
+    """
+    1つの接続・1つのトランザクションで複数の読み書きをまとめる。
+    with文を正常に抜けるとコミットし、例外が出た場合はまとめてロールバックする。
+    channel_serviceの関数にuowとして渡すと、その関数は新しい接続を開かずにこの接続を使う。
+    read_only=Trueなら読み取り専用の接続（リードレプリカ、get_read_connection）を使う。
+    bulk_statsを渡すと、BulkLoaderの書き込み統計をそのdictに合計する（複数のUnitOfWorkに分けて書き込む場合）。
+    """
+
+    def __init__(self, read_only: bool = False, bulk_stats: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.read_only = read_only
+        self.bulk_stats = bulk_stats
+        self.connection: Optional[Any] = None
+        self._context: Optional[Any] = None
+        self._bulk_loader: Optional[BulkLoader] = None
+
+    def __enter__(self) -> "UnitOfWork":
+        self._context = get_read_connection() if self.read_only else get_db_connection()
+        self.connection = self._context.__enter__()
+        logger.debug("Unit of work started")
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> Optional[bool]:
+        try:
+            return self._context.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.connection = None
+            self._context = None
+            self._bulk_loader = None
+            logger.debug("Unit of work finished", extra={"committed": exc_type is None})
+
+    @property
+    def bulk_loader(self) -> BulkLoader:
+        """この接続用のBulkLoader（一時テーブルと書き込み統計を接続の間使い回す）"""
+        if self.connection is None:
+            raise RuntimeError("UnitOfWork is not active")
+        if self.read_only:
+            raise RuntimeError("UnitOfWork is read-only")
+        if self._bulk_loader is None:
+            self._bulk_loader = BulkLoader(self.connection, stats=self.bulk_stats)
+        return self._bulk_loader
+
+
+@contextmanager
+def use_connection(uow: Optional[UnitOfWork] = None) -> Iterator[Any]:
+    """uowがあればその接続を、無ければ新しい接続（その場でコミットする単独のトランザクション）を返す"""
+    if uow is not None:
+        if uow.connection is None:
+            raise RuntimeError("UnitOfWork is not active")
+        yield uow.connection
+        return
+    with get_db_connection() as conn:
+        yield conn
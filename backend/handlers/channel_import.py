@@ -4,11 +4,13 @@ from typing import Dict, Any
 
 from common.response import success_response, error_response
 from common.logger import get_logger
-from utils.extract_channel_id import extract_channel_id, extract_handle
+from utils.extract_channel_id import extract_channel_id, extract_handle, normalize_handle
 from common.models import ChannelImportResponse, ChannelResponse, SummaryResponse
-from db.dynamodb_cache import should_fetch, update_cache
+from db.dynamodb_cache import should_fetch, update_cache, get_cache_entry
 from services.youtube_client import get_youtube_client
-from services.channel_service import import_channel_data, get_channel_by_youtube_id
+from services.quota import QuotaExceededError
+from services.channel_service import import_channel_data, get_channel_by_youtube_id, get_channel_summary
+from services.handle_resolver import resolve_channel_id_from_handle
 
 logger = get_logger(__name__)
 
@@ -56,15 +58,18 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         logger.info(f"Channel ID extracted: {youtube_channel_id}")
         
         # チャンネルIDが抽出できなかった場合、ハンドル名を試す
-        youtube_client = None
+        youtube_handle = None
         if not youtube_channel_id:
             handle = extract_handle(channel_url_or_id)
             if handle:
-                logger.info(f"Handle extracted: {handle}, fetching channel ID from YouTube API")
+                logger.info(f"Handle extracted: {handle}, resolving channel ID")
+                youtube_handle = normalize_handle(handle)
                 try:
-                    youtube_client = get_youtube_client()
-                    youtube_channel_id = youtube_client.get_channel_id_from_handle(handle)
+                    # 解決済みのハンドル名はキャッシュ・DBから引き、APIは未知のハンドル名のときだけ呼ぶ
+                    youtube_channel_id = resolve_channel_id_from_handle(handle, get_youtube_client)
                     logger.info(f"Channel ID fetched from handle: {youtube_channel_id}")
+                except QuotaExceededError:
+                    raise
                 except Exception as e:
                     logger.error(f"Failed to get channel ID from handle: {str(e)}", exc_info=True)
                     return error_response("INVALID_PARAMETER", f"ハンドル名からチャンネルIDを取得できませんでした: {str(e)}", 400)
@@ -78,12 +83,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         if not should_fetch_result:
             logger.info("Rate limit check: using cached data", extra={"youtube_channel_id": youtube_channel_id})
+            # 直前の取り込みの書き込みをレプリカがまだ反映していない可能性があるため、プライマリから読む
             existing_channel = get_channel_by_youtube_id(youtube_channel_id)
             if not existing_channel:
                 logger.warning("Channel not found in database", extra={"youtube_channel_id": youtube_channel_id})
                 return error_response("NOT_FOUND", "指定されたチャンネルが見つかりませんでした", 404)
 
             logger.info("Returning cached channel data", extra={"channel_id": existing_channel["id"]})
+            summary = get_channel_summary(existing_channel["id"])
             return success_response(
                 ChannelImportResponse(
                     channel=ChannelResponse(
@@ -97,23 +104,39 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         viewCount=existing_channel["view_count"],
                     ),
                     summary=SummaryResponse(
-                        totalViews=existing_channel["view_count"],
-                        totalVideos=existing_channel["video_count"],
-                        lastFetchedAt=datetime.now(),
+                        totalViews=summary["total_views"] if summary else existing_channel["view_count"],
+                        totalVideos=summary["total_videos"] if summary else existing_channel["video_count"],
+                        lastFetchedAt=summary["last_fetched_at"] if summary else datetime.now(),
                     ),
                 ).model_dump(mode="json")
             )
 
         logger.info("Fetching channel data from YouTube API", extra={"youtube_channel_id": youtube_channel_id})
-        if not youtube_client:
-            youtube_client = get_youtube_client()
-        import_result = import_channel_data(youtube_channel_id, youtube_client)
-        logger.info("Channel data imported successfully", extra={"channel_id": import_result["channel_id"], "total_videos": import_result["total_videos"]})
+        youtube_client = get_youtube_client()
+        cache_entry = get_cache_entry(youtube_channel_id)
+        # 取り込みはYouTube APIとの通信中にトランザクションを開かず、取得が終わってから1つのトランザクションで書き込む
+        import_result = import_channel_data(
+            youtube_channel_id,
+            youtube_client,
+            cache_entry=cache_entry,
+            youtube_handle=youtube_handle,
+        )
+        # 書き込んだ直後に読むため、レプリカではなくプライマリから読む
+        channel = get_channel_by_youtube_id(youtube_channel_id)
+        logger.info("Channel data imported successfully", extra={"channel_id": import_result["channel_id"], "total_videos": import_result["summary"]["total_videos"]})
+        if import_result["failed_video_ids"]:
+            logger.warning("Channel data partially imported", extra={"failed_videos": len(import_result["failed_video_ids"])})
         
-        update_cache(youtube_channel_id)
+        update_cache(
+            youtube_channel_id,
+            etag=import_result["etag"],
+            video_chunk_etags=import_result["video_chunk_etags"],
+            full_sync=import_result["full_sync"],
+            metadata_sync=import_result["metadata_sync"],
+            failed_video_ids=import_result["failed_video_ids"],
+        )
         logger.debug("Cache updated", extra={"youtube_channel_id": youtube_channel_id})
 
-        channel = get_channel_by_youtube_id(youtube_channel_id)
         if not channel:
             logger.error("Failed to retrieve channel after import", extra={"youtube_channel_id": youtube_channel_id})
             return error_response("INTERNAL_ERROR", "チャンネル情報の取得に失敗しました", 500)
@@ -130,9 +153,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 viewCount=channel["view_count"],
             ),
             summary=SummaryResponse(
-                totalViews=import_result["total_views"],
-                totalVideos=import_result["total_videos"],
-                lastFetchedAt=datetime.now(),
+                totalViews=import_result["summary"]["total_views"],
+                totalVideos=import_result["summary"]["total_videos"],
+                lastFetchedAt=import_result["summary"]["last_fetched_at"],
+                failedVideoCount=len(import_result["failed_video_ids"]),
             ),
         )
 
@@ -142,6 +166,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     except json.JSONDecodeError as e:
         logger.error("JSON decode error", extra={"error": str(e), "body": event.get("body")})
         return error_response("INVALID_REQUEST", "リクエストボディのJSON形式が不正です", 400)
+    except QuotaExceededError as e:
+        logger.warning("YouTube API quota exceeded", extra={"error": str(e)})
+        return error_response("QUOTA_EXCEEDED", "YouTube APIの利用上限に達しました。時間をおいて再度お試しください", 429)
     except ValueError as e:
         error_message = str(e)
         logger.warning("ValueError occurred", extra={"error": error_message})
@@ -0,0 +1,34 @@
+from typing import Dict, Any
+
+from common.response import success_response, error_response
+from common.logger import get_logger
+from common.models import StatsCompactionResponse
+from services.stats_rollup import compact_stats_history
+
+logger = get_logger(__name__)
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    定期実行用: STATS_RAW_RETENTION_DAYSより古い生のスナップショットを時間・日・週の集計に畳み込んでから削除し、
+    STATS_HOURLY_RETENTION_DAYSより古い時間単位の集計を削除する。
+    video_stats_historyのパーティションの追加（STATS_PARTITION_MONTHS_AHEAD月先まで）と削除もここで行う。
+    集計テーブルの導入時は {"backfill": true} で実行すると既存の履歴を全件集計する。
+    """
+    logger.info("compact_stats handler started", extra={"event": event})
+    try:
+        result = compact_stats_history(backfill=bool((event or {}).get("backfill")))
+        logger.info("compact_stats handler completed successfully", extra={"raw_deleted": result["raw_deleted"], "hourly_deleted": result["hourly_deleted"]})
+        response = StatsCompactionResponse(
+            rawCutoff=result["raw_cutoff"],
+            hourlyCutoff=result["hourly_cutoff"],
+            rolledUp=result["rolled_up"],
+            rawDeleted=result["raw_deleted"],
+            hourlyDeleted=result["hourly_deleted"],
+            createdPartitions=result["created_partitions"],
+            droppedPartitions=result["dropped_partitions"],
+        )
+        return success_response(response.model_dump(mode="json"))
+    except Exception as e:
+        logger.error("Unexpected error occurred", extra={"error": str(e), "error_type": type(e).__name__}, exc_info=True)
+        return error_response("INTERNAL_ERROR", "サーバーエラーが発生しました。しばらく待ってから再度お試しください", 500)
@@ -3,15 +3,101 @@
 このスクリプトはLambda関数として実行し、データベースとテーブルを作成します
 """
 import pymysql
+from datetime import datetime
 from typing import Dict, Any
 
 from constants.config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from db.stats_partitions import (
+    current_utc_timestamp,
+    ensure_future_partitions,
+    is_partitioned,
+    month_start,
+    partition_definitions,
+    partition_existing_table,
+    UTC_TIME_ZONE,
+)
+
+
+def _ensure_column(cursor: Any, table: str, column: str, definition: str) -> bool:
+    """既存テーブルに列が無ければ追加する（再実行しても安全なマイグレーション）。追加したらTrueを返す"""
+    cursor.execute(
+        """
+        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (DB_NAME, table, column),
+    )
+    if not cursor.fetchone():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"列 '{table}.{column}' を追加しました")
+        return True
+    return False
+
+
+def _ensure_index(cursor: Any, table: str, index: str, columns: str) -> None:
+    """既存テーブルにインデックスが無ければ追加する"""
+    cursor.execute(
+        """
+        SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """,
+        (DB_NAME, table, index),
+    )
+    if not cursor.fetchone():
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+        print(f"インデックス '{table}.{index}' を追加しました")
+
+
+def _backfill_video_stats(cursor: Any) -> None:
+    """videosの最新統計列をvideo_stats_historyの最新スナップショットから埋め、NOT NULLにする（初回の1度だけ）"""
+    cursor.execute(
+        """
+        UPDATE videos v
+        JOIN (
+            SELECT
+                video_id,
+                view_count,
+                like_count,
+                comment_count,
+                snapshot_at,
+                ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY snapshot_at DESC) as rn
+            FROM video_stats_history
+        ) latest_stats ON v.id = latest_stats.video_id AND latest_stats.rn = 1
+        SET v.view_count = latest_stats.view_count,
+            v.like_count = COALESCE(latest_stats.like_count, 0),
+            v.comment_count = COALESCE(latest_stats.comment_count, 0),
+            v.stats_updated_at = latest_stats.snapshot_at,
+            v.updated_at = v.updated_at
+        """
+    )
+    print(f"videosの最新統計を {cursor.rowcount} 件埋めました")
+    cursor.execute(
+        """
+        UPDATE videos
+        SET view_count = COALESCE(view_count, 0),
+            like_count = COALESCE(like_count, 0),
+            comment_count = COALESCE(comment_count, 0),
+            updated_at = updated_at
+        WHERE view_count IS NULL OR like_count IS NULL OR comment_count IS NULL
+        """
+    )
+    cursor.execute(
+        """
+        ALTER TABLE videos
+          MODIFY view_count BIGINT NOT NULL DEFAULT 0,
+          MODIFY like_count BIGINT NOT NULL DEFAULT 0,
+          MODIFY comment_count BIGINT NOT NULL DEFAULT 0
+        """
+    )
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda関数ハンドラー: データベースとテーブルを作成
+    既存のvideo_stats_historyのパーティション化はテーブル全体を書き換えるため、
+    {"partition_stats_history": true} を渡したときだけ行う
     """
+    partition_stats_history = bool((event or {}).get("partition_stats_history"))
     try:
         # まず、データベース名を指定せずに接続（MySQLサーバーに接続）
         connection = pymysql.connect(
@@ -19,6 +105,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             user=DB_USER,
             password=DB_PASSWORD,
             cursorclass=pymysql.cursors.DictCursor,
+            # パーティションの境界（UNIX_TIMESTAMP('YYYY-MM-01 ...')）をUTCで解釈させる
+            init_command=f"SET time_zone = '{UTC_TIME_ZONE}'",
         )
         
         try:
@@ -47,6 +135,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         CREATE TABLE channels (
                           id BIGINT PRIMARY KEY AUTO_INCREMENT,
                           youtube_channel_id VARCHAR(64) UNIQUE NOT NULL,
+                          youtube_handle VARCHAR(100),
+                          handle_resolved_at TIMESTAMP NULL,
                           title VARCHAR(255) NOT NULL,
                           description TEXT,
                           published_at TIMESTAMP,
@@ -55,10 +145,16 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                           view_count BIGINT,
                           created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                           updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                          INDEX idx_youtube_channel_id (youtube_channel_id)
+                          INDEX idx_youtube_channel_id (youtube_channel_id),
+                          INDEX idx_youtube_handle (youtube_handle)
                         )
                     """)
                     print("テーブル 'channels' を作成しました")
+
+                # 既存のchannelsテーブルにハンドル名のキャッシュ列を追加
+                _ensure_column(cursor, "channels", "youtube_handle", "VARCHAR(100) AFTER youtube_channel_id")
+                _ensure_column(cursor, "channels", "handle_resolved_at", "TIMESTAMP NULL AFTER youtube_handle")
+                _ensure_index(cursor, "channels", "idx_youtube_handle", "youtube_handle")
                 
                 # videosテーブルを作成
                 cursor.execute("SHOW TABLES LIKE 'videos'")
@@ -73,37 +169,125 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                           published_at TIMESTAMP NOT NULL,
                           duration_sec INT,
                           tags_json JSON,
-                          view_count BIGINT,
-                          like_count BIGINT,
-                          comment_count BIGINT,
+                          metadata_hash CHAR(40),
+                          view_count BIGINT NOT NULL DEFAULT 0,
+                          like_count BIGINT NOT NULL DEFAULT 0,
+                          comment_count BIGINT NOT NULL DEFAULT 0,
+                          stats_updated_at TIMESTAMP NULL,
                           thumbnail_url VARCHAR(512),
                           created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                           updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                           FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE,
                           INDEX idx_channel_id (channel_id),
                           INDEX idx_published_at (published_at),
-                          INDEX idx_channel_published (channel_id, published_at)
+                          INDEX idx_channel_published (channel_id, published_at),
+                          INDEX idx_channel_views (channel_id, view_count),
+                          INDEX idx_channel_likes (channel_id, like_count),
+                          INDEX idx_channel_comments (channel_id, comment_count)
                         )
                     """)
                     print("テーブル 'videos' を作成しました")
+
+                # 既存のvideosテーブルにメタデータのハッシュ列を追加（NULLの動画は次回の取り込みで一度だけ書き直される）
+                _ensure_column(cursor, "videos", "metadata_hash", "CHAR(40) AFTER tags_json")
                 
-                # video_stats_historyテーブルを作成
+                # video_stats_historyテーブルを作成（snapshot_atの月ごとのRANGEパーティション）
+                # パーティション化したテーブルは外部キーを持てないため、video_idの外部キーは付けない
+                now: datetime = current_utc_timestamp(cursor)
                 cursor.execute("SHOW TABLES LIKE 'video_stats_history'")
                 if not cursor.fetchone():
-                    cursor.execute("""
+                    partitions = partition_definitions(month_start(now), month_start(now))
+                    cursor.execute(f"""
                         CREATE TABLE video_stats_history (
-                          id BIGINT PRIMARY KEY AUTO_INCREMENT,
+                          id BIGINT NOT NULL AUTO_INCREMENT,
                           video_id BIGINT NOT NULL,
                           snapshot_at TIMESTAMP NOT NULL,
                           view_count BIGINT NOT NULL,
                           like_count BIGINT,
                           comment_count BIGINT,
                           created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                          FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+                          PRIMARY KEY (id, snapshot_at),
                           INDEX idx_video_snapshot (video_id, snapshot_at)
                         )
+                        PARTITION BY RANGE (UNIX_TIMESTAMP(snapshot_at)) (
+                          {partitions}
+                        )
                     """)
                     print("テーブル 'video_stats_history' を作成しました")
+                elif partition_stats_history:
+                    if partition_existing_table(cursor, now):
+                        print("テーブル 'video_stats_history' を月ごとのパーティションに組み替えました")
+                elif not is_partitioned(cursor):
+                    # 組み替えは書き込みを止めるため、メンテナンス時間に {"partition_stats_history": true} で実行する
+                    print("テーブル 'video_stats_history' はパーティション化されていません（compact_statsは行単位のDELETEで削除します）")
+                # 先の月のパーティションを用意しておく（以降はcompact_statsハンドラーが毎回追加する）
+                for name in ensure_future_partitions(cursor, now):
+                    print(f"パーティション 'video_stats_history.{name}' を作成しました")
+
+                # 既存のvideosテーブルに最新の統計列を追加し、追加したときだけ履歴から埋める
+                for column in ("view_count", "like_count", "comment_count"):
+                    _ensure_column(cursor, "videos", column, "BIGINT NOT NULL DEFAULT 0")
+                if _ensure_column(cursor, "videos", "stats_updated_at", "TIMESTAMP NULL AFTER comment_count"):
+                    _backfill_video_stats(cursor)
+                _ensure_index(cursor, "videos", "idx_channel_views", "channel_id, view_count")
+                _ensure_index(cursor, "videos", "idx_channel_likes", "channel_id, like_count")
+                _ensure_index(cursor, "videos", "idx_channel_comments", "channel_id, comment_count")
+
+                # channel_summariesテーブルを作成し、作成したときだけ既存のチャンネル分を集計して埋める
+                cursor.execute("SHOW TABLES LIKE 'channel_summaries'")
+                if not cursor.fetchone():
+                    cursor.execute("""
+                        CREATE TABLE channel_summaries (
+                          channel_id BIGINT PRIMARY KEY,
+                          total_videos INT NOT NULL DEFAULT 0,
+                          total_views BIGINT NOT NULL DEFAULT 0,
+                          total_likes BIGINT NOT NULL DEFAULT 0,
+                          total_comments BIGINT NOT NULL DEFAULT 0,
+                          last_upload_at TIMESTAMP NULL,
+                          last_fetched_at TIMESTAMP NULL,
+                          updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                          FOREIGN KEY (channel_id) REFERENCES channels(id) ON DELETE CASCADE
+                        )
+                    """)
+                    print("テーブル 'channel_summaries' を作成しました")
+                    cursor.execute("""
+                        INSERT INTO channel_summaries (
+                          channel_id, total_videos, total_views, total_likes, total_comments,
+                          last_upload_at, last_fetched_at
+                        )
+                        SELECT
+                          c.id,
+                          COUNT(v.id),
+                          COALESCE(SUM(v.view_count), 0),
+                          COALESCE(SUM(v.like_count), 0),
+                          COALESCE(SUM(v.comment_count), 0),
+                          MAX(v.published_at),
+                          c.updated_at
+                        FROM channels c
+                        LEFT JOIN videos v ON v.channel_id = c.id
+                        GROUP BY c.id, c.updated_at
+                    """)
+                    print(f"channel_summaries を {cursor.rowcount} 件作成しました")
+
+                # 統計の集計テーブル（時間・日・週）を作成する。既存の履歴は compact_stats ハンドラーを
+                # {"backfill": true} で実行して集計する
+                for resolution in ("hourly", "daily", "weekly"):
+                    cursor.execute(f"SHOW TABLES LIKE 'video_stats_{resolution}'")
+                    if not cursor.fetchone():
+                        cursor.execute(f"""
+                            CREATE TABLE video_stats_{resolution} (
+                              video_id BIGINT NOT NULL,
+                              bucket_start DATETIME NOT NULL,
+                              view_count BIGINT NOT NULL,
+                              like_count BIGINT,
+                              comment_count BIGINT,
+                              last_snapshot_at TIMESTAMP NOT NULL,
+                              PRIMARY KEY (video_id, bucket_start),
+                              FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE,
+                              INDEX idx_bucket_start (bucket_start)
+                            )
+                        """)
+                        print(f"テーブル 'video_stats_{resolution}' を作成しました")
                 
                 connection.commit()
                 print("すべてのテーブルが正常に作成されました")
@@ -1,11 +1,10 @@
-from datetime import datetime
 from typing import Dict, Any
 
 from common.response import success_response, error_response
 from common.logger import get_logger
 from common.models import ChannelImportResponse, ChannelResponse, SummaryResponse
-from services.channel_service import get_channel_by_id
-from db.rds import get_db_connection
+from services.channel_service import get_channel_with_summary
+from db.unit_of_work import UnitOfWork
 
 logger = get_logger(__name__)
 
@@ -28,36 +27,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             logger.warning("Invalid channel ID format", extra={"channel_id": channel_id_str})
             return error_response("INVALID_PARAMETER", "チャンネルIDが不正です", 400)
 
-        channel = get_channel_by_id(channel_id)
+        # 集計は取り込み時にchannel_summariesへ保存済みのため、主キーで1行引くだけ
+        with UnitOfWork(read_only=True) as uow:
+            channel = get_channel_with_summary(channel_id, uow=uow)
         if not channel:
             logger.warning("Channel not found", extra={"channel_id": channel_id})
             return error_response("NOT_FOUND", "指定されたチャンネルが見つかりませんでした", 404)
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT 
-                        COUNT(DISTINCT v.id) as total_videos,
-                        COALESCE(SUM(latest_stats.view_count), 0) as total_views
-                    FROM videos v
-                    LEFT JOIN (
-                        SELECT 
-                            video_id,
-                            view_count,
-                            ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY snapshot_at DESC) as rn
-                        FROM video_stats_history
-                    ) latest_stats ON v.id = latest_stats.video_id AND latest_stats.rn = 1
-                    WHERE v.channel_id = %s
-                    """,
-                    (channel_id,),
-                )
-                stats_result = cursor.fetchone()
-
-                total_videos = stats_result["total_videos"] if stats_result else 0
-                total_views = stats_result["total_views"] if stats_result else 0
-
-        logger.debug("Channel stats fetched", extra={"channel_id": channel_id, "total_videos": total_videos, "total_views": total_views})
+        logger.debug("Channel stats fetched", extra={"channel_id": channel_id, "total_videos": channel["total_videos"], "total_views": channel["total_views"]})
 
         response = ChannelImportResponse(
             channel=ChannelResponse(
@@ -71,9 +48,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 viewCount=channel["view_count"],
             ),
             summary=SummaryResponse(
-                totalViews=total_views or 0,
-                totalVideos=total_videos or 0,
-                lastFetchedAt=datetime.now(),
+                totalViews=channel["total_views"] or 0,
+                totalVideos=channel["total_videos"] or 0,
+                lastFetchedAt=channel["last_fetched_at"] or channel["updated_at"],
             ),
         )
 
@@ -5,10 +5,22 @@ from common.response import success_response, error_response
 from common.logger import get_logger
 from common.models import VideoListResponse, VideoListItem, VideoStats
 from services.channel_service import get_channel_by_id
-from db.rds import get_db_connection
+from db.rds import get_read_connection
+from db.unit_of_work import UnitOfWork
+from utils.pagination import Keyset, decode_cursor, encode_cursor, keyset_condition, keyset_order_by, parse_bool
 
 logger = get_logger(__name__)
 
+# 並び替えの種類ごとのキーセット（同じ値の動画はidで順序を決める）と、カーソルに入れる行の列
+SORT_KEYSETS = {
+    "views_desc": (Keyset("v.view_count", "v.id", True), "view_count"),
+    "views_asc": (Keyset("v.view_count", "v.id", False), "view_count"),
+    "likes_desc": (Keyset("v.like_count", "v.id", True), "like_count"),
+    "comments_desc": (Keyset("v.comment_count", "v.id", True), "comment_count"),
+    "date_desc": (Keyset("v.published_at", "v.id", True), "published_at"),
+    "date_asc": (Keyset("v.published_at", "v.id", False), "published_at"),
+}
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     logger.info("get_channel_videos handler started", extra={"event": event})
@@ -28,30 +40,29 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             logger.warning("Invalid channel ID format", extra={"channel_id": channel_id_str})
             return error_response("INVALID_PARAMETER", "チャンネルIDが不正です", 400)
 
-        channel = get_channel_by_id(channel_id)
+        with UnitOfWork(read_only=True) as uow:
+            channel = get_channel_by_id(channel_id, uow=uow)
         if not channel:
             logger.warning("Channel not found", extra={"channel_id": channel_id})
             return error_response("NOT_FOUND", "指定されたチャンネルが見つかりませんでした", 404)
 
         query_params = event.get("queryStringParameters") or {}
         sort = query_params.get("sort", "date_desc")
+        if sort not in SORT_KEYSETS:
+            sort = "date_desc"
         limit = int(query_params.get("limit", "20"))
         offset = int(query_params.get("offset", "0"))
+        cursor_param = query_params.get("cursor")
+        # カーソルで読む（無限スクロールの）2ページ目以降は既定で件数を数えない
+        include_total = parse_bool(query_params.get("includeTotal"), default=not cursor_param)
         from_date = query_params.get("from")
         to_date = query_params.get("to")
         min_views = query_params.get("minViews")
 
-        logger.info("Query parameters", extra={"sort": sort, "limit": limit, "offset": offset, "from_date": from_date, "to_date": to_date, "min_views": min_views})
+        logger.info("Query parameters", extra={"sort": sort, "limit": limit, "offset": offset, "cursor": cursor_param, "include_total": include_total, "from_date": from_date, "to_date": to_date, "min_views": min_views})
 
-        order_by_map = {
-            "views_desc": "COALESCE(latest_stats.view_count, 0) DESC",
-            "views_asc": "COALESCE(latest_stats.view_count, 0) ASC",
-            "likes_desc": "COALESCE(latest_stats.like_count, 0) DESC",
-            "comments_desc": "COALESCE(latest_stats.comment_count, 0) DESC",
-            "date_desc": "v.published_at DESC",
-            "date_asc": "v.published_at ASC",
-        }
-        order_by = order_by_map.get(sort, "v.published_at DESC")
+        keyset, cursor_column = SORT_KEYSETS[sort]
+        order_by = keyset_order_by(keyset)
 
         conditions = ["v.channel_id = %s"]
         params = [channel_id]
@@ -64,39 +75,45 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             conditions.append("DATE(v.published_at) <= %s")
             params.append(to_date)
 
+        if min_views:
+            conditions.append("v.view_count >= %s")
+            params.append(int(min_views))
+
         where_clause = " AND ".join(conditions)
 
-        with get_db_connection() as conn:
+        # カーソルの条件は件数には含めない（件数は絞り込み条件に一致する全体の数）
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor_param:
+            # カーソルとOFFSETは併用できない（OFFSETは最初のページだけで使う）
+            if offset:
+                return error_response("INVALID_PARAMETER", "cursorとoffsetは同時に指定できません", 400)
+            try:
+                cursor_value, cursor_id = decode_cursor(cursor_param, sort)
+            except ValueError:
+                logger.warning("Invalid cursor", extra={"cursor": cursor_param, "sort": sort})
+                return error_response("INVALID_PARAMETER", "カーソルが不正です", 400)
+            condition, condition_params = keyset_condition(keyset, cursor_value, cursor_id)
+            page_conditions.append(condition)
+            page_params.extend(condition_params)
+        page_where_clause = " AND ".join(page_conditions)
+
+        with get_read_connection() as conn:
             with conn.cursor() as cursor:
-                base_query = f"""
-                    FROM videos v
-                    LEFT JOIN (
-                        SELECT 
-                            video_id,
-                            view_count,
-                            like_count,
-                            comment_count,
-                            ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY snapshot_at DESC) as rn
-                        FROM video_stats_history
-                    ) latest_stats ON v.id = latest_stats.video_id AND latest_stats.rn = 1
-                    WHERE {where_clause}
-                """
-
-                if min_views:
-                    base_query = base_query.replace(
-                        "WHERE " + where_clause,
-                        f"WHERE {where_clause} AND COALESCE(latest_stats.view_count, 0) >= %s"
+                # 最新の統計はvideosの列に保持しているため履歴テーブルは引かない
+                # （並び替えは (channel_id, view_count) などのインデックスを使う。同じ値はidで順序を決めるが、
+                # InnoDBのセカンダリインデックスは末尾に主キーを持つため、インデックスをそのまま順に読める）
+                total_count = None
+                if include_total:
+                    cursor.execute(
+                        f"SELECT COUNT(*) as total FROM videos v WHERE {where_clause}",
+                        tuple(params),
                     )
-                    params.append(int(min_views))
-
-                cursor.execute(
-                    f"SELECT COUNT(*) as total {base_query}",
-                    tuple(params),
-                )
-                total_result = cursor.fetchone()
-                total_count = total_result["total"] if total_result else 0
+                    total_result = cursor.fetchone()
+                    total_count = total_result["total"] if total_result else 0
 
-                params.extend([limit, offset])
+                # 次のページがあるかを知るため1件多く読む
+                page_params.extend([limit + 1, offset])
                 cursor.execute(
                     f"""
                     SELECT 
@@ -105,16 +122,23 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         v.title, 
                         v.published_at,
                         v.duration_sec, 
-                        COALESCE(latest_stats.view_count, 0) as view_count,
-                        COALESCE(latest_stats.like_count, 0) as like_count,
-                        COALESCE(latest_stats.comment_count, 0) as comment_count
-                    {base_query}
+                        v.view_count,
+                        v.like_count,
+                        v.comment_count
+                    FROM videos v
+                    WHERE {page_where_clause}
                     ORDER BY {order_by}
                     LIMIT %s OFFSET %s
                     """,
-                    tuple(params),
+                    tuple(page_params),
                 )
-                rows = cursor.fetchall()
+                rows = list(cursor.fetchall())
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_row = rows[-1]
+            next_cursor = encode_cursor(sort, last_row[cursor_column], last_row["id"])
 
         logger.debug("Videos fetched", extra={"count": len(rows), "total_count": total_count})
 
@@ -135,8 +159,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             for row in rows
         ]
 
-        response = VideoListResponse(items=items, totalCount=total_count)
-        logger.info("get_channel_videos handler completed successfully", extra={"channel_id": channel_id, "item_count": len(items), "total_count": total_count})
+        response = VideoListResponse(items=items, totalCount=total_count, nextCursor=next_cursor)
+        logger.info("get_channel_videos handler completed successfully", extra={"channel_id": channel_id, "item_count": len(items), "total_count": total_count, "has_next": next_cursor is not None})
         return success_response(response.model_dump(mode="json"))
 
     except Exception as e:
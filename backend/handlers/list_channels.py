@@ -3,10 +3,15 @@ from typing import Dict, Any
 from common.response import success_response, error_response
 from common.logger import get_logger
 from common.models import ChannelListResponse, ChannelListItem
-from db.rds import get_db_connection
+from db.rds import get_read_connection
+from utils.pagination import Keyset, decode_cursor, encode_cursor, keyset_condition, keyset_order_by, parse_bool
 
 logger = get_logger(__name__)
 
+# 一覧は新しく取り込んだ順（id降順）
+CHANNEL_SORT = "id_desc"
+CHANNEL_KEYSET = Keyset(None, "id", True)
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     logger.info("list_channels handler started", extra={"event": event})
@@ -15,51 +20,64 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         q = query_params.get("q", "")
         limit = int(query_params.get("limit", "20"))
         offset = int(query_params.get("offset", "0"))
+        cursor_param = query_params.get("cursor")
+        # カーソルで読む（無限スクロールの）2ページ目以降は既定で件数を数えない
+        include_total = parse_bool(query_params.get("includeTotal"), default=not cursor_param)
+
+        logger.info("Query parameters", extra={"q": q, "limit": limit, "offset": offset, "cursor": cursor_param, "include_total": include_total})
+
+        conditions = []
+        params = []
+        if q:
+            conditions.append("title LIKE %s")
+            params.append(f"%{q}%")
+
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor_param:
+            # カーソルとOFFSETは併用できない（OFFSETは最初のページだけで使う）
+            if offset:
+                return error_response("INVALID_PARAMETER", "cursorとoffsetは同時に指定できません", 400)
+            try:
+                _, cursor_id = decode_cursor(cursor_param, CHANNEL_SORT)
+            except ValueError:
+                logger.warning("Invalid cursor", extra={"cursor": cursor_param})
+                return error_response("INVALID_PARAMETER", "カーソルが不正です", 400)
+            condition, condition_params = keyset_condition(CHANNEL_KEYSET, None, cursor_id)
+            page_conditions.append(condition)
+            page_params.extend(condition_params)
 
-        logger.info("Query parameters", extra={"q": q, "limit": limit, "offset": offset})
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        page_where_clause = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
 
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             with conn.cursor() as cursor:
-                if q:
-                    cursor.execute(
-                        """
-                        SELECT COUNT(*) as total
-                        FROM channels
-                        WHERE title LIKE %s
-                        """,
-                        (f"%{q}%",),
-                    )
+                total_count = None
+                if include_total:
+                    cursor.execute(f"SELECT COUNT(*) as total FROM channels {where_clause}", tuple(params))
                     total_result = cursor.fetchone()
                     total_count = total_result["total"] if total_result else 0
 
-                    cursor.execute(
-                        """
-                        SELECT id, youtube_channel_id, title, subscriber_count,
-                               view_count, video_count
-                        FROM channels
-                        WHERE title LIKE %s
-                        ORDER BY id DESC
-                        LIMIT %s OFFSET %s
-                        """,
-                        (f"%{q}%", limit, offset),
-                    )
-                else:
-                    cursor.execute("SELECT COUNT(*) as total FROM channels")
-                    total_result = cursor.fetchone()
-                    total_count = total_result["total"] if total_result else 0
+                # 次のページがあるかを知るため1件多く読む
+                page_params.extend([limit + 1, offset])
+                cursor.execute(
+                    f"""
+                    SELECT id, youtube_channel_id, title, subscriber_count,
+                           view_count, video_count
+                    FROM channels
+                    {page_where_clause}
+                    ORDER BY {keyset_order_by(CHANNEL_KEYSET)}
+                    LIMIT %s OFFSET %s
+                    """,
+                    tuple(page_params),
+                )
 
-                    cursor.execute(
-                        """
-                        SELECT id, youtube_channel_id, title, subscriber_count,
-                               view_count, video_count
-                        FROM channels
-                        ORDER BY id DESC
-                        LIMIT %s OFFSET %s
-                        """,
-                        (limit, offset),
-                    )
+                rows = list(cursor.fetchall())
 
-                rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(CHANNEL_SORT, None, rows[-1]["id"])
 
         logger.debug("Channels fetched", extra={"count": len(rows), "total_count": total_count})
 
@@ -75,11 +93,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             for row in rows
         ]
 
-        response = ChannelListResponse(items=items, totalCount=total_count)
-        logger.info("list_channels handler completed successfully", extra={"item_count": len(items), "total_count": total_count})
+        response = ChannelListResponse(items=items, totalCount=total_count, nextCursor=next_cursor)
+        logger.info("list_channels handler completed successfully", extra={"item_count": len(items), "total_count": total_count, "has_next": next_cursor is not None})
         return success_response(response.model_dump(mode="json"))
 
     except Exception as e:
         logger.error("Unexpected error occurred", extra={"error": str(e), "error_type": type(e).__name__}, exc_info=True)
         return error_response("INTERNAL_ERROR", "サーバーエラーが発生しました。しばらく待ってから再度お試しください", 500)
-
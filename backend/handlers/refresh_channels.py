@@ -0,0 +1,96 @@
+from typing import Dict, Any, List
+
+from common.response import success_response, error_response
+from common.logger import get_logger
+from common.models import ChannelRefreshResponse
+from common.records import VideoStatsRecord
+from constants.config import REFRESH_SMALL_CHANNEL_MAX_VIDEOS
+from db.unit_of_work import UnitOfWork
+from services.youtube_client import get_youtube_client, estimate_refresh_cost, MAX_IDS_PER_REQUEST
+from services.quota import QuotaExceededError, PRIORITY_BACKGROUND
+from services.stats_rollup import current_db_timestamp, rollup_channel_stats
+from services.channel_service import (
+    list_tracked_channels,
+    get_video_id_maps,
+    upsert_channels,
+    insert_video_stats,
+    refresh_channel_summaries,
+)
+
+logger = get_logger(__name__)
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    定期実行用: 登録済みの全チャンネルの情報を50件ずつまとめて更新し、
+    動画数がREFRESH_SMALL_CHANNEL_MAX_VIDEOS以下のチャンネルは動画の統計もチャンネルをまたいで詰めて取得する。
+    （動画の多いチャンネルは各チャンネルのインポートでETag付きのチャンクごとに更新する）
+    """
+    logger.info("refresh_channels handler started", extra={"event": event})
+    try:
+        channels = list_tracked_channels()
+        small_channel_ids = [
+            channel["id"]
+            for channel in channels
+            if (channel["video_count"] or 0) <= REFRESH_SMALL_CHANNEL_MAX_VIDEOS
+        ]
+        video_id_maps = get_video_id_maps(small_channel_ids)
+        video_count = sum(len(video_id_map) for video_id_map in video_id_maps.values())
+        logger.info(
+            "Refresh targets loaded",
+            extra={"channels": len(channels), "small_channels": len(small_channel_ids), "videos": video_count},
+        )
+
+        youtube_client = get_youtube_client()
+        with youtube_client.quota.reserve(estimate_refresh_cost(len(channels), video_count), PRIORITY_BACKGROUND):
+            channel_result = youtube_client.get_channels_info(
+                [channel["youtube_channel_id"] for channel in channels],
+                priority=PRIORITY_BACKGROUND,
+            )
+            stats_result = youtube_client.fetch_video_stats_batch(
+                {channel_id: list(video_id_map) for channel_id, video_id_map in video_id_maps.items()},
+                priority=PRIORITY_BACKGROUND,
+            )
+
+        # youtube_video_idは全チャンネルで一意なので、1回の書き込みにまとめる
+        merged_video_id_map: Dict[str, int] = {}
+        for video_id_map in video_id_maps.values():
+            merged_video_id_map.update(video_id_map)
+        stats: List[VideoStatsRecord] = [
+            video
+            for channel_stats in stats_result["stats"].values()
+            for video in channel_stats
+        ]
+        refreshed_channel_ids = [
+            channel["id"] for channel in channels if channel["youtube_channel_id"] in channel_result["channels"]
+        ]
+        with UnitOfWork() as uow:
+            refresh_started_at = current_db_timestamp(uow)
+            upsert_channels(list(channel_result["channels"].values()), uow=uow)
+            insert_video_stats(merged_video_id_map, stats, uow=uow)
+            refresh_channel_summaries(refreshed_channel_ids, uow=uow)
+            rollup_channel_stats(list(video_id_maps), refresh_started_at, uow=uow)
+
+        failed_video_count = sum(len(video_ids) for video_ids in stats_result["failed_video_ids"].values())
+        if channel_result["errors"] or failed_video_count:
+            logger.warning(
+                "Channels partially refreshed",
+                extra={"failed_channels": len(channel_result["errors"]), "failed_videos": failed_video_count},
+            )
+
+        response = ChannelRefreshResponse(
+            refreshedChannels=len(channel_result["channels"]),
+            failedChannels=channel_result["errors"],
+            refreshedVideos=len(stats),
+            failedVideoCount=failed_video_count,
+            requestCount=-(-len(channels) // MAX_IDS_PER_REQUEST) + stats_result["requests"],
+        )
+        logger.info("refresh_channels handler completed successfully", extra={"refreshed_channels": response.refreshedChannels, "refreshed_videos": response.refreshedVideos})
+        return success_response(response.model_dump(mode="json"))
+
+    except QuotaExceededError as e:
+        logger.warning("YouTube API quota exceeded", extra={"error": str(e)})
+        return error_response("QUOTA_EXCEEDED", "YouTube APIの利用上限に達しました。時間をおいて再度お試しください", 429)
+    except Exception as e:
+        logger.error("Unexpected error occurred", extra={"error": str(e), "error_type": type(e).__name__}, exc_info=True)
+        return error_response("INTERNAL_ERROR", "サーバーエラーが発生しました。しばらく待ってから再度お試しください", 500)
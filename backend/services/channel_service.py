@@ -1,10 +1,30 @@
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-import json
+import pickle
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Callable, IO, Set
 
 from common.logger import get_logger
-from db.rds import get_db_connection
-from services.youtube_client import YouTubeClient
+from common.records import ChannelRecord, VideoRecord, VideoStatsRecord
+from constants.config import (
+    FULL_RESYNC_INTERVAL,
+    METADATA_SYNC_INTERVAL,
+    IMPORT_WRITE_BATCH_SIZE,
+    PIPELINED_PLAYLIST_FETCH,
+)
+from db.bulk_loader import BulkLoader, summarize_bulk_stats
+from db.rds import get_connection_stats
+from db.query_stats import get_query_stats
+from db.unit_of_work import UnitOfWork, use_connection
+from services.quota import PRIORITY_INTERACTIVE
+from services.stats_rollup import current_db_timestamp, rollup_channel_stats
+from services.youtube_client import (
+    YouTubeClient,
+    VIDEO_FULL_PART,
+    VIDEO_STATS_PART,
+    get_upload_playlist_id,
+    estimate_import_cost,
+    chunk_etag_part,
+)
 
 logger = get_logger(__name__)
 
@@ -17,17 +37,23 @@ def upsert_channel(
     subscriber_count: int,
     video_count: int,
     view_count: int,
+    youtube_handle: Optional[str] = None,
+    uow: Optional[UnitOfWork] = None,
 ) -> int:
     logger.info("Upserting channel", extra={"youtube_channel_id": youtube_channel_id, "title": title})
-    with get_db_connection() as conn:
+    with use_connection(uow) as conn:
         with conn.cursor() as cursor:
+            if youtube_handle:
+                _release_handle(cursor, youtube_channel_id, youtube_handle)
             cursor.execute(
                 """
                 INSERT INTO channels (
-                    youtube_channel_id, title, description, published_at,
+                    youtube_channel_id, youtube_handle, handle_resolved_at, title, description, published_at,
                     subscriber_count, video_count, view_count
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ) VALUES (%s, %s, IF(%s IS NULL, NULL, CURRENT_TIMESTAMP), %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
+                    handle_resolved_at = IF(VALUES(youtube_handle) IS NULL, handle_resolved_at, CURRENT_TIMESTAMP),
+                    youtube_handle = COALESCE(VALUES(youtube_handle), youtube_handle),
                     title = VALUES(title),
                     description = VALUES(description),
                     published_at = VALUES(published_at),
@@ -38,6 +64,8 @@ def upsert_channel(
                 """,
                 (
                     youtube_channel_id,
+                    youtube_handle,
+                    youtube_handle,
                     title,
                     description,
                     published_at,
@@ -59,87 +87,153 @@ def upsert_channel(
             return channel_id
 
 
-def upsert_videos(channel_id: int, videos: List[Dict[str, Any]]) -> None:
-    logger.info("Upserting videos", extra={"channel_id": channel_id, "video_count": len(videos)})
-    if not videos:
-        logger.debug("No videos to upsert")
+def upsert_channels(channels: List[ChannelRecord], uow: Optional[UnitOfWork] = None) -> None:
+    """複数チャンネルの情報をまとめて更新する（一括リフレッシュ用）"""
+    logger.info("Upserting channels", extra={"channel_count": len(channels)})
+    if not channels:
         return
-
-    with get_db_connection() as conn:
+    with use_connection(uow) as conn:
         with conn.cursor() as cursor:
-            video_values = []
-            for video in videos:
-                published_at = datetime.fromisoformat(
-                    video["published_at"].replace("Z", "+00:00")
-                )
-                video_values.append((
-                    channel_id,
-                    video["video_id"],
-                    video["title"],
-                    video["description"],
-                    published_at,
-                    video["duration_sec"],
-                    json.dumps(video["tags"]) if video["tags"] else None,
-                ))
-
+            for channel in channels:
+                if channel.handle:
+                    _release_handle(cursor, channel.channel_id, channel.handle)
             cursor.executemany(
                 """
-                INSERT INTO videos (
-                    channel_id, youtube_video_id, title, description,
-                    published_at, duration_sec, tags_json
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO channels (
+                    youtube_channel_id, youtube_handle, handle_resolved_at, title, description, published_at,
+                    subscriber_count, video_count, view_count
+                ) VALUES (%s, %s, IF(%s IS NULL, NULL, CURRENT_TIMESTAMP), %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
+                    handle_resolved_at = IF(VALUES(youtube_handle) IS NULL, handle_resolved_at, CURRENT_TIMESTAMP),
+                    youtube_handle = COALESCE(VALUES(youtube_handle), youtube_handle),
                     title = VALUES(title),
                     description = VALUES(description),
                     published_at = VALUES(published_at),
-                    duration_sec = VALUES(duration_sec),
-                    tags_json = VALUES(tags_json),
+                    subscriber_count = VALUES(subscriber_count),
+                    video_count = VALUES(video_count),
+                    view_count = VALUES(view_count),
                     updated_at = CURRENT_TIMESTAMP
                 """,
-                video_values,
+                [
+                    (
+                        channel.channel_id,
+                        channel.handle,
+                        channel.handle,
+                        channel.title,
+                        channel.description,
+                        channel.published_at,
+                        channel.subscriber_count,
+                        channel.video_count,
+                        channel.view_count,
+                    )
+                    for channel in channels
+                ],
             )
-            logger.debug("Videos batch inserted", extra={"count": len(video_values)})
+    logger.info("Channels upserted successfully", extra={"channel_count": len(channels)})
+
+
+def _release_handle(cursor: Any, youtube_channel_id: str, youtube_handle: str) -> None:
+    # ハンドル名は別のチャンネルに付け替えられることがあるため、古い対応は外しておく
+    cursor.execute(
+        """
+        UPDATE channels
+        SET youtube_handle = NULL, handle_resolved_at = NULL
+        WHERE youtube_handle = %s AND youtube_channel_id <> %s
+        """,
+        (youtube_handle, youtube_channel_id),
+    )
+
 
-            youtube_video_ids = [video["video_id"] for video in videos]
-            placeholders = ",".join(["%s"] * len(youtube_video_ids))
+def save_channel_handle(youtube_channel_id: str, youtube_handle: str, uow: Optional[UnitOfWork] = None) -> bool:
+    """
+    ハンドル名とチャンネルIDの対応をchannelsに保存し、解決日時を更新する。
+    チャンネルがまだDBに無い場合は何もせずFalseを返す（インポート時にupsert_channelで保存される）。
+    """
+    logger.debug("Saving channel handle", extra={"youtube_channel_id": youtube_channel_id, "youtube_handle": youtube_handle})
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            _release_handle(cursor, youtube_channel_id, youtube_handle)
             cursor.execute(
-                f"""
-                SELECT id, youtube_video_id
-                FROM videos
-                WHERE youtube_video_id IN ({placeholders})
+                """
+                UPDATE channels
+                SET youtube_handle = %s, handle_resolved_at = CURRENT_TIMESTAMP
+                WHERE youtube_channel_id = %s
                 """,
-                youtube_video_ids,
+                (youtube_handle, youtube_channel_id),
             )
-            video_id_map = {row["youtube_video_id"]: row["id"] for row in cursor.fetchall()}
-
-            stats_values = []
-            for video in videos:
-                video_db_id = video_id_map.get(video["video_id"])
-                if video_db_id:
-                    stats_values.append((
-                        video_db_id,
-                        video["view_count"],
-                        video["like_count"],
-                        video["comment_count"],
-                    ))
-
-            if stats_values:
-                cursor.executemany(
-                    """
-                    INSERT INTO video_stats_history (
-                        video_id, snapshot_at, view_count, like_count, comment_count
-                    ) VALUES (%s, CURRENT_TIMESTAMP, %s, %s, %s)
-                    """,
-                    stats_values,
-                )
-                logger.debug("Video stats batch inserted", extra={"count": len(stats_values)})
+            return cursor.rowcount > 0
+
+
+def get_channel_id_by_handle(youtube_handle: str, max_age: int, uow: Optional[UnitOfWork] = None) -> Optional[str]:
+    """max_age秒以内に解決済みのハンドル名であれば、DB上の対応からチャンネルIDを返す"""
+    logger.debug("Getting channel ID by handle", extra={"youtube_handle": youtube_handle})
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT youtube_channel_id
+                FROM channels
+                WHERE youtube_handle = %s
+                  AND handle_resolved_at >= CURRENT_TIMESTAMP - INTERVAL %s SECOND
+                ORDER BY handle_resolved_at DESC
+                LIMIT 1
+                """,
+                (youtube_handle, max_age),
+            )
+            result = cursor.fetchone()
+            return result["youtube_channel_id"] if result else None
+
+
+def _bulk_loader(conn: Any, uow: Optional[UnitOfWork]) -> BulkLoader:
+    return uow.bulk_loader if uow is not None else BulkLoader(conn)
+
+
+def upsert_videos(channel_id: int, videos: List[VideoRecord], uow: Optional[UnitOfWork] = None) -> None:
+    """動画をupsertし、統計のスナップショットをvideo_stats_historyに追加する（BulkLoader経由）"""
+    logger.info("Upserting videos", extra={"channel_id": channel_id, "video_count": len(videos)})
+    if not videos:
+        logger.debug("No videos to upsert")
+        return
+
+    with use_connection(uow) as conn:
+        written = _bulk_loader(conn, uow).upsert_videos(channel_id, videos)
+
+    logger.info(
+        "Videos upserted successfully",
+        extra={"channel_id": channel_id, "total_videos": len(videos), "written": written, "unchanged": len(videos) - written},
+    )
+
+
+def insert_video_stats(
+    video_id_map: Dict[str, int],
+    stats: List[VideoStatsRecord],
+    uow: Optional[UnitOfWork] = None,
+) -> None:
+    """統計のみの更新: videosは更新せず、video_stats_historyにスナップショットだけを追加する"""
+    logger.info("Inserting video stats snapshots", extra={"video_count": len(stats)})
+    stats_values = [
+        (
+            video_id_map[video.video_id],
+            video.view_count,
+            video.like_count,
+            video.comment_count,
+        )
+        for video in stats
+        if video.video_id in video_id_map
+    ]
+    if not stats_values:
+        logger.debug("No video stats to insert")
+        return
 
-    logger.info("Videos upserted successfully", extra={"channel_id": channel_id, "total_videos": len(videos)})
+    with use_connection(uow) as conn:
+        inserted = _bulk_loader(conn, uow).insert_stats(stats_values)
+    # 前回のスナップショットから変化の無い動画は書き込まない（STATS_HEARTBEAT_INTERVALごとには書く）
+    logger.info("Video stats snapshots inserted", extra={"count": inserted, "unchanged": len(stats_values) - inserted})
 
 
-def get_channel_by_youtube_id(youtube_channel_id: str) -> Optional[Dict[str, Any]]:
+def get_channel_by_youtube_id(youtube_channel_id: str, uow: Optional[UnitOfWork] = None) -> Optional[Dict[str, Any]]:
     logger.debug("Getting channel by YouTube ID", extra={"youtube_channel_id": youtube_channel_id})
-    with get_db_connection() as conn:
+    with use_connection(uow) as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
@@ -158,9 +252,9 @@ def get_channel_by_youtube_id(youtube_channel_id: str) -> Optional[Dict[str, Any
             return result
 
 
-def get_channel_by_id(channel_id: int) -> Optional[Dict[str, Any]]:
+def get_channel_by_id(channel_id: int, uow: Optional[UnitOfWork] = None) -> Optional[Dict[str, Any]]:
     logger.debug("Getting channel by ID", extra={"channel_id": channel_id})
-    with get_db_connection() as conn:
+    with use_connection(uow) as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
@@ -179,45 +273,363 @@ def get_channel_by_id(channel_id: int) -> Optional[Dict[str, Any]]:
             return result
 
 
-def import_channel_data(youtube_channel_id: str, youtube_client: YouTubeClient) -> Dict[str, Any]:
+def refresh_channel_summaries(channel_ids: List[int], uow: Optional[UnitOfWork] = None) -> None:
+    """
+    チャンネルのchannel_summariesを、videosの最新統計列から集計し直してlast_fetched_atを現在時刻にする。
+    取り込みと同じトランザクションで呼び、読み出し側は集計せず主キーで1行引くだけにする。
+    """
+    if not channel_ids:
+        return
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            placeholders = ",".join(["%s"] * len(channel_ids))
+            cursor.execute(
+                f"""
+                INSERT INTO channel_summaries (
+                    channel_id, total_videos, total_views, total_likes, total_comments,
+                    last_upload_at, last_fetched_at
+                )
+                SELECT * FROM (
+                    SELECT
+                        c.id AS channel_id,
+                        COUNT(v.id) AS total_videos,
+                        COALESCE(SUM(v.view_count), 0) AS total_views,
+                        COALESCE(SUM(v.like_count), 0) AS total_likes,
+                        COALESCE(SUM(v.comment_count), 0) AS total_comments,
+                        MAX(v.published_at) AS last_upload_at,
+                        CURRENT_TIMESTAMP AS last_fetched_at
+                    FROM channels c
+                    LEFT JOIN videos v ON v.channel_id = c.id
+                    WHERE c.id IN ({placeholders})
+                    GROUP BY c.id
+                ) totals
+                ON DUPLICATE KEY UPDATE
+                    total_videos = totals.total_videos,
+                    total_views = totals.total_views,
+                    total_likes = totals.total_likes,
+                    total_comments = totals.total_comments,
+                    last_upload_at = totals.last_upload_at,
+                    last_fetched_at = totals.last_fetched_at
+                """,
+                channel_ids,
+            )
+    logger.debug("Channel summaries refreshed", extra={"channel_count": len(channel_ids)})
+
+
+def get_channel_summary(channel_id: int, uow: Optional[UnitOfWork] = None) -> Optional[Dict[str, Any]]:
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT channel_id, total_videos, total_views, total_likes, total_comments,
+                       last_upload_at, last_fetched_at
+                FROM channel_summaries
+                WHERE channel_id = %s
+                """,
+                (channel_id,),
+            )
+            return cursor.fetchone()
+
+
+def get_channel_with_summary(channel_id: int, uow: Optional[UnitOfWork] = None) -> Optional[Dict[str, Any]]:
+    """チャンネルとchannel_summariesを主キーで1行取得する（集計が未作成ならsummaryの列はNULL）"""
+    logger.debug("Getting channel with summary", extra={"channel_id": channel_id})
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.id, c.youtube_channel_id, c.title, c.description, c.published_at,
+                       c.subscriber_count, c.video_count, c.view_count, c.updated_at,
+                       s.total_videos, s.total_views, s.total_likes, s.total_comments,
+                       s.last_upload_at, s.last_fetched_at
+                FROM channels c
+                LEFT JOIN channel_summaries s ON s.channel_id = c.id
+                WHERE c.id = %s
+                """,
+                (channel_id,),
+            )
+            return cursor.fetchone()
+
+
+def get_video_id_map(channel_id: int, uow: Optional[UnitOfWork] = None) -> Dict[str, int]:
+    """チャンネルの既知動画（youtube_video_id -> videos.id）を新しい順で取得"""
+    logger.debug("Getting known video IDs", extra={"channel_id": channel_id})
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, youtube_video_id
+                FROM videos
+                WHERE channel_id = %s
+                ORDER BY published_at DESC, id DESC
+                """,
+                (channel_id,),
+            )
+            return {row["youtube_video_id"]: row["id"] for row in cursor.fetchall()}
+
+
+def list_tracked_channels(uow: Optional[UnitOfWork] = None) -> List[Dict[str, Any]]:
+    """一括リフレッシュの対象となる登録済みチャンネルの一覧"""
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, youtube_channel_id, video_count
+                FROM channels
+                ORDER BY id
+                """
+            )
+            return cursor.fetchall()
+
+
+def get_video_id_maps(channel_ids: List[int], uow: Optional[UnitOfWork] = None) -> Dict[int, Dict[str, int]]:
+    """複数チャンネルの既知動画（チャンネルID -> youtube_video_id -> videos.id）をまとめて取得"""
+    video_id_maps: Dict[int, Dict[str, int]] = {channel_id: {} for channel_id in channel_ids}
+    if not channel_ids:
+        return video_id_maps
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            placeholders = ",".join(["%s"] * len(channel_ids))
+            cursor.execute(
+                f"""
+                SELECT channel_id, id, youtube_video_id
+                FROM videos
+                WHERE channel_id IN ({placeholders})
+                """,
+                channel_ids,
+            )
+            for row in cursor.fetchall():
+                video_id_maps[row["channel_id"]][row["youtube_video_id"]] = row["id"]
+    return video_id_maps
+
+
+def _is_sync_due(cache_entry: Dict[str, Any], field: str, interval: int) -> bool:
+    last_synced_at = cache_entry.get(field)
+    if not last_synced_at:
+        return True
+    current_time = int(datetime.now(timezone.utc).timestamp() * 1000)
+    return (current_time - last_synced_at) / 1000 >= interval
+
+
+def _stream_video_chunks(
+    chunk_results: Iterable[Dict[str, Any]],
+    write_batch: Callable[[List[Any]], None],
+    chunk_states: Dict[str, Dict[str, Any]],
+    failed_video_ids: List[str],
+) -> int:
+    """
+    取得済みチャンクをIMPORT_WRITE_BATCH_SIZE件ずつwrite_batchに渡す。
+    取得に失敗したチャンクの動画IDはfailed_video_idsに追加する。
+    戻り値は304で省略されたチャンク数。
+    """
+    batch: List[Any] = []
+    not_modified_chunks = 0
+    for chunk_result in chunk_results:
+        if chunk_result.get("failed"):
+            failed_video_ids.extend(chunk_result["video_ids"])
+            continue
+        # パイプラインモードのチャンクは境界が安定しないため状態を保存しない
+        if chunk_result["key"] is not None:
+            chunk_states[chunk_result["key"]] = chunk_result["state"]
+        if chunk_result["not_modified"]:
+            not_modified_chunks += 1
+            continue
+        batch.extend(chunk_result["videos"])
+        if len(batch) >= IMPORT_WRITE_BATCH_SIZE:
+            write_batch(batch)
+            batch = []
+    if batch:
+        write_batch(batch)
+    return not_modified_chunks
+
+
+def _merge_chunk_etags(
+    previous: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    refetched_parts: Set[str],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    保存済みのチャンクのETagにこの取り込みの分を重ねる（統計のみの取り込みでもメタデータのETagは残る）。
+    refetched_partsのpartは全動画のチャンクを取り直したため、今回出てこなかった古いチャンクは捨てる。
+    partの分からない以前の形式のキーも一致することがないため捨てる。
+    """
+    merged = {
+        key: state
+        for key, state in previous.items()
+        if chunk_etag_part(key) is not None and chunk_etag_part(key) not in refetched_parts
+    }
+    merged.update(current)
+    return merged
+
+
+def _spool_writer(spool: IO[bytes]) -> Callable[[List[Any]], None]:
+    """バッチを一時ファイルに書き出す（取り込み全体をメモリに持たずに、最後に1つのトランザクションで書き込むため）"""
+    def write_batch(batch: List[Any]) -> None:
+        pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+    return write_batch
+
+
+def _read_spool(spool: IO[bytes]) -> Iterator[List[Any]]:
+    spool.seek(0)
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+def import_channel_data(
+    youtube_channel_id: str,
+    youtube_client: YouTubeClient,
+    cache_entry: Optional[Dict[str, Any]] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    youtube_handle: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    チャンネルと動画をYouTube APIから取り込み、channel_summariesの行を"summary"として返す。
+    cache_entryの前回のETagで条件付きリクエストを送り、既存チャンネルは差分・統計のみの取り込みにする。
+    取得した動画はいったん一時ファイルに書き出し、取得が終わってからチャンネル・動画・統計・集計を
+    1つのトランザクションで書き込む（YouTube APIとの通信中はトランザクションを開かない）。
+    失敗したチャンクの動画IDは"failed_video_ids"で返す。
+    "video_chunk_etags"は保存済みのチャンクのETagにこの取り込みの分を重ねたもの（update_cacheにそのまま渡す）。
+    """
     logger.info("Starting channel data import", extra={"youtube_channel_id": youtube_channel_id})
-    channel_info = youtube_client.get_channel_info(youtube_channel_id)
+    cache_entry = cache_entry or {}
+
+    with UnitOfWork() as uow:
+        existing_channel = get_channel_by_youtube_id(youtube_channel_id, uow=uow)
+        known_video_ids = get_video_id_map(existing_channel["id"], uow=uow) if existing_channel else {}
 
-    if not channel_info.get("upload_playlist_id"):
+    # 304の場合はDB上の既存チャンネルを使うため、DBに存在するときだけETagを送る
+    channel_etag = cache_entry.get("etag") if existing_channel else None
+    channel_info = youtube_client.get_channel_info(youtube_channel_id, etag=channel_etag, priority=priority)
+
+    if channel_info is None:
+        upload_playlist_id = get_upload_playlist_id(youtube_channel_id)
+    else:
+        upload_playlist_id = channel_info.upload_playlist_id
+
+    if not upload_playlist_id:
         logger.error("Upload playlist not found", extra={"youtube_channel_id": youtube_channel_id})
         raise ValueError("Upload playlist not found")
 
-    logger.info("Fetching video IDs from upload playlist", extra={"upload_playlist_id": channel_info["upload_playlist_id"]})
-    video_ids = youtube_client.get_all_video_ids(channel_info["upload_playlist_id"])
-    logger.info("Video IDs fetched", extra={"count": len(video_ids)})
+    full_sync = not known_video_ids or _is_sync_due(cache_entry, "last_full_sync_at", FULL_RESYNC_INTERVAL)
 
-    videos_info = youtube_client.get_videos_info(video_ids)
+    video_count = channel_info.video_count if channel_info else (existing_channel["video_count"] or len(known_video_ids))
+    bulk_stats: Dict[str, Dict[str, Any]] = {}
 
-    published_at = None
-    if channel_info["published_at"]:
-        published_at = datetime.fromisoformat(
-            channel_info["published_at"].replace("Z", "+00:00")
-        )
+    # 途中でクォータが尽きて中途半端に終わらないよう、必要な分を先に確保してから取得を始める
+    estimated_units = estimate_import_cost(video_count, pages=None if full_sync else 1)
+    with tempfile.TemporaryFile(prefix="import_videos_") as video_spool, tempfile.TemporaryFile(prefix="import_stats_") as stats_spool:
+        with youtube_client.quota.reserve(estimated_units, priority):
+            new_video_ids: List[str] = []
+            if not full_sync:
+                new_video_ids = youtube_client.get_all_video_ids(upload_playlist_id, known_video_ids=known_video_ids, priority=priority)
+                logger.info("New video IDs discovered", extra={"new": len(new_video_ids), "known": len(known_video_ids)})
+                # 公開設定の変更などで途中の動画が増えた場合は差分では拾えないため全件同期に切り替える
+                if channel_info is not None and len(new_video_ids) + len(known_video_ids) < channel_info.video_count:
+                    logger.info(
+                        "Known videos fewer than channel video count, falling back to full resync",
+                        extra={"known": len(new_video_ids) + len(known_video_ids), "video_count": channel_info.video_count},
+                    )
+                    full_sync = True
 
-    channel_db_id = upsert_channel(
-        youtube_channel_id=channel_info["channel_id"],
-        title=channel_info["title"],
-        description=channel_info["description"],
-        published_at=published_at,
-        subscriber_count=channel_info["subscriber_count"],
-        video_count=channel_info["video_count"],
-        view_count=channel_info["view_count"],
-    )
-
-    upsert_videos(channel_db_id, videos_info)
+            metadata_sync = full_sync or _is_sync_due(cache_entry, "last_metadata_sync_at", METADATA_SYNC_INTERVAL)
+            chunk_etags = cache_entry.get("video_chunk_etags", {}) if existing_channel else {}
+            stats_video_ids: List[str] = []
+            # 全動画分のチャンクを取り直すpart（保存済みのETagのうち今回出てこなかったチャンクは捨てる）
+            refetched_parts: Set[str] = set()
+            if full_sync and PIPELINED_PLAYLIST_FETCH:
+                # ページングしながら取得済みのページから詳細を取りに行く（チャンクのETagは保存しないため、保存済みの分はそのまま残す）
+                metadata_chunks = youtube_client.iter_playlist_video_chunks(upload_playlist_id, priority=priority)
+            elif full_sync:
+                video_ids = youtube_client.get_all_video_ids(upload_playlist_id, priority=priority)
+                metadata_chunks = youtube_client.iter_video_chunks(video_ids, chunk_etags, priority=priority)
+                refetched_parts.add(VIDEO_FULL_PART)
+            elif metadata_sync:
+                metadata_chunks = youtube_client.iter_video_chunks(new_video_ids + list(known_video_ids), chunk_etags, priority=priority)
+                refetched_parts.add(VIDEO_FULL_PART)
+            else:
+                # 前回取得に失敗した既知の動画は統計だけでなくメタデータごと取り直す
+                retry_video_ids = [video_id for video_id in cache_entry.get("failed_video_ids", []) if video_id in known_video_ids]
+                retry_set = set(retry_video_ids)
+                metadata_chunks = youtube_client.iter_video_chunks(new_video_ids + retry_video_ids, chunk_etags, priority=priority)
+                stats_video_ids = [video_id for video_id in known_video_ids if video_id not in retry_set]
+                refetched_parts.add(VIDEO_STATS_PART)
 
-    total_views = sum(video["view_count"] for video in videos_info)
+            logger.info("Fetching videos", extra={"full_sync": full_sync, "metadata_sync": metadata_sync, "pipelined": full_sync and PIPELINED_PLAYLIST_FETCH})
+            video_chunk_etags: Dict[str, Dict[str, Any]] = {}
+            failed_video_ids: List[str] = []
+            not_modified_chunks = _stream_video_chunks(metadata_chunks, _spool_writer(video_spool), video_chunk_etags, failed_video_ids)
+            not_modified_chunks += _stream_video_chunks(
+                youtube_client.iter_video_chunks(stats_video_ids, chunk_etags, stats_only=True, priority=priority),
+                _spool_writer(stats_spool),
+                video_chunk_etags,
+                failed_video_ids,
+            )
+            video_chunk_etags = _merge_chunk_etags(chunk_etags, video_chunk_etags, refetched_parts)
 
+        # 途中で失敗した場合は何も書き込まず、channel_summariesと集計テーブルは前回の取り込みのまま残る
+        with UnitOfWork(bulk_stats=bulk_stats) as uow:
+            # この取り込みで追記したスナップショットだけを集計テーブルに反映するための基準時刻
+            import_started_at = current_db_timestamp(uow)
+            if channel_info is None:
+                channel_db_id = existing_channel["id"]
+                channel_etag_result = channel_etag
+                if youtube_handle:
+                    save_channel_handle(youtube_channel_id, youtube_handle, uow=uow)
+            else:
+                channel_db_id = upsert_channel(
+                    youtube_channel_id=channel_info.channel_id,
+                    title=channel_info.title,
+                    description=channel_info.description,
+                    published_at=channel_info.published_at,
+                    subscriber_count=channel_info.subscriber_count,
+                    video_count=channel_info.video_count,
+                    view_count=channel_info.view_count,
+                    youtube_handle=channel_info.handle or youtube_handle,
+                    uow=uow,
+                )
+                channel_etag_result = channel_info.etag
+            for batch in _read_spool(video_spool):
+                upsert_videos(channel_db_id, batch, uow=uow)
+            for batch in _read_spool(stats_spool):
+                insert_video_stats(known_video_ids, batch, uow=uow)
+            refresh_channel_summaries([channel_db_id], uow=uow)
+            rollups = rollup_channel_stats([channel_db_id], import_started_at, uow=uow)
+            summary = get_channel_summary(channel_db_id, uow=uow)
     result = {
         "channel_id": channel_db_id,
-        "total_views": total_views,
-        "total_videos": len(videos_info),
+        "summary": summary,
+        "etag": channel_etag_result,
+        "video_chunk_etags": video_chunk_etags,
+        "full_sync": full_sync,
+        "metadata_sync": metadata_sync,
+        "failed_video_ids": failed_video_ids,
+        "bulk_load": summarize_bulk_stats(bulk_stats),
+        "rollups": rollups,
     }
-    logger.info("Channel data import completed", extra={"channel_id": channel_db_id, "total_videos": result["total_videos"], "total_views": result["total_views"]})
+    videos_stats = result["bulk_load"]["tables"].get("videos", {})
+    # メタデータが変わらずvideosへの書き込みを省いた動画数
+    result["videos_written"] = videos_stats.get("rows", 0)
+    result["videos_unchanged"] = videos_stats.get("skipped", 0)
+    logger.info(
+        "Channel data import completed",
+        extra={
+            "channel_id": channel_db_id,
+            "total_videos": summary["total_videos"],
+            "total_views": summary["total_views"],
+            "metadata_sync": metadata_sync,
+            "stats_only_videos": len(stats_video_ids),
+            "not_modified_chunks": not_modified_chunks,
+            "failed_videos": len(failed_video_ids),
+            "videos_written": result["videos_written"],
+            "videos_unchanged": result["videos_unchanged"],
+            "connections": youtube_client.get_connection_stats(),
+            "db_connections": get_connection_stats(),
+            "queries": get_query_stats(top_n=5),
+            "quota": youtube_client.quota.get_usage(),
+            "bulk_load": result["bulk_load"],
+        },
+    )
     return result
-
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from common.logger import get_logger
+from constants.config import HANDLE_CACHE_TTL, HANDLE_CACHE_MAX_SIZE
+from services.channel_service import get_channel_id_by_handle, save_channel_handle
+from services.youtube_client import YouTubeClient
+from utils.extract_channel_id import normalize_handle
+
+logger = get_logger(__name__)
+
+
+class HandleCache:
+    """ハンドル名 -> チャンネルIDのプロセス内LRUキャッシュ（エントリごとにTTLを持つ）"""
+
+    def __init__(self, max_size: int = HANDLE_CACHE_MAX_SIZE, ttl: int = HANDLE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, handle: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            channel_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[handle]
+                return None
+            self._entries.move_to_end(handle)
+            return channel_id
+
+    def put(self, handle: str, channel_id: str) -> None:
+        with self._lock:
+            self._entries[handle] = (channel_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(handle)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_handle_cache = HandleCache()
+
+
+def resolve_channel_id_from_handle(handle: str, get_client: Callable[[], YouTubeClient]) -> str:
+    """
+    ハンドル名をチャンネルIDに解決する。
+    プロセス内キャッシュ → channels.youtube_handle（HANDLE_CACHE_TTL以内に解決したもの）→ YouTube API の順に探し、
+    APIを呼ぶのはどちらにも無い場合だけ。get_clientはAPIが必要になったときだけ呼ぶ。
+    """
+    key = normalize_handle(handle)
+
+    channel_id = _handle_cache.get(key)
+    if channel_id:
+        logger.info("Channel ID resolved from in-process handle cache", extra={"handle": key, "channel_id": channel_id})
+        return channel_id
+
+    channel_id = get_channel_id_by_handle(key, HANDLE_CACHE_TTL)
+    if channel_id:
+        logger.info("Channel ID resolved from database handle mapping", extra={"handle": key, "channel_id": channel_id})
+        _handle_cache.put(key, channel_id)
+        return channel_id
+
+    channel_id = get_client().get_channel_id_from_handle(handle)
+    # チャンネルが既にDBにあれば対応を保存する。未登録ならインポート時に保存される
+    save_channel_handle(channel_id, key)
+    _handle_cache.put(key, channel_id)
+    return channel_id
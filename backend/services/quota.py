@@ -0,0 +1,472 @@
+import hashlib
+import threading
+import time
+import uuid
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# YouTube Data API v3 のエンドポイントごとの消費ユニット
+QUOTA_COSTS: Dict[str, int] = {
+    "channels": 1,
+    "playlistItems": 1,
+    "videos": 1,
+    "search": 100,
+}
+
+# 値が小さいほど優先度が高い
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# クォータは太平洋時間の0時にリセットされる
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# 日付、実際に使ったユニット、書き込む予約（予約ID -> {"units", "expires_at"}）、消す予約IDを受け取り、
+# (使用済みユニットの合計, 期限内の予約ユニットの合計)を返す
+LedgerStore = Callable[[str, int, Dict[str, Dict[str, int]], List[str]], Tuple[int, int]]
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+def _quota_day() -> str:
+    return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+
+class _LocalLedger:
+    """ledger_storeを渡さない場合に使うプロセス内の台帳。DynamoDBの台帳と同じ形で呼ぶ"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._used: Dict[str, int] = {}
+        self._reservations: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def __call__(
+        self, day: str, spent: int, reservations: Dict[str, Dict[str, int]], released: List[str]
+    ) -> Tuple[int, int]:
+        now = int(time.time())
+        with self._lock:
+            self._used[day] = self._used.get(day, 0) + spent
+            active = self._reservations.setdefault(day, {})
+            active.update(reservations)
+            for reservation_id in released:
+                active.pop(reservation_id, None)
+            for reservation_id in [r for r, v in active.items() if v["expires_at"] <= now]:
+                del active[reservation_id]
+            return self._used[day], sum(v["units"] for v in active.values())
+
+
+class _Reservation:
+    """reserveで確保した1件分の予約。確保した呼び出し元（とそこから起動したスレッド）だけが消費する"""
+
+    def __init__(self, day: str, units: int, priority: int):
+        self.reservation_id = uuid.uuid4().hex
+        self.day = day
+        self.priority = priority
+        self.remaining = units
+        # 消費したが台帳にまだ計上していないユニット
+        self.unflushed = 0
+        # 台帳の予約の期限を最後に延ばした時刻（time.monotonic）
+        self.refreshed_at = time.monotonic()
+        # 台帳への書き込みを順番に行うためのロック（古い残量で上書きしないように）
+        self.flush_lock = threading.Lock()
+
+
+# 呼び出し元ごとの予約（QuotaScheduler -> _Reservation）。スレッドに渡す場合はcontextvars.copy_contextで引き継ぐ
+_current_reservations: ContextVar[Dict["QuotaScheduler", _Reservation]] = ContextVar("quota_reservations", default={})
+
+
+class QuotaScheduler:
+    """
+    日次クォータの台帳とトークンバケットによるレート制御。
+    ledger_store（dynamodb_cache.update_quota_ledgerなど）を渡すと使用量と予約を複数プロセス間で共有する。
+    台帳には実際に使ったユニットだけを計上し、予約は期限付きの項目として別に持つ
+    （reservation_ttl秒以内に延長されなかった予約はLambdaのタイムアウトなどで残っても無視される）。
+    ledger_storeはロックの外で呼び、DynamoDBなどへの書き込みの間に他のスレッドを待たせない。
+    """
+
+    def __init__(
+        self,
+        daily_limit: int,
+        rate_per_sec: float,
+        burst: int,
+        interactive_reserve: int = 0,
+        ledger_store: Optional[LedgerStore] = None,
+        reservation_ttl: int = 900,
+        reservation_flush_units: int = 100,
+    ):
+        self.daily_limit = daily_limit
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.interactive_reserve = interactive_reserve
+        self.reservation_ttl = reservation_ttl
+        self.reservation_flush_units = reservation_flush_units
+        self._ledger_store: LedgerStore = ledger_store or _LocalLedger()
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._waiting: Dict[int, int] = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+
+        self._day = _quota_day()
+        # 最後に台帳から読んだ値（_usedは使用済み、_reservedは全プロセスの期限内の予約）
+        self._used = 0
+        self._reserved = 0
+        self._reservations: Dict[str, _Reservation] = {}
+        self._calls: Dict[str, int] = {}
+
+    def _limit_for(self, priority: int) -> int:
+        # バックグラウンド更新は対話的なインポート用の枠には手を付けない
+        if priority == PRIORITY_INTERACTIVE:
+            return self.daily_limit
+        return self.daily_limit - self.interactive_reserve
+
+    def _roll_day(self) -> None:
+        day = _quota_day()
+        if day != self._day:
+            logger.info("Quota day rolled over", extra={"previous_day": self._day, "day": day, "used": self._used})
+            self._day = day
+            self._used = 0
+            self._reserved = 0
+            self._calls = {}
+
+    def _available(self, priority: int) -> int:
+        return max(self._limit_for(priority) - self._used - self._reserved, 0)
+
+    def _update_ledger(
+        self,
+        day: str,
+        spent: int = 0,
+        reservations: Optional[Dict[str, Dict[str, int]]] = None,
+        released: Optional[List[str]] = None,
+    ) -> Tuple[int, int]:
+        """台帳を更新して(使用済み, 予約中)を返す。_condを持たずに呼ぶ"""
+        used, reserved = self._ledger_store(day, spent, reservations or {}, released or [])
+        with self._cond:
+            if self._day == day:
+                self._used = used
+                self._reserved = reserved
+        return used, reserved
+
+    def _reservation_item(self, reservation: _Reservation) -> Dict[str, Dict[str, int]]:
+        return {
+            reservation.reservation_id: {
+                "units": reservation.remaining,
+                "expires_at": int(time.time()) + self.reservation_ttl,
+            }
+        }
+
+    def _flush(self, reservation: _Reservation, release: bool = False) -> None:
+        """予約から消費した分を台帳に計上し、予約の残量と期限を更新する（releaseなら予約を消す）"""
+        with reservation.flush_lock:
+            with self._cond:
+                spent = reservation.unflushed
+                reservation.unflushed = 0
+                reservation.refreshed_at = time.monotonic()
+            if release:
+                self._update_ledger(reservation.day, spent, released=[reservation.reservation_id])
+            else:
+                self._update_ledger(reservation.day, spent, self._reservation_item(reservation))
+
+    def remaining(self, priority: int = PRIORITY_INTERACTIVE) -> int:
+        """予約していない呼び出しが使える残り（他の呼び出し元の予約分は含めない）"""
+        with self._cond:
+            self._roll_day()
+            return self._available(priority)
+
+    def get_usage(self) -> Dict[str, Any]:
+        with self._cond:
+            self._roll_day()
+            return {
+                "day": self._day,
+                "daily_limit": self.daily_limit,
+                "used": self._used,
+                "reserved_unspent": self._reserved,
+                "remaining_interactive": self._available(PRIORITY_INTERACTIVE),
+                "remaining_background": self._available(PRIORITY_BACKGROUND),
+                "calls": dict(self._calls),
+            }
+
+    @property
+    def reserved_units(self) -> int:
+        """現在の呼び出し元がこの台帳に持っている予約の残り"""
+        reservation = _current_reservations.get().get(self)
+        if reservation is None:
+            return 0
+        with self._cond:
+            return reservation.remaining if reservation.day == self._day else 0
+
+    def mark_exhausted(self) -> None:
+        """APIがquotaExceededを返した場合、その日の残りを0として扱う"""
+        with self._cond:
+            self._roll_day()
+            logger.warning("YouTube API reported quota exhausted", extra={"day": self._day, "used": self._used})
+            day = self._day
+            units = max(self.daily_limit - self._used, 0)
+            for reservation in self._reservations.values():
+                reservation.remaining = 0
+        self._update_ledger(day, units)
+
+    @contextmanager
+    def reserve(self, units: int, priority: int = PRIORITY_INTERACTIVE) -> Iterator[None]:
+        """
+        処理を始める前に必要なユニットを確保する。足りなければ何もせずQuotaExceededErrorを送出する。
+        予約はこのブロック（とcontextvarsを引き継いだスレッド）の中のacquireだけが消費し、
+        台帳には消費した分だけを計上する。ブロックを抜けると予約は消える。
+        """
+        with self._cond:
+            self._roll_day()
+            reservation = _Reservation(self._day, units, priority)
+        used, reserved = self._update_ledger(reservation.day, reservations=self._reservation_item(reservation))
+        if used + reserved > self._limit_for(priority):
+            used, reserved = self._update_ledger(reservation.day, released=[reservation.reservation_id])
+            remaining = max(self._limit_for(priority) - used - reserved, 0)
+            logger.warning(
+                "Not enough YouTube API quota for operation",
+                extra={"required": units, "used": used, "reserved": reserved, "priority": priority},
+            )
+            raise QuotaExceededError(f"YouTube API quota is insufficient: required={units}, remaining={remaining}")
+        with self._cond:
+            self._reservations[reservation.reservation_id] = reservation
+        token = _current_reservations.set({**_current_reservations.get(), self: reservation})
+        logger.debug(
+            "Quota reserved",
+            extra={"units": units, "priority": priority, "used": used, "reservation_id": reservation.reservation_id},
+        )
+        try:
+            yield
+        finally:
+            _current_reservations.reset(token)
+            with self._cond:
+                self._reservations.pop(reservation.reservation_id, None)
+                unspent = reservation.remaining
+            self._flush(reservation, release=True)
+            logger.debug(
+                "Quota reservation released",
+                extra={"unspent": unspent, "reservation_id": reservation.reservation_id},
+            )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_per_sec)
+        self._last_refill = now
+
+    def acquire(self, endpoint: str, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """API呼び出し1回分のユニットを消費する。レート超過時は優先度順に待機する"""
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        reservation = _current_reservations.get().get(self)
+        flush = False
+        with self._cond:
+            self._roll_day()
+            day = self._day
+            charge = 0
+            if reservation is not None and reservation.day == day and reservation.remaining >= cost:
+                # 予約分から消費し、台帳にはreservation_flush_unitsごとにまとめて計上する。
+                # 消費が少なくても期限の半分が過ぎたら書き込んで期限を延ばす
+                reservation.remaining -= cost
+                reservation.unflushed += cost
+                flush = (
+                    reservation.unflushed >= self.reservation_flush_units
+                    or time.monotonic() - reservation.refreshed_at >= self.reservation_ttl / 2
+                )
+            else:
+                if self._used + self._reserved + cost > self._limit_for(priority):
+                    raise QuotaExceededError(
+                        f"YouTube API daily quota exhausted: used={self._used}, reserved={self._reserved}, "
+                        f"limit={self._limit_for(priority)}"
+                    )
+                charge = cost
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+        if charge:
+            self._update_ledger(day, charge)
+        if flush:
+            self._flush(reservation)
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    higher_waiting = any(count for p, count in self._waiting.items() if p < priority)
+                    if not higher_waiting and self._tokens >= min(cost, self.burst):
+                        self._tokens -= cost
+                        return
+                    self._cond.wait(timeout=max((cost - self._tokens) / self.rate_per_sec, 0.01))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+
+def api_key_id(api_key: str) -> str:
+    """ログや台帳のキーに使うAPIキーの識別子（キーそのものは出力しない）"""
+    return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+class _ApiKeyState:
+    def __init__(self, api_key: str, quota: QuotaScheduler):
+        self.api_key = api_key
+        self.key_id = api_key_id(api_key)
+        self.quota = quota
+        self.requests = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.disabled_until = 0.0
+        self.disabled_reason: Optional[str] = None
+
+
+class ApiKeyPool:
+    """
+    複数のAPIキーをまとめて扱う。キーごとにQuotaScheduler（日次クォータの台帳とレート制御）を持ち、
+    リクエストごとに「残りクォータ × (1 - 直近のエラー率)」が最も大きいキーを選ぶ。
+    quotaExceededを返したキーはその日の残りを0として、キーの不正などで403を返したキーは
+    KEY_DISABLE_SECONDSの間ローテーションから外す。
+    reserve / remaining / get_usage はQuotaSchedulerと同じ形で、全キーの合計を扱う。
+    """
+
+    # エラー率の指数移動平均の重み
+    ERROR_RATE_ALPHA = 0.1
+
+    def __init__(self, ledgers: Dict[str, QuotaScheduler], key_disable_seconds: float = 3600):
+        if not ledgers:
+            raise ValueError("At least one YouTube API key is required")
+        self._keys: Dict[str, _ApiKeyState] = {api_key: _ApiKeyState(api_key, quota) for api_key, quota in ledgers.items()}
+        self.key_disable_seconds = key_disable_seconds
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _is_disabled(self, state: _ApiKeyState) -> bool:
+        if state.disabled_until and state.disabled_until <= time.monotonic():
+            logger.info("YouTube API key returned to rotation", extra={"key_id": state.key_id})
+            state.disabled_until = 0.0
+            state.disabled_reason = None
+        return bool(state.disabled_until)
+
+    def _choose(self, priority: int, exclude: Set[str]) -> Optional[_ApiKeyState]:
+        best = None
+        best_score = None
+        with self._lock:
+            candidates = [
+                (state, state.error_rate)
+                for state in self._keys.values()
+                if state.api_key not in exclude and not self._is_disabled(state)
+            ]
+        # 各キーの台帳はそれぞれのロックで読み、プール全体のロックは持たない
+        for state, error_rate in candidates:
+            reserved = state.quota.reserved_units
+            remaining = state.quota.remaining(priority)
+            if not reserved and not remaining:
+                continue
+            # 呼び出し元が予約しているキーを優先し（予約を使わずに他の枠を減らさないように）、次に残量とエラー率で選ぶ
+            score = (reserved > 0, remaining * (1 - error_rate))
+            if best_score is None or score > best_score:
+                best, best_score = state, score
+        return best
+
+    def has_available_key(self, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        return self._choose(priority, set()) is not None
+
+    def acquire(self, endpoint: str, priority: int = PRIORITY_INTERACTIVE) -> str:
+        """リクエストに使うキーを選び、そのキーの台帳からユニットを消費してキーを返す"""
+        tried: Set[str] = set()
+        while True:
+            state = self._choose(priority, tried)
+            if state is None:
+                raise QuotaExceededError("No YouTube API key with remaining quota is available")
+            try:
+                state.quota.acquire(endpoint, priority)
+            except QuotaExceededError:
+                tried.add(state.api_key)
+                continue
+            with self._lock:
+                state.requests += 1
+            return state.api_key
+
+    def record_result(self, api_key: str, ok: bool) -> None:
+        with self._lock:
+            state = self._keys[api_key]
+            if not ok:
+                state.errors += 1
+            state.error_rate += self.ERROR_RATE_ALPHA * ((0.0 if ok else 1.0) - state.error_rate)
+
+    def mark_exhausted(self, api_key: str) -> None:
+        state = self._keys[api_key]
+        logger.warning("YouTube API key quota exhausted", extra={"key_id": state.key_id})
+        state.quota.mark_exhausted()
+
+    def disable(self, api_key: str, reason: str) -> None:
+        with self._lock:
+            state = self._keys[api_key]
+            state.disabled_until = time.monotonic() + self.key_disable_seconds
+            state.disabled_reason = reason
+        logger.warning(
+            "YouTube API key taken out of rotation",
+            extra={"key_id": state.key_id, "reason": reason, "seconds": self.key_disable_seconds},
+        )
+
+    def remaining(self, priority: int = PRIORITY_INTERACTIVE) -> int:
+        with self._lock:
+            states = [state for state in self._keys.values() if not self._is_disabled(state)]
+        return sum(state.quota.remaining(priority) for state in states)
+
+    @contextmanager
+    def reserve(self, units: int, priority: int = PRIORITY_INTERACTIVE) -> Iterator[None]:
+        """必要なユニットを残量の多いキーから順に割り振って確保する。全キー合計で足りなければQuotaExceededError"""
+        with self._lock:
+            states = [state for state in self._keys.values() if not self._is_disabled(state)]
+        with ExitStack() as stack:
+            unassigned = units
+            for state in sorted(states, key=lambda s: s.quota.remaining(priority), reverse=True):
+                if unassigned <= 0:
+                    break
+                share = min(unassigned, state.quota.remaining(priority))
+                if share <= 0:
+                    continue
+                stack.enter_context(state.quota.reserve(share, priority))
+                unassigned -= share
+            if unassigned > 0:
+                logger.warning(
+                    "Not enough YouTube API quota across keys",
+                    extra={"required": units, "keys": len(states), "priority": priority},
+                )
+                raise QuotaExceededError(f"YouTube API quota is insufficient across {len(states)} keys: required={units}")
+            yield
+
+    def get_usage(self) -> Dict[str, Any]:
+        keys: Dict[str, Any] = {}
+        with self._lock:
+            states = list(self._keys.values())
+            disabled = {state.api_key: self._is_disabled(state) for state in states}
+        for state in states:
+            keys[state.key_id] = {
+                **state.quota.get_usage(),
+                "requests": state.requests,
+                "errors": state.errors,
+                "error_rate": round(state.error_rate, 3),
+                "disabled": disabled[state.api_key],
+                "disabled_reason": state.disabled_reason,
+            }
+
+        calls: Dict[str, int] = {}
+        for usage in keys.values():
+            for endpoint, count in usage["calls"].items():
+                calls[endpoint] = calls.get(endpoint, 0) + count
+        active = [usage for usage in keys.values() if not usage["disabled"]]
+        return {
+            "day": states[0].quota.get_usage()["day"],
+            "daily_limit": sum(usage["daily_limit"] for usage in keys.values()),
+            "used": sum(usage["used"] for usage in keys.values()),
+            "reserved_unspent": sum(usage["reserved_unspent"] for usage in keys.values()),
+            "remaining_interactive": sum(usage["remaining_interactive"] for usage in active),
+            "remaining_background": sum(usage["remaining_background"] for usage in active),
+            "calls": calls,
+            "keys": keys,
+        }
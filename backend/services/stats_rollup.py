@@ -0,0 +1,289 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from common.logger import get_logger
+from constants.config import (
+    STATS_RAW_RETENTION_DAYS,
+    STATS_HOURLY_RETENTION_DAYS,
+    STATS_ROLLUP_MIN_POINTS,
+    STATS_COMPACTION_BATCH_SIZE,
+)
+from db.stats_partitions import (
+    add_months,
+    current_utc_timestamp,
+    droppable_partitions,
+    drop_partitions,
+    ensure_future_partitions,
+    is_partitioned,
+    month_start,
+    partition_upper_bound,
+    UTC_TIME_ZONE,
+)
+from db.unit_of_work import UnitOfWork, use_connection
+
+logger = get_logger(__name__)
+
+
+class StatsResolution(NamedTuple):
+    name: str
+    table: str
+    bucket_seconds: int
+    # snapshot_at -> バケットの開始日時を求めるSQL式（hは集計元のvideo_stats_history）
+    bucket_expr: Optional[str]
+    # このテーブルに残す日数（Noneは無期限）
+    retention_days: Optional[int]
+
+
+RAW = StatsResolution("raw", "video_stats_history", 0, None, STATS_RAW_RETENTION_DAYS)
+HOURLY = StatsResolution(
+    "hourly",
+    "video_stats_hourly",
+    3600,
+    "TIMESTAMP(DATE(h.snapshot_at), MAKETIME(HOUR(h.snapshot_at), 0, 0))",
+    STATS_HOURLY_RETENTION_DAYS,
+)
+DAILY = StatsResolution("daily", "video_stats_daily", 86400, "TIMESTAMP(DATE(h.snapshot_at))", None)
+WEEKLY = StatsResolution(
+    "weekly",
+    "video_stats_weekly",
+    7 * 86400,
+    "TIMESTAMP(DATE(h.snapshot_at) - INTERVAL WEEKDAY(h.snapshot_at) DAY)",
+    None,
+)
+
+# 粗い順。集計テーブルには各バケットの最後のスナップショットの値を持つ（再生数などは累積値のため）
+ROLLUPS = (WEEKLY, DAILY, HOURLY)
+RESOLUTIONS = ROLLUPS + (RAW,)
+
+
+def choose_resolution(days: int, min_points: int = STATS_ROLLUP_MIN_POINTS) -> StatsResolution:
+    """
+    days日分の推移を読むときの解像度を選ぶ。
+    保持期間内でdays日にmin_points以上のバケットが取れる解像度のうち一番粗いもの、
+    どれも満たさなければ保持期間内で一番細かいものを使う。
+    """
+    covering = [
+        resolution
+        for resolution in RESOLUTIONS
+        if resolution.retention_days is None or days <= resolution.retention_days
+    ]
+    for resolution in covering:
+        if resolution.bucket_seconds and days * 86400 / resolution.bucket_seconds >= min_points:
+            return resolution
+    return covering[-1]
+
+
+def current_db_timestamp(uow: Optional[UnitOfWork] = None) -> datetime:
+    """スナップショットのsnapshot_atと同じ時計（DBのCURRENT_TIMESTAMP）で現在時刻を取る"""
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT CURRENT_TIMESTAMP AS now")
+            return cursor.fetchone()["now"]
+
+
+def _rollup(cursor: Any, resolution: StatsResolution, source_filter: str, params: List[Any]) -> int:
+    """
+    source_filterに一致するvideo_stats_historyの行をresolutionの集計テーブルに反映する。
+    同じバケットに複数の行があれば一番新しい行の値が残るため、同じ行を何度反映しても結果は変わらない。
+    """
+    # ON DUPLICATE KEY UPDATEは左から順に評価されるため、last_snapshot_atは最後に更新する
+    return cursor.execute(
+        f"""
+        INSERT INTO {resolution.table} (
+            video_id, bucket_start, view_count, like_count, comment_count, last_snapshot_at
+        )
+        SELECT * FROM (
+            SELECT
+                h.video_id,
+                {resolution.bucket_expr} AS bucket_start,
+                h.view_count,
+                h.like_count,
+                h.comment_count,
+                h.snapshot_at AS last_snapshot_at
+            FROM video_stats_history h
+            WHERE {source_filter}
+        ) r
+        ON DUPLICATE KEY UPDATE
+            view_count = IF(r.last_snapshot_at >= {resolution.table}.last_snapshot_at, r.view_count, {resolution.table}.view_count),
+            like_count = IF(r.last_snapshot_at >= {resolution.table}.last_snapshot_at, r.like_count, {resolution.table}.like_count),
+            comment_count = IF(r.last_snapshot_at >= {resolution.table}.last_snapshot_at, r.comment_count, {resolution.table}.comment_count),
+            last_snapshot_at = GREATEST({resolution.table}.last_snapshot_at, r.last_snapshot_at)
+        """,
+        params or None,
+    )
+
+
+def rollup_channel_stats(channel_ids: List[int], since: datetime, uow: Optional[UnitOfWork] = None) -> Dict[str, int]:
+    """
+    取り込み直後に呼ぶ: チャンネルの動画についてsince以降に追記されたスナップショットを
+    時間・日・週の集計テーブルに反映する。集計テーブルごとの反映行数（影響行数）を返す。
+    """
+    if not channel_ids:
+        return {}
+    placeholders = ",".join(["%s"] * len(channel_ids))
+    source_filter = f"""
+        h.video_id IN (SELECT id FROM videos WHERE channel_id IN ({placeholders}))
+        AND h.snapshot_at >= %s
+    """
+    params = [*channel_ids, since]
+    counts: Dict[str, int] = {}
+    with use_connection(uow) as conn:
+        with conn.cursor() as cursor:
+            for resolution in ROLLUPS:
+                counts[resolution.name] = _rollup(cursor, resolution, source_filter, params)
+    logger.debug("Video stats rolled up", extra={"channel_ids": channel_ids, "since": since, "counts": counts})
+    return counts
+
+
+def _delete_in_batches(conn: Any, table: str, time_column: str, cutoff: datetime, batch_size: int) -> int:
+    """cutoffより古い行をbatch_size件ずつ消してはコミットする（長いトランザクションとロックを避ける）"""
+    deleted = 0
+    while True:
+        with conn.cursor() as cursor:
+            count = cursor.execute(
+                f"DELETE FROM {table} WHERE {time_column} < %s LIMIT %s",
+                (cutoff, batch_size),
+            )
+        conn.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def _delete_orphaned_history(conn: Any, batch_size: int) -> int:
+    """
+    削除済みの動画のvideo_stats_historyの行を消す（パーティション化のため外部キーが無く、削除が連鎖しない）。
+    動画IDは(video_id, snapshot_at)のインデックスから拾い、batch_size件ずつ消してはコミットする。
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT o.video_id
+            FROM (SELECT DISTINCT video_id FROM video_stats_history) o
+            LEFT JOIN videos v ON v.id = o.video_id
+            WHERE v.id IS NULL
+            """
+        )
+        video_ids = [row["video_id"] for row in cursor.fetchall()]
+    deleted = 0
+    for start in range(0, len(video_ids), batch_size):
+        batch = video_ids[start : start + batch_size]
+        placeholders = ",".join(["%s"] * len(batch))
+        while True:
+            with conn.cursor() as cursor:
+                count = cursor.execute(
+                    f"DELETE FROM {RAW.table} WHERE video_id IN ({placeholders}) LIMIT %s",
+                    [*batch, batch_size],
+                )
+            conn.commit()
+            deleted += count
+            if count < batch_size:
+                break
+    if video_ids:
+        logger.info("Orphaned video stats history deleted", extra={"videos": len(video_ids), "deleted": deleted})
+    return deleted
+
+
+def _rollup_by_month(source_filter: str, params: List[Any]) -> Dict[str, int]:
+    """
+    source_filterに一致する生のスナップショットを、UTCの月ごとに分けて集計テーブルに反映する。
+    月ごとにコミットするため、履歴全体を1つのトランザクションで読むことはない
+    （月の区切りはパーティションと同じなので、パーティション化されていれば刈り込みも効く）。
+    """
+    with UnitOfWork() as uow:
+        with uow.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CONVERT_TZ(MIN(snapshot_at), @@session.time_zone, %s) AS first_at, UTC_TIMESTAMP() AS now
+                FROM video_stats_history
+                """,
+                (UTC_TIME_ZONE,),
+            )
+            row = cursor.fetchone()
+    counts = {resolution.name: 0 for resolution in ROLLUPS}
+    if row["first_at"] is None:
+        return counts
+
+    month = month_start(row["first_at"])
+    while month <= row["now"]:
+        next_month = add_months(month, 1)
+        month_filter = f"""
+            ({source_filter})
+            AND h.snapshot_at >= CONVERT_TZ(%s, %s, @@session.time_zone)
+            AND h.snapshot_at < CONVERT_TZ(%s, %s, @@session.time_zone)
+        """
+        month_params = [*params, month, UTC_TIME_ZONE, next_month, UTC_TIME_ZONE]
+        with UnitOfWork() as uow:
+            with uow.connection.cursor() as cursor:
+                for resolution in ROLLUPS:
+                    counts[resolution.name] += _rollup(cursor, resolution, month_filter, month_params)
+        logger.debug("Video stats rolled up for month", extra={"month": month, "counts": counts})
+        month = next_month
+    return counts
+
+
+def compact_stats_history(
+    raw_retention_days: int = STATS_RAW_RETENTION_DAYS,
+    hourly_retention_days: int = STATS_HOURLY_RETENTION_DAYS,
+    batch_size: int = STATS_COMPACTION_BATCH_SIZE,
+    backfill: bool = False,
+) -> Dict[str, Any]:
+    """
+    保持期間を過ぎた生のスナップショットを集計テーブルに反映してから削除し、
+    保持期間を過ぎた時間単位の集計も削除する（日・週の集計は残す）。
+    video_stats_historyが月ごとにパーティション化されていれば、先の月のパーティションを追加し、
+    全行が保持期間を過ぎた月のパーティションをDROP PARTITIONで落とす（保持期間は月単位に切り下がる）。
+    落とせるパーティションがなくても保持期間を過ぎた行は集計する（同じ行を何度集計しても結果は変わらない）。
+    パーティション化されていなければbatch_size件ずつDELETEする。
+    backfill=Trueなら保持期間内の生のスナップショットも含めて全件を集計し直す（集計テーブル導入時用）。
+    集計はどれも月ごとに分けてコミットする。削除済みの動画の生のスナップショットもここで消す。
+    """
+    with UnitOfWork() as uow:
+        now = current_db_timestamp(uow)
+        with uow.connection.cursor() as cursor:
+            # パーティションの境界はUTCのため、セッションのタイムゾーンの時刻ではなくUTCの時刻と比べる
+            utc_now = current_utc_timestamp(cursor)
+            created_partitions = ensure_future_partitions(cursor, utc_now)
+            partitioned = is_partitioned(cursor)
+            raw_cutoff = now - timedelta(days=raw_retention_days)
+            utc_raw_cutoff = utc_now - timedelta(days=raw_retention_days)
+            dropped_partitions = droppable_partitions(cursor, utc_raw_cutoff) if partitioned else []
+    hourly_cutoff = now - timedelta(days=hourly_retention_days)
+    logger.info(
+        "Compacting video stats history",
+        extra={"raw_cutoff": raw_cutoff, "hourly_cutoff": hourly_cutoff, "partitions": dropped_partitions, "backfill": backfill},
+    )
+
+    if backfill:
+        rolled_up = _rollup_by_month("TRUE", [])
+    elif dropped_partitions:
+        # パーティションの境界はUTCのため、セッションのタイムゾーンに直してから保持期間の境界と比べる
+        rolled_up = _rollup_by_month(
+            "h.snapshot_at < GREATEST(%s, CONVERT_TZ(%s, %s, @@session.time_zone))",
+            [raw_cutoff, partition_upper_bound(dropped_partitions[-1]), UTC_TIME_ZONE],
+        )
+    else:
+        rolled_up = _rollup_by_month("h.snapshot_at < %s", [raw_cutoff])
+
+    raw_deleted = 0
+    with UnitOfWork() as uow:
+        if partitioned:
+            with uow.connection.cursor() as cursor:
+                drop_partitions(cursor, dropped_partitions)
+        else:
+            raw_deleted = _delete_in_batches(uow.connection, RAW.table, "snapshot_at", raw_cutoff, batch_size)
+        hourly_deleted = _delete_in_batches(uow.connection, HOURLY.table, "bucket_start", hourly_cutoff, batch_size)
+        orphaned_deleted = _delete_orphaned_history(uow.connection, batch_size)
+
+    result = {
+        "raw_cutoff": raw_cutoff,
+        "hourly_cutoff": hourly_cutoff,
+        "rolled_up": rolled_up,
+        "raw_deleted": raw_deleted,
+        "hourly_deleted": hourly_deleted,
+        "orphaned_deleted": orphaned_deleted,
+        "created_partitions": created_partitions,
+        "dropped_partitions": dropped_partitions,
+    }
+    logger.info("Video stats history compacted", extra=result)
+    return result
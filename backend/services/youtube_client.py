@@ -1,19 +1,283 @@
+import contextvars
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from functools import partial
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional, Container, Iterator, Iterable, Union
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError, TimeoutError as FuturesTimeoutError, wait, as_completed, FIRST_COMPLETED
 
 from common.logger import get_logger
-from constants.config import YOUTUBE_API_KEY
+from common.records import ChannelRecord, VideoRecord, VideoStatsRecord
+from constants.config import (
+    YOUTUBE_API_KEYS,
+    YOUTUBE_KEY_DISABLE_SECONDS,
+    YOUTUBE_API_BASE_URL,
+    YOUTUBE_MAX_WORKERS,
+    YOUTUBE_MAX_IN_FLIGHT_CHUNKS,
+    YOUTUBE_HTTP_POOL_SIZE,
+    YOUTUBE_CONNECT_TIMEOUT,
+    YOUTUBE_READ_TIMEOUT,
+    YOUTUBE_DAILY_QUOTA,
+    YOUTUBE_QUOTA_INTERACTIVE_RESERVE,
+    YOUTUBE_RATE_LIMIT_PER_SEC,
+    YOUTUBE_RATE_LIMIT_BURST,
+    YOUTUBE_MAX_RETRIES,
+    YOUTUBE_RETRY_BASE_DELAY,
+    YOUTUBE_RETRY_MAX_DELAY,
+    YOUTUBE_HEDGE_AFTER,
+    YOUTUBE_MAX_HEDGES,
+    YOUTUBE_HEDGE_SLOTS,
+    QUOTA_RESERVATION_TTL,
+    QUOTA_RESERVATION_FLUSH_UNITS,
+)
+from utils.extract_channel_id import normalize_handle
+from services.quota import QuotaScheduler, ApiKeyPool, QuotaExceededError, QUOTA_COSTS, PRIORITY_INTERACTIVE, api_key_id
+
+try:
+    import orjson
+except ImportError:  # orjsonが無い環境では標準のjsonでデコードする
+    orjson = None
 
 logger = get_logger(__name__)
-BASE_URL = "https://www.googleapis.com/youtube/v3"
+BASE_URL = YOUTUBE_API_BASE_URL
+QUOTA_ERROR_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+# 403でも一時的なレート制限は再試行する
+RATE_LIMIT_ERROR_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# キー自体が使えない場合のエラー。そのキーをローテーションから外して別のキーで再送する
+# （forbiddenは非公開の動画など、リクエストごとのエラーのためキーは外さない）
+KEY_ERROR_REASONS = {"keyInvalid", "keyExpired", "accessNotConfigured", "ipRefererBlocked"}
+# channels.list / videos.list の1リクエストで指定できるIDの上限
+MAX_IDS_PER_REQUEST = 50
+VIDEO_FULL_PART = "snippet,statistics,contentDetails"
+VIDEO_STATS_PART = "statistics"
+# チャンクのETag保存キーの先頭に付けるpartの短い名前
+CHUNK_ETAG_PART_LABELS = {VIDEO_FULL_PART: "full", VIDEO_STATS_PART: "stats"}
+# 統計のみの更新ではレスポンスを再生数・高評価数・コメント数に絞る
+VIDEO_STATS_FIELDS = "etag,items(id,statistics(viewCount,likeCount,commentCount))"
+_DURATION_PATTERN = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+_youtube_client: Optional["YouTubeClient"] = None
+
+
+class HedgeBudget:
+    """1回の取得（_iter_chunk_results）で送ってよいヘッジの残り本数"""
+
+    def __init__(self, limit: int):
+        self._remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
 
 
 class YouTubeClient:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        logger.debug("YouTubeClient initialized")
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_workers: int = YOUTUBE_MAX_WORKERS,
+        max_in_flight: int = YOUTUBE_MAX_IN_FLIGHT_CHUNKS,
+        pool_size: int = YOUTUBE_HTTP_POOL_SIZE,
+        connect_timeout: float = YOUTUBE_CONNECT_TIMEOUT,
+        read_timeout: float = YOUTUBE_READ_TIMEOUT,
+        quota: Optional[Union[QuotaScheduler, ApiKeyPool]] = None,
+        max_retries: int = YOUTUBE_MAX_RETRIES,
+        hedge_after: float = YOUTUBE_HEDGE_AFTER,
+        max_hedges: int = YOUTUBE_MAX_HEDGES,
+        hedge_slots: int = YOUTUBE_HEDGE_SLOTS,
+        base_url: str = BASE_URL,
+    ):
+        self.base_url = base_url.rstrip("/")
+        # 単一のキーもプール（キー1本）として扱い、リクエストごとにプールからキーを選ぶ
+        if isinstance(quota, ApiKeyPool):
+            self.quota = quota
+        else:
+            if not api_key:
+                raise ValueError("api_key is required unless an ApiKeyPool is given")
+            self.quota = ApiKeyPool({
+                api_key: quota or QuotaScheduler(
+                    daily_limit=YOUTUBE_DAILY_QUOTA,
+                    rate_per_sec=YOUTUBE_RATE_LIMIT_PER_SEC,
+                    burst=YOUTUBE_RATE_LIMIT_BURST,
+                    interactive_reserve=YOUTUBE_QUOTA_INTERACTIVE_RESERVE,
+                ),
+            }, key_disable_seconds=YOUTUBE_KEY_DISABLE_SECONDS)
+        self.max_workers = max_workers
+        self.max_in_flight = max(max_in_flight, max_workers)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.max_hedges = max_hedges
+        # ヘッジする場合、videos.listは元のリクエストもヘッジもこのスレッドで送り、同時に送る本数はmax_workers本までにする。
+        # そのうちhedge_slots本はヘッジ専用に空けておく（元のリクエストで枠が埋まる全件取得中もヘッジを送れるように）
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_workers) if hedge_after > 0 else None
+        reserved = min(max(hedge_slots, 0), max_workers - 1) if self._hedge_executor else 0
+        self._request_slots = threading.BoundedSemaphore(max_workers - reserved)
+        self._hedge_slots = threading.BoundedSemaphore(reserved) if reserved else None
+
+        # スレッドプールの全ワーカーとページング用スレッドが同時に接続を保持できるようにする
+        pool_maxsize = max(pool_size, max_workers + 1)
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        logger.debug("YouTubeClient initialized", extra={"max_workers": max_workers, "pool_maxsize": pool_maxsize})
+
+    def _get(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        etag: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        cancelled: Optional[threading.Event] = None,
+    ) -> requests.Response:
+        """
+        429・5xx・タイムアウトは指数バックオフ（ジッター付き）で最大max_retries回まで再試行する。
+        キーのクォータ切れ・キー自体のエラーはそのキーを外し、他のキーが残っていればすぐに再送する。
+        cancelledがセットされたら、次の送信（再試行を含む）の前にCancelledErrorを送出する。
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        attempt = 0
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise CancelledError()
+            api_key = self.quota.acquire(endpoint, priority)
+            request_params = {**params, "key": api_key}
+            try:
+                response = self.session.get(f"{self.base_url}/{endpoint}", params=request_params, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self.quota.record_result(api_key, ok=False)
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+                reason = type(e).__name__
+            else:
+                status_code = response.status_code
+                self.quota.record_result(api_key, ok=status_code < 500 and status_code not in (403, 429))
+                if status_code in (400, 403):
+                    error_reason = _error_reason(response)
+                    if error_reason in QUOTA_ERROR_REASONS:
+                        self.quota.mark_exhausted(api_key)
+                        if self.quota.has_available_key(priority):
+                            continue
+                        raise QuotaExceededError("YouTube API daily quota exceeded")
+                    if error_reason in KEY_ERROR_REASONS:
+                        self.quota.disable(api_key, error_reason)
+                        if self.quota.has_available_key(priority):
+                            continue
+                        return response
+                    retryable = status_code == 403 and error_reason in RATE_LIMIT_ERROR_REASONS
+                else:
+                    retryable = response.status_code == 429 or response.status_code >= 500
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                reason = str(response.status_code)
+
+            attempt += 1
+            delay = self._backoff_delay(attempt, retry_after)
+            logger.warning(
+                "Retrying YouTube API request",
+                extra={"endpoint": endpoint, "attempt": attempt, "reason": reason, "delay": round(delay, 3)},
+            )
+            time.sleep(delay)
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), YOUTUBE_RETRY_MAX_DELAY)
+        # Full Jitter: 0〜base*2^attemptの一様乱数
+        return random.uniform(0, min(YOUTUBE_RETRY_MAX_DELAY, YOUTUBE_RETRY_BASE_DELAY * 2 ** attempt))
+
+    def _get_hedged(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        etag: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        hedge_budget: Optional[HedgeBudget] = None,
+    ) -> requests.Response:
+        """
+        hedge_after秒以内に応答がなければ同じリクエストをもう1本送り、先に成功した方を使う。
+        ヘッジはヘッジ用の枠（_hedge_slots、埋まっていれば_request_slots）とhedge_budgetの残りがあるときだけ送る。
+        ヘッジもクォータを消費する（_getでacquireする）。遅い方は以降の再試行を止め、結果は捨てる。
+        """
+        if not self._hedge_executor or hedge_budget is None:
+            return self._get(endpoint, params, etag, priority)
+
+        def send(cancelled: threading.Event, slots: threading.BoundedSemaphore) -> requests.Response:
+            try:
+                return self._get(endpoint, params, etag, priority, cancelled)
+            finally:
+                slots.release()
+
+        first_cancelled = threading.Event()
+        self._request_slots.acquire()
+        first = _submit_in_context(self._hedge_executor, send, first_cancelled, self._request_slots)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FuturesTimeoutError:
+            pass
+
+        if self._hedge_slots is not None and self._hedge_slots.acquire(blocking=False):
+            hedge_slots = self._hedge_slots
+        elif self._request_slots.acquire(blocking=False):
+            hedge_slots = self._request_slots
+        else:
+            return first.result()
+        if not hedge_budget.take():
+            hedge_slots.release()
+            return first.result()
+
+        logger.info("Sending hedged request for slow call", extra={"endpoint": endpoint, "hedge_after": self.hedge_after})
+        hedge_cancelled = threading.Event()
+        hedge = _submit_in_context(self._hedge_executor, send, hedge_cancelled, hedge_slots)
+        cancel_events = {first: first_cancelled, hedge: hedge_cancelled}
+        pending = {first, hedge}
+        error: Optional[Exception] = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        error = e
+            raise error
+        finally:
+            for future in pending:
+                cancel_events[future].set()
+
+    def get_connection_stats(self) -> Dict[str, int]:
+        """接続プールの統計（新規に張った接続数と再利用された回数）"""
+        opened = 0
+        requests_sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            requests_sent += pool.num_requests
+        return {
+            "opened": opened,
+            "reused": max(requests_sent - opened, 0),
+            "requests": requests_sent,
+        }
+
+    def close(self) -> None:
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
 
     def get_channel_id_from_handle(self, handle: str) -> str:
         """ハンドル名（@で始まる）からチャンネルIDを取得"""
@@ -24,11 +288,10 @@ class YouTubeClient:
         params = {
             "part": "id",
             "forHandle": handle_clean,
-            "key": self.api_key,
         }
         try:
-            logger.info("Sending request to YouTube API", extra={"url": f"{BASE_URL}/channels", "handle": handle_clean})
-            response = requests.get(f"{BASE_URL}/channels", params=params, timeout=10)
+            logger.info("Sending request to YouTube API", extra={"url": f"{self.base_url}/channels", "handle": handle_clean})
+            response = self._get("channels", params)
             logger.info("YouTube API response received", extra={"status_code": response.status_code, "handle": handle_clean})
             response.raise_for_status()
             data = response.json()
@@ -47,45 +310,130 @@ class YouTubeClient:
             logger.error("YouTube API request failed", extra={"handle": handle_clean, "error": str(e)}, exc_info=True)
             raise ValueError(f"YouTube API request failed for handle: {handle_clean}: {str(e)}") from e
 
-    def get_channel_info(self, channel_id: str) -> Dict[str, Any]:
+    def get_channel_info(
+        self,
+        channel_id: str,
+        etag: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Optional[ChannelRecord]:
+        """チャンネル情報を取得。etagが一致して304が返った場合はNoneを返す"""
         logger.info("Fetching channel info from YouTube API", extra={"channel_id": channel_id})
         params = {
             "part": "snippet,statistics,contentDetails",
             "id": channel_id,
-            "key": self.api_key,
         }
-        response = requests.get(f"{BASE_URL}/channels", params=params, timeout=10)
+        response = self._get("channels", params, etag=etag, priority=priority)
         logger.debug("YouTube API response", extra={"status_code": response.status_code})
+        if response.status_code == 304:
+            logger.info("Channel info not modified", extra={"channel_id": channel_id})
+            return None
         response.raise_for_status()
-        data = response.json()
+        data = _decode_json(response)
 
         if not data.get("items"):
             logger.warning("Channel not found in YouTube API", extra={"channel_id": channel_id})
             raise ValueError("Channel not found")
 
-        item = data["items"][0]
+        channel_info = self._parse_channel(data["items"][0], data.get("etag"))
+        logger.info("Channel info fetched successfully", extra={"channel_id": channel_id, "title": channel_info.title, "video_count": channel_info.video_count})
+        return channel_info
+
+    def _parse_channel(self, item: Dict[str, Any], etag: Optional[str]) -> ChannelRecord:
         snippet = item["snippet"]
         statistics = item["statistics"]
         content_details = item.get("contentDetails", {})
 
-        channel_info = {
-            "channel_id": channel_id,
-            "title": snippet["title"],
-            "description": snippet.get("description", ""),
-            "published_at": snippet["publishedAt"],
-            "subscriber_count": int(statistics.get("subscriberCount", 0)),
-            "video_count": int(statistics.get("videoCount", 0)),
-            "view_count": int(statistics.get("viewCount", 0)),
-            "upload_playlist_id": content_details.get("relatedPlaylists", {}).get("uploads"),
+        published_at = snippet.get("publishedAt")
+        # customUrlにはチャンネルのハンドル名（@から始まる）が入る
+        custom_url = snippet.get("customUrl")
+        return ChannelRecord(
+            channel_id=item["id"],
+            title=snippet["title"],
+            description=snippet.get("description", ""),
+            published_at=_parse_timestamp(published_at) if published_at else None,
+            subscriber_count=int(statistics.get("subscriberCount", 0)),
+            video_count=int(statistics.get("videoCount", 0)),
+            view_count=int(statistics.get("viewCount", 0)),
+            upload_playlist_id=content_details.get("relatedPlaylists", {}).get("uploads"),
+            etag=etag,
+            handle=normalize_handle(custom_url) if custom_url else None,
+        )
+
+    def _fetch_channel_batch(self, channel_ids: List[str], priority: int) -> List[ChannelRecord]:
+        params = {
+            "part": "snippet,statistics,contentDetails",
+            "id": ",".join(channel_ids),
+            "maxResults": MAX_IDS_PER_REQUEST,
         }
-        logger.info("Channel info fetched successfully", extra={"channel_id": channel_id, "title": channel_info["title"], "video_count": channel_info["video_count"]})
-        return channel_info
-
-    def get_all_video_ids(self, upload_playlist_id: str) -> List[str]:
-        logger.info("Fetching all video IDs from playlist", extra={"upload_playlist_id": upload_playlist_id})
-        video_ids = []
+        response = self._get("channels", params, priority=priority)
+        response.raise_for_status()
+        data = _decode_json(response)
+        # レスポンス全体のETagは複数チャンネル分のため、個々のチャンネルの条件付きリクエストには使えない
+        return [self._parse_channel(item, None) for item in data.get("items", [])]
+
+    def get_channels_info(
+        self,
+        channel_ids: Iterable[str],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Dict[str, Any]:
+        """
+        任意個のチャンネル情報を50件ずつ1リクエストにまとめ、並列に取得する。
+        "channels"はチャンネルID -> ChannelRecord、"errors"は取得できなかったチャンネルID -> 理由。
+        一部のリクエストが失敗しても他のチャンネルの結果は返す（クォータ超過のみ例外を送出する）。
+        """
+        unique_ids = list(dict.fromkeys(channel_ids))
+        batches = [
+            unique_ids[i : i + MAX_IDS_PER_REQUEST]
+            for i in range(0, len(unique_ids), MAX_IDS_PER_REQUEST)
+        ]
+        logger.info("Fetching channels info in batches", extra={"channels": len(unique_ids), "requests": len(batches)})
+        result: Dict[str, Any] = {"channels": {}, "errors": {}}
+        if not batches:
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            futures = {_submit_in_context(executor, self._fetch_channel_batch, batch, priority): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    channels = future.result()
+                except QuotaExceededError:
+                    raise
+                except Exception as e:
+                    logger.error(
+                        "Error fetching channel batch",
+                        extra={"channels": len(batch), "error": str(e), "error_type": type(e).__name__},
+                    )
+                    for channel_id in batch:
+                        result["errors"][channel_id] = str(e)
+                    continue
+                for channel in channels:
+                    result["channels"][channel.channel_id] = channel
+                for channel_id in batch:
+                    if channel_id not in result["channels"]:
+                        result["errors"][channel_id] = "Channel not found"
+
+        logger.info(
+            "Channels info fetched",
+            extra={"fetched": len(result["channels"]), "errors": len(result["errors"]), "requests": len(batches)},
+        )
+        return result
+
+    def iter_video_id_pages(
+        self,
+        upload_playlist_id: str,
+        known_video_ids: Optional[Container[str]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Iterator[List[str]]:
+        """
+        アップロード再生リストの動画IDを1ページ（最大50件）ずつ新しい順に返す。
+        known_video_idsを渡すと差分モードになり、既知の動画は除外して返し、
+        ページ内が全て既知の動画になった時点でページングを打ち切る（再生リストは新しい順のため）。
+        """
+        logger.info("Fetching all video IDs from playlist", extra={"upload_playlist_id": upload_playlist_id, "incremental": known_video_ids is not None})
         next_page_token = None
         page_count = 0
+        total = 0
 
         while True:
             page_count += 1
@@ -93,117 +441,342 @@ class YouTubeClient:
                 "part": "contentDetails",
                 "playlistId": upload_playlist_id,
                 "maxResults": 50,
-                "key": self.api_key,
             }
             if next_page_token:
                 params["pageToken"] = next_page_token
 
             logger.debug("Fetching playlist items page", extra={"page": page_count, "playlist_id": upload_playlist_id})
-            response = requests.get(f"{BASE_URL}/playlistItems", params=params, timeout=10)
+            response = self._get("playlistItems", params, priority=priority)
             logger.debug("Playlist items API response", extra={"status_code": response.status_code})
             response.raise_for_status()
-            data = response.json()
+            data = _decode_json(response)
 
             page_video_ids = [
                 item["contentDetails"]["videoId"]
                 for item in data.get("items", [])
             ]
-            video_ids.extend(page_video_ids)
-            logger.debug("Video IDs fetched from page", extra={"page": page_count, "count": len(page_video_ids), "total": len(video_ids)})
-
             next_page_token = data.get("nextPageToken")
+
+            if known_video_ids is not None:
+                new_video_ids = [video_id for video_id in page_video_ids if video_id not in known_video_ids]
+                total += len(new_video_ids)
+                logger.debug("Video IDs fetched from page", extra={"page": page_count, "count": len(page_video_ids), "new": len(new_video_ids), "total": total})
+                if new_video_ids:
+                    yield new_video_ids
+                if page_video_ids and not new_video_ids:
+                    logger.info("Reached already known videos, stopping pagination", extra={"page": page_count})
+                    break
+            else:
+                total += len(page_video_ids)
+                logger.debug("Video IDs fetched from page", extra={"page": page_count, "count": len(page_video_ids), "total": total})
+                if page_video_ids:
+                    yield page_video_ids
+
             if not next_page_token:
                 break
 
-        logger.info("All video IDs fetched successfully", extra={"total_videos": len(video_ids), "pages": page_count})
-        return video_ids
+        logger.info("All video IDs fetched successfully", extra={"total_videos": total, "pages": page_count})
+
+    def get_all_video_ids(
+        self,
+        upload_playlist_id: str,
+        known_video_ids: Optional[Container[str]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> List[str]:
+        """アップロード再生リストの動画IDを新しい順に全て取得する（差分モードの挙動はiter_video_id_pagesと同じ）"""
+        return [
+            video_id
+            for page in self.iter_video_id_pages(upload_playlist_id, known_video_ids, priority)
+            for video_id in page
+        ]
 
-    def _fetch_video_chunk(self, chunk: List[str], chunk_idx: int, total_chunks: int) -> List[Dict[str, Any]]:
-        logger.debug("Fetching video info chunk", extra={"chunk": chunk_idx, "total_chunks": total_chunks, "chunk_size": len(chunk)})
+    def _fetch_video_chunk(
+        self,
+        chunk: List[str],
+        chunk_idx: int,
+        total_chunks: Optional[int],
+        etag: Optional[str] = None,
+        stats_only: bool = False,
+        priority: int = PRIORITY_INTERACTIVE,
+        hedge_budget: Optional[HedgeBudget] = None,
+    ) -> Dict[str, Any]:
+        logger.debug("Fetching video info chunk", extra={"chunk": chunk_idx, "total_chunks": total_chunks, "chunk_size": len(chunk), "stats_only": stats_only})
+        part = VIDEO_STATS_PART if stats_only else VIDEO_FULL_PART
+        key = chunk_etag_key(chunk, part)
         params = {
-            "part": "snippet,statistics,contentDetails",
+            "part": part,
             "id": ",".join(chunk),
-            "key": self.api_key,
         }
+        if stats_only:
+            params["fields"] = VIDEO_STATS_FIELDS
 
-        response = requests.get(f"{BASE_URL}/videos", params=params, timeout=10)
+        response = self._get_hedged("videos", params, etag=etag, priority=priority, hedge_budget=hedge_budget)
         logger.debug("Videos API response", extra={"status_code": response.status_code, "chunk": chunk_idx})
+        if response.status_code == 304:
+            # 変更なし: パースもDB書き込みも不要
+            return {"key": key, "etag": etag, "not_modified": True, "videos": []}
         response.raise_for_status()
-        data = response.json()
+        data = _decode_json(response)
+
+        if stats_only:
+            videos = [self._parse_video_stats(item) for item in data.get("items", [])]
+            logger.debug("Video stats chunk processed", extra={"chunk": chunk_idx, "processed": len(videos)})
+            return {"key": key, "etag": data.get("etag"), "not_modified": False, "videos": videos}
 
         videos = []
         for item in data.get("items", []):
             snippet = item["snippet"]
             statistics = item["statistics"]
             content_details = item.get("contentDetails", {})
-
-            duration_str = content_details.get("duration", "")
-            duration_sec = self._parse_duration(duration_str)
-
-            video_info = {
-                "video_id": item["id"],
-                "title": snippet["title"],
-                "description": snippet.get("description", ""),
-                "published_at": snippet["publishedAt"],
-                "duration_sec": duration_sec,
-                "tags": snippet.get("tags", []),
-                "thumbnail_url": snippet.get("thumbnails", {})
-                .get("default", {})
-                .get("url"),
-                "view_count": int(statistics.get("viewCount", 0)),
-                "like_count": int(statistics.get("likeCount", 0)),
-                "comment_count": int(statistics.get("commentCount", 0)),
-            }
-            videos.append(video_info)
+            tags = snippet.get("tags")
+
+            videos.append(VideoRecord(
+                video_id=item["id"],
+                title=snippet["title"],
+                description=snippet.get("description", ""),
+                published_at=_parse_timestamp(snippet["publishedAt"]),
+                duration_sec=self._parse_duration(content_details.get("duration", "")),
+                tags_json=json.dumps(tags) if tags else None,
+                thumbnail_url=snippet.get("thumbnails", {}).get("default", {}).get("url"),
+                view_count=int(statistics.get("viewCount", 0)),
+                like_count=int(statistics.get("likeCount", 0)),
+                comment_count=int(statistics.get("commentCount", 0)),
+            ))
 
         logger.debug("Video info chunk processed", extra={"chunk": chunk_idx, "processed": len(videos)})
-        return videos
-
-    def get_videos_info(self, video_ids: List[str]) -> List[Dict[str, Any]]:
-        logger.info("Fetching videos info from YouTube API", extra={"total_videos": len(video_ids)})
-        if not video_ids:
-            return []
-
+        return {"key": key, "etag": data.get("etag"), "not_modified": False, "videos": videos}
+
+    def _parse_video_stats(self, item: Dict[str, Any]) -> VideoStatsRecord:
+        statistics = item.get("statistics", {})
+        return VideoStatsRecord(
+            video_id=item["id"],
+            view_count=int(statistics.get("viewCount", 0)),
+            like_count=int(statistics.get("likeCount", 0)),
+            comment_count=int(statistics.get("commentCount", 0)),
+        )
+
+    def get_videos_info(self, video_ids: List[str]) -> List[VideoRecord]:
+        return self.fetch_videos(video_ids)["videos"]
+
+    def iter_video_chunks(
+        self,
+        video_ids: List[str],
+        chunk_etags: Optional[Dict[str, Dict[str, Any]]] = None,
+        stats_only: bool = False,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        動画情報を50件ずつ並列取得し、完了したチャンクから順に返す。
+        "videos"はVideoRecordのリストで、stats_only=Trueの場合はpart=statisticsのみを要求して
+        VideoStatsRecordのリストを返す。
+        chunk_etagsにチャンクキーごとの前回の状態（etag）を渡すと
+        条件付きリクエストになり、304が返ったチャンクは動画を返さず前回の状態を引き継ぐ。
+        各チャンクの"state"には次回用の状態が入る。
+        """
+        # 新着動画は先頭に追加されるため、古い側から区切ってチャンク境界（=ETagキー）を安定させる
+        ordered_ids = video_ids[::-1]
         chunk_size = 50
-        chunks = [
-            video_ids[i : i + chunk_size]
-            for i in range(0, len(video_ids), chunk_size)
-        ]
-        total_chunks = len(chunks)
-
-        all_videos = []
-        max_workers = min(10, total_chunks)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_chunk = {
-                executor.submit(self._fetch_video_chunk, chunk, idx + 1, total_chunks): idx
-                for idx, chunk in enumerate(chunks)
-            }
-
-            for future in as_completed(future_to_chunk):
-                chunk_idx = future_to_chunk[future]
+        chunks = (
+            ordered_ids[i : i + chunk_size]
+            for i in range(0, len(ordered_ids), chunk_size)
+        )
+        return self._iter_chunk_results(chunks, chunk_etags, stats_only, priority)
+
+    def iter_playlist_video_chunks(
+        self,
+        upload_playlist_id: str,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        再生リストのページングと動画情報の取得を並行して行うパイプラインモード。
+        取得したページ（50件）はそのままvideos.listのチャンクとして投入されるため、
+        ページNの詳細取得はページN+1のページング中に進む。
+        ページは新しい順に区切られ、新着動画が1本増えるだけで全チャンクの境界がずれるため、
+        このモードではIf-None-Matchを送らず、チャンクの状態も保存しない（"key"はNone）。
+        """
+        pages = self.iter_video_id_pages(upload_playlist_id, priority=priority)
+        return self._iter_chunk_results(pages, None, False, priority, conditional=False)
+
+    def _iter_chunk_results(
+        self,
+        chunks: Iterable[List[str]],
+        chunk_etags: Optional[Dict[str, Dict[str, Any]]],
+        stats_only: bool,
+        priority: int,
+        conditional: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        chunksを別スレッドで読み進めながらスレッドプールに投入し、完了順に結果を返す。
+        conditional=Falseなら条件付きリクエストにせず、結果の"key"と"state"はNoneにする。
+        未消費のチャンクはmax_in_flight件までで、呼び出し側が結果を受け取るまで
+        新しいリクエストは投げない（チャンネルの規模によらずメモリ使用量が一定になる）。
+        再試行しても失敗したチャンクは"failed"=Trueと対象の"video_ids"を付けて返す。
+        遅いリクエストのヘッジは1回の呼び出しにつきmax_hedges本まで。
+        """
+        chunk_etags = chunk_etags or {}
+        part = VIDEO_STATS_PART if stats_only else VIDEO_FULL_PART
+        results: "Queue[tuple]" = Queue()
+        slots = threading.Semaphore(self.max_in_flight)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        chunk_sources: Dict[int, List[str]] = {}
+        hedge_budget = HedgeBudget(self.max_hedges)
+
+        def produce() -> None:
+            submitted = 0
+            try:
+                for chunk in chunks:
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    submitted += 1
+                    chunk_sources[submitted] = chunk
+                    future = _submit_in_context(
+                        executor,
+                        self._fetch_video_chunk,
+                        chunk,
+                        submitted,
+                        None,
+                        chunk_etags.get(chunk_etag_key(chunk, part), {}).get("etag"),
+                        stats_only,
+                        priority,
+                        hedge_budget,
+                    )
+                    future.add_done_callback(lambda f, idx=submitted: results.put(("chunk", idx, f)))
+            except Exception as e:
+                results.put(("error", submitted, e))
+            finally:
+                results.put(("done", submitted, None))
+
+        # クォータの予約を引き継ぐため、呼び出し元のcontextvarsで動かす
+        producer = threading.Thread(
+            target=contextvars.copy_context().run, args=(produce,), name="youtube-chunk-producer", daemon=True
+        )
+        producer.start()
+
+        received = 0
+        total_chunks: Optional[int] = None
+        try:
+            while total_chunks is None or received < total_chunks:
+                kind, chunk_idx, payload = results.get()
+                if kind == "done":
+                    total_chunks = chunk_idx
+                    continue
+                if kind == "error":
+                    logger.error("Error producing video chunks", extra={"error": str(payload), "error_type": type(payload).__name__})
+                    raise payload
+
+                received += 1
+                slots.release()
                 try:
-                    videos = future.result()
-                    all_videos.extend(videos)
+                    chunk_result = payload.result()
                 except Exception as e:
+                    # 失敗したチャンクだけを記録し、成功したチャンクの取り込みは続ける
                     logger.error(
                         "Error fetching video chunk",
-                        extra={"chunk": chunk_idx + 1, "error": str(e), "error_type": type(e).__name__},
+                        extra={"chunk": chunk_idx, "error": str(e), "error_type": type(e).__name__},
                         exc_info=True
                     )
-                    raise
-
-        logger.info("All videos info fetched successfully", extra={"total_videos": len(all_videos)})
-        return all_videos
+                    yield {
+                        "key": None,
+                        "etag": None,
+                        "not_modified": False,
+                        "videos": [],
+                        "failed": True,
+                        "video_ids": chunk_sources.pop(chunk_idx),
+                        "error": str(e),
+                    }
+                    continue
+
+                chunk_sources.pop(chunk_idx, None)
+                if not conditional:
+                    chunk_result["key"] = None
+                    chunk_result["state"] = None
+                elif chunk_result["not_modified"]:
+                    chunk_result["state"] = chunk_etags[chunk_result["key"]]
+                else:
+                    chunk_result["state"] = {"etag": chunk_result["etag"]}
+                yield chunk_result
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def fetch_videos(
+        self,
+        video_ids: List[str],
+        chunk_etags: Optional[Dict[str, Dict[str, Any]]] = None,
+        stats_only: bool = False,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Dict[str, Any]:
+        """iter_video_chunksの結果をまとめて返す"""
+        logger.info("Fetching videos info from YouTube API", extra={"total_videos": len(video_ids), "stats_only": stats_only})
+        result: Dict[str, Any] = {"videos": [], "chunk_etags": {}, "not_modified_chunks": 0, "failed_video_ids": []}
+
+        for chunk_result in self.iter_video_chunks(video_ids, chunk_etags, stats_only, priority):
+            if chunk_result.get("failed"):
+                result["failed_video_ids"].extend(chunk_result["video_ids"])
+                continue
+            result["chunk_etags"][chunk_result["key"]] = chunk_result["state"]
+            if chunk_result["not_modified"]:
+                result["not_modified_chunks"] += 1
+            result["videos"].extend(chunk_result["videos"])
+
+        logger.info(
+            "All videos info fetched successfully",
+            extra={
+                "total_videos": len(result["videos"]),
+                "not_modified_chunks": result["not_modified_chunks"],
+                "connections": self.get_connection_stats(),
+                "quota": self.quota.get_usage(),
+            },
+        )
+        return result
+
+    def fetch_video_stats_batch(
+        self,
+        video_ids_by_group: Dict[Any, List[str]],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Dict[str, Any]:
+        """
+        複数チャンネル（グループ）の動画の統計を、グループの境界をまたいで50件ずつ詰めて取得する。
+        動画数の少ないチャンネルごとにほぼ空のチャンクを送らずに済む。
+        "stats"はグループ -> VideoStatsRecordのリスト、"failed_video_ids"は失敗したグループ -> 動画IDのリスト。
+        """
+        owners: Dict[str, Any] = {}
+        for group, video_ids in video_ids_by_group.items():
+            for video_id in video_ids:
+                owners.setdefault(video_id, group)
+        packed_ids = list(owners)
+        chunks = [
+            packed_ids[i : i + MAX_IDS_PER_REQUEST]
+            for i in range(0, len(packed_ids), MAX_IDS_PER_REQUEST)
+        ]
+        logger.info(
+            "Fetching packed video stats",
+            extra={"groups": len(video_ids_by_group), "videos": len(packed_ids), "requests": len(chunks)},
+        )
+
+        result: Dict[str, Any] = {
+            "stats": {group: [] for group in video_ids_by_group},
+            "failed_video_ids": {},
+            "requests": len(chunks),
+        }
+        for chunk_result in self._iter_chunk_results(chunks, None, True, priority):
+            if chunk_result.get("failed"):
+                for video_id in chunk_result["video_ids"]:
+                    result["failed_video_ids"].setdefault(owners[video_id], []).append(video_id)
+                continue
+            for video in chunk_result["videos"]:
+                result["stats"][owners[video.video_id]].append(video)
+        return result
 
     def _parse_duration(self, duration_str: str) -> Optional[int]:
         if not duration_str:
             return None
 
-        import re
-
-        pattern = r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?"
-        match = re.match(pattern, duration_str)
+        match = _DURATION_PATTERN.match(duration_str)
 
         if not match:
             return None
@@ -215,10 +788,84 @@ class YouTubeClient:
         return hours * 3600 + minutes * 60 + seconds
 
 
+def _decode_json(response: requests.Response) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _error_reason(response: requests.Response) -> Optional[str]:
+    try:
+        errors = _decode_json(response).get("error", {}).get("errors", [])
+    except ValueError:
+        return None
+    return errors[0].get("reason") if errors else None
+
+
+def estimate_import_cost(video_count: int, pages: Optional[int] = None) -> int:
+    """インポートに必要なユニット数の見積もり（再生リストのページ数 + videos.listのチャンク数）"""
+    chunks = -(-video_count // 50)
+    return (chunks if pages is None else pages) * QUOTA_COSTS["playlistItems"] + chunks * QUOTA_COSTS["videos"]
+
+
+def estimate_refresh_cost(channel_count: int, video_count: int) -> int:
+    """まとめて更新する場合のユニット数の見積もり（channels.listとvideos.listを50件ずつ）"""
+    return (
+        -(-channel_count // MAX_IDS_PER_REQUEST) * QUOTA_COSTS["channels"]
+        + -(-video_count // MAX_IDS_PER_REQUEST) * QUOTA_COSTS["videos"]
+    )
+
+
+def chunk_etag_key(video_ids: List[str], part: str = VIDEO_FULL_PART) -> str:
+    """videos.listチャンクのETag保存キー（"{partの短い名前}:{partと含まれる動画IDの組のハッシュ}"）"""
+    digest_source = part + ":" + ",".join(sorted(video_ids))
+    return CHUNK_ETAG_PART_LABELS[part] + ":" + hashlib.sha1(digest_source.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_etag_part(key: str) -> Optional[str]:
+    """chunk_etag_keyのキーのpart。partを含まない以前の形式のキーはNone"""
+    label, separator, _ = key.partition(":")
+    if not separator:
+        return None
+    return next((part for part, part_label in CHUNK_ETAG_PART_LABELS.items() if part_label == label), None)
+
+
+def _submit_in_context(executor: ThreadPoolExecutor, fn, *args) -> Future:
+    """呼び出し元のcontextvars（クォータの予約など）を引き継いでスレッドプールで実行する"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def get_upload_playlist_id(channel_id: str) -> str:
+    """アップロード再生リストIDはチャンネルIDの先頭"UC"を"UU"に置き換えたもの"""
+    return "UU" + channel_id[2:]
+
+
 def get_youtube_client() -> YouTubeClient:
-    if not YOUTUBE_API_KEY:
+    global _youtube_client
+    if not YOUTUBE_API_KEYS:
         logger.error("YOUTUBE_API_KEY is not set")
         raise ValueError("YOUTUBE_API_KEY is not set")
-    logger.debug("Creating YouTubeClient instance")
-    return YouTubeClient(YOUTUBE_API_KEY)
+    # Lambdaのウォームスタート間で接続プールとクォータ台帳を使い回す
+    if _youtube_client is None:
+        from db.dynamodb_cache import update_quota_ledger
+
+        logger.debug("Creating YouTubeClient instance", extra={"api_keys": len(YOUTUBE_API_KEYS)})
+        ledgers = {
+            api_key: QuotaScheduler(
+                daily_limit=YOUTUBE_DAILY_QUOTA,
+                rate_per_sec=YOUTUBE_RATE_LIMIT_PER_SEC,
+                burst=YOUTUBE_RATE_LIMIT_BURST,
+                interactive_reserve=YOUTUBE_QUOTA_INTERACTIVE_RESERVE,
+                ledger_store=partial(update_quota_ledger, ledger=api_key_id(api_key)),
+                reservation_ttl=QUOTA_RESERVATION_TTL,
+                reservation_flush_units=QUOTA_RESERVATION_FLUSH_UNITS,
+            )
+            for api_key in YOUTUBE_API_KEYS
+        }
+        _youtube_client = YouTubeClient(quota=ApiKeyPool(ledgers, key_disable_seconds=YOUTUBE_KEY_DISABLE_SECONDS))
+    return _youtube_client
 
@@ -33,6 +33,7 @@ from utils.data_processor import (
     get_channels,
     get_channel_by_id,
     get_channel_by_youtube_id,
+    get_channel_by_handle,
     get_videos_with_stats,
     get_video_stats_history,
     process_heatmap_data,
@@ -603,11 +604,12 @@ def main():
             placeholder="UCxxxxx または @channelname"
         )
         if youtube_channel_id:
-            # @ハンドルの場合は@を削除
+            youtube_channel_id = youtube_channel_id.strip()
+            # @ハンドルの場合はインポート時に保存したハンドル名から引く
             if youtube_channel_id.startswith('@'):
-                youtube_channel_id = youtube_channel_id[1:]
-            
-            selected_channel = get_channel_by_youtube_id(youtube_channel_id)
+                selected_channel = get_channel_by_handle(youtube_channel_id)
+            else:
+                selected_channel = get_channel_by_youtube_id(youtube_channel_id) or get_channel_by_handle(youtube_channel_id)
             if not selected_channel:
                 st.sidebar.error("指定されたチャンネルが見つかりませんでした。")
     
@@ -1,2 +1,5 @@
 # Streamlit utils package
+import os
 
+# backend/utils のモジュール（extract_channel_idなど）も utils.* として読めるようにする
+__path__.append(os.path.join(os.path.dirname(__file__), '../../utils'))
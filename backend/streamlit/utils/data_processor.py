@@ -12,16 +12,19 @@ import numpy as np
 import pandas as pd
 
 # 親ディレクトリをパスに追加（backend/db/rds.pyをインポートするため）
+# ダッシュボードは読み取りだけなので、取り込みの書き込みと競合しないようリードレプリカ（DB_READER_HOST）から読む
 # streamlit/utils/data_processor.py から backend/ へのパス
 backend_path = os.path.join(os.path.dirname(__file__), '../../')
 sys.path.insert(0, os.path.abspath(backend_path))
 
-from db.rds import get_db_connection
+from db.rds import get_read_connection
+from services.stats_rollup import choose_resolution
+from utils.extract_channel_id import normalize_handle
 
 
 def get_channels() -> List[Dict[str, Any]]:
     """チャンネル一覧を取得"""
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 SELECT id, youtube_channel_id, title, subscriber_count, view_count, video_count
@@ -33,7 +36,7 @@ def get_channels() -> List[Dict[str, Any]]:
 
 def get_channel_by_id(channel_id: int) -> Optional[Dict[str, Any]]:
     """チャンネルIDからチャンネル情報を取得"""
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 SELECT id, youtube_channel_id, title, subscriber_count, view_count, video_count
@@ -45,7 +48,7 @@ def get_channel_by_id(channel_id: int) -> Optional[Dict[str, Any]]:
 
 def get_channel_by_youtube_id(youtube_channel_id: str) -> Optional[Dict[str, Any]]:
     """YouTubeチャンネルIDからチャンネル情報を取得"""
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 SELECT id, youtube_channel_id, title, subscriber_count, view_count, video_count
@@ -55,9 +58,23 @@ def get_channel_by_youtube_id(youtube_channel_id: str) -> Optional[Dict[str, Any
             return cursor.fetchone()
 
 
+def get_channel_by_handle(handle: str) -> Optional[Dict[str, Any]]:
+    """ハンドル名（@の有無・大文字小文字は問わない）からチャンネル情報を取得"""
+    with get_read_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, youtube_channel_id, title, subscriber_count, view_count, video_count
+                FROM channels
+                WHERE youtube_handle = %s
+                ORDER BY handle_resolved_at DESC
+                LIMIT 1
+            """, (normalize_handle(handle),))
+            return cursor.fetchone()
+
+
 def get_videos_with_stats(channel_id: int) -> pd.DataFrame:
     """チャンネルの動画一覧と最新の統計情報を取得"""
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 SELECT 
@@ -67,19 +84,10 @@ def get_videos_with_stats(channel_id: int) -> pd.DataFrame:
                     v.published_at,
                     v.duration_sec,
                     v.tags_json,
-                    COALESCE(latest_stats.view_count, 0) as view_count,
-                    COALESCE(latest_stats.like_count, 0) as like_count,
-                    COALESCE(latest_stats.comment_count, 0) as comment_count
+                    v.view_count,
+                    v.like_count,
+                    v.comment_count
                 FROM videos v
-                LEFT JOIN (
-                    SELECT 
-                        video_id,
-                        view_count,
-                        like_count,
-                        comment_count,
-                        ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY snapshot_at DESC) as rn
-                    FROM video_stats_history
-                ) latest_stats ON v.id = latest_stats.video_id AND latest_stats.rn = 1
                 WHERE v.channel_id = %s
                 ORDER BY v.published_at DESC
             """, (channel_id,))
@@ -94,21 +102,23 @@ def get_videos_with_stats(channel_id: int) -> pd.DataFrame:
 
 
 def get_video_stats_history(video_ids: List[int], days: int = 30) -> pd.DataFrame:
-    """複数動画の統計履歴を取得（公開から指定日数分）"""
+    """
+    複数動画の統計履歴を取得（直近の指定日数分）。
+    期間に対して十分な点数が取れる一番粗い解像度（週・日・時間・生のスナップショット）を自動で選ぶ。
+    集計テーブルから読んだ場合、snapshot_atはバケットの開始日時、days_since_publishは
+    バケット内の最後のスナップショット時点の値になる。選んだ解像度は df.attrs['resolution'] に入る。
+    スナップショットは値が変わったときしか保存されないため、集計テーブルには歯抜けのバケットがある。
+    歯抜けのバケットは直前のバケットの値で埋める（days_since_publishはバケットの開始日時で計算する）。
+    """
     if not video_ids:
         return pd.DataFrame()
     
     placeholders = ','.join(['%s'] * len(video_ids))
     cutoff_date = datetime.now() - timedelta(days=days)
+    resolution = choose_resolution(days)
     
-    with get_db_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    vsh.video_id,
-                    v.youtube_video_id,
-                    v.title,
-                    v.published_at,
+    if resolution.bucket_expr is None:
+        source = """
                     vsh.snapshot_at,
                     vsh.view_count,
                     vsh.like_count,
@@ -119,6 +129,30 @@ def get_video_stats_history(video_ids: List[int], days: int = 30) -> pd.DataFram
                 WHERE vsh.video_id IN ({placeholders})
                   AND vsh.snapshot_at >= %s
                 ORDER BY vsh.video_id, vsh.snapshot_at
+        """
+    else:
+        source = f"""
+                    vsh.bucket_start as snapshot_at,
+                    vsh.view_count,
+                    vsh.like_count,
+                    vsh.comment_count,
+                    DATEDIFF(vsh.last_snapshot_at, v.published_at) as days_since_publish
+                FROM {resolution.table} vsh
+                JOIN videos v ON vsh.video_id = v.id
+                WHERE vsh.video_id IN ({{placeholders}})
+                  AND vsh.bucket_start >= %s
+                ORDER BY vsh.video_id, vsh.bucket_start
+        """
+    
+    with get_read_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT 
+                    vsh.video_id,
+                    v.youtube_video_id,
+                    v.title,
+                    v.published_at,
+                    {source.format(placeholders=placeholders)}
             """, tuple(video_ids) + (cutoff_date,))
             rows = cursor.fetchall()
             
@@ -128,9 +162,33 @@ def get_video_stats_history(video_ids: List[int], days: int = 30) -> pd.DataFram
             df = pd.DataFrame(rows)
             df['published_at'] = pd.to_datetime(df['published_at'])
             df['snapshot_at'] = pd.to_datetime(df['snapshot_at'])
+            if resolution.bucket_expr is not None:
+                df = _forward_fill_buckets(df, resolution.bucket_seconds)
+            df.attrs['resolution'] = resolution.name
             return df
 
 
+def _forward_fill_buckets(df: pd.DataFrame, bucket_seconds: int) -> pd.DataFrame:
+    """動画ごとに最初のバケットから全体の最新のバケットまでを並べ、行のないバケットは直前のバケットの値で埋める"""
+    last_bucket = df['snapshot_at'].max()
+    frames = []
+    for _, group in df.groupby('video_id', sort=False):
+        buckets = pd.date_range(group['snapshot_at'].min(), last_bucket, freq=pd.Timedelta(seconds=bucket_seconds))
+        filled = group.set_index('snapshot_at').reindex(buckets)
+        missing = filled['video_id'].isna()
+        # 元からある行のNULL（いいね数の非公開など）は埋めず、行のないバケットだけを埋める
+        filled[missing] = filled.ffill()[missing]
+        filled = filled.rename_axis('snapshot_at').reset_index()
+        filled.loc[missing.values, 'days_since_publish'] = (
+            filled['snapshot_at'].dt.normalize() - filled['published_at'].dt.normalize()
+        ).dt.days[missing.values]
+        frames.append(filled[df.columns])
+    filled_df = pd.concat(frames, ignore_index=True)
+    filled_df['video_id'] = filled_df['video_id'].astype('int64')
+    filled_df['view_count'] = filled_df['view_count'].astype('int64')
+    return filled_df
+
+
 def process_heatmap_data(df: pd.DataFrame, metric: str) -> pd.DataFrame:
     """曜日 × 時間帯ヒートマップ用のデータを処理"""
     if df.empty:
@@ -48,3 +48,7 @@ def extract_handle(channel_url_or_id: str) -> Optional[str]:
 
     return None
 
+
+def normalize_handle(handle: str) -> str:
+    """キャッシュのキーとして使うため、先頭の@を除いて小文字にそろえる（ハンドル名は大文字小文字を区別しない）"""
+    return handle.strip().lstrip("@").lower()
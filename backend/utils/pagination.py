@@ -0,0 +1,88 @@
+"""
+一覧APIのキーセット（カーソル）ページネーション。
+nextCursorは前のページの最後の行の並び替えキーとidをJSONにしてbase64url化した不透明な文字列で、
+次のページは「そのキーより後ろ」をインデックスで直接読むため、OFFSETと違い何ページ目でも読む行数はページサイズ分で済む。
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+
+class Keyset(NamedTuple):
+    # 並び替えの列（同じ値の行はidで順序を決める）
+    column: Optional[str]
+    id_column: str
+    descending: bool
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """並び替えの種類・最後の行の並び替えキーとidからnextCursorを作る"""
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    payload = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """
+    カーソルから並び替えキーとidを取り出す。
+    壊れている・別の並び替えで作られたカーソルはValueErrorを送出する。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(payload, dict) or payload.get("s") != sort or not isinstance(payload.get("id"), int):
+        raise ValueError("Cursor does not match the requested sort")
+    value = payload.get("v")
+    if not _is_cursor_value(value):
+        raise ValueError("Cursor value must be a number or a datetime")
+    return value, payload["id"]
+
+
+def _is_cursor_value(value: Any) -> bool:
+    """並び替えキーとして受け付ける値（None・数値・encode_cursorが作る日時の文字列）"""
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            return False
+        return True
+    return False
+
+
+def keyset_condition(keyset: Keyset, value: Any, row_id: int) -> Tuple[str, List[Any]]:
+    """カーソルの行より後ろの行を選ぶWHERE条件とパラメータ"""
+    operator = "<" if keyset.descending else ">"
+    if keyset.column is None:
+        return f"{keyset.id_column} {operator} %s", [row_id]
+    # 先頭の「列 <= 値」（昇順なら >=）で(絞り込み列, 列, id)のインデックスの範囲を決め、
+    # 同じ値の行だけをidで絞る（行コンストラクタの比較は等号の後ろではインデックスの範囲にならない）
+    bound = "<=" if keyset.descending else ">="
+    return (
+        f"{keyset.column} {bound} %s AND ({keyset.column} {operator} %s OR {keyset.id_column} {operator} %s)",
+        [value, value, row_id],
+    )
+
+
+def keyset_order_by(keyset: Keyset) -> str:
+    direction = "DESC" if keyset.descending else "ASC"
+    if keyset.column is None:
+        return f"{keyset.id_column} {direction}"
+    return f"{keyset.column} {direction}, {keyset.id_column} {direction}"
+
+
+def parse_bool(value: Optional[str], default: bool) -> bool:
+    """クエリ文字列の真偽値（"true"/"false"）"""
+    if value is None or value == "":
+        return default
+    return value.lower() == "true"
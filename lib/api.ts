@@ -91,12 +91,17 @@ export async function getChannels(params?: {
   q?: string;
   limit?: number;
   offset?: number;
+  cursor?: string;
+  includeTotal?: boolean;
 }): Promise<ChannelListResponse> {
   checkApiBaseUrl();
   const queryParams = new URLSearchParams();
   if (params?.q) queryParams.set("q", params.q);
   if (params?.limit) queryParams.set("limit", params.limit.toString());
   if (params?.offset) queryParams.set("offset", params.offset.toString());
+  if (params?.cursor) queryParams.set("cursor", params.cursor);
+  if (params?.includeTotal !== undefined)
+    queryParams.set("includeTotal", params.includeTotal.toString());
 
   const url = `${API_BASE_URL}/channels${queryParams.toString() ? `?${queryParams.toString()}` : ""}`;
   const response = await fetchWithErrorHandling(url);
@@ -119,6 +124,8 @@ export async function getChannelVideos(
     sort?: string;
     limit?: number;
     offset?: number;
+    cursor?: string;
+    includeTotal?: boolean;
     from?: string;
     to?: string;
     minViews?: number;
@@ -129,6 +136,9 @@ export async function getChannelVideos(
   if (params?.sort) queryParams.set("sort", params.sort);
   if (params?.limit) queryParams.set("limit", params.limit.toString());
   if (params?.offset) queryParams.set("offset", params.offset.toString());
+  if (params?.cursor) queryParams.set("cursor", params.cursor);
+  if (params?.includeTotal !== undefined)
+    queryParams.set("includeTotal", params.includeTotal.toString());
   if (params?.from) queryParams.set("from", params.from);
   if (params?.to) queryParams.set("to", params.to);
   if (params?.minViews)
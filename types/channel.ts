@@ -13,6 +13,7 @@ export interface ChannelSummary {
   totalViews: number;
   totalVideos: number;
   lastFetchedAt: string;
+  failedVideoCount?: number;
 }
 
 export interface ChannelImportResponse {
@@ -40,5 +41,6 @@ export interface BackendChannelListItem {
 
 export interface ChannelListResponse {
   items: BackendChannelListItem[];
-  totalCount: number;
+  totalCount?: number | null;
+  nextCursor?: string | null;
 }
@@ -16,7 +16,8 @@ export interface Video {
 
 export interface VideoListResponse {
   items: Video[];
-  totalCount: number;
+  totalCount?: number | null;
+  nextCursor?: string | null;
 }
 
 export interface BackendVideoListItem {